@@ -0,0 +1,112 @@
+"""
+the shortest paths between all pairs of nodes of a *compactGraph.CompactGraph*
+at once, vectorised with NumPy
+
+Floyd-Warshall's algorithm over the n x n matrix of link costs: for every
+intermediate node k, the paths through k are compared with the best ones
+found so far, all n x n pairs in a single NumPy operation; n such steps,
+O(n^3) work done in C instead of a Python loop per node and link
+
+what it costs: O(n^3) time whatever the number of links, as every step
+touches all n x n pairs, in place: besides the distances and next nodes
+(12 n^2 bytes) a step needs the sums through k and the mask of the better
+ones, two n x n buffers allocated once (9 n^2 bytes), some 85 MB at 2,000
+switches and 525 MB at 5,000; the out-ports are then looked up for all pairs
+at once in an n x n matrix of the ports of the links, into an n x n table
+the store is written from as it is (4 n^2 bytes), and only
+the destinations a link change may alter get a shortest path tree; the
+table of all pairs takes 0.4 s instead of 2 s at 500 switches and 3.7 s
+instead of 9 s at 1,000 (shortestPathBenchmark.py), but n^3 grows faster
+than the n Dijkstra runs it replaces, so allPairs=1 is meant for topologies
+of up to a few thousand switches, beyond which growing the trees of the
+destinations actually used is the safe choice
+
+shortestPathBenchmark.py checks the results against the trees grown by
+Dijkstra's algorithm when NumPy is available
+
+the results are the distance and the next node of every pair, which are the
+shortest path trees towards every node at once (the next node of i towards j
+is the predecessor of i in the tree rooted at j, the links being the same in
+both directions)
+
+NumPy is optional: *available* tells whether it could be imported; without
+it shortestPath.py grows a tree per destination with Dijkstra's algorithm
+"""
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+from compactGraph import REMOVED
+
+
+def available():
+  return numpy is not None
+
+
+def _links(graph):
+  "the index arrays of the two ends, the costs and the out-ports of the "
+  "slots of the links that are not removed"
+  n = len(graph)
+  offsets = numpy.array(graph.offsets, dtype = numpy.int64)
+  src = numpy.repeat(numpy.arange(n), numpy.diff(offsets))
+  dst = numpy.array(graph.neighbors, dtype = numpy.int64)
+  costs = numpy.array(graph.costs, dtype = numpy.float64)
+  ports = numpy.array(graph.ports, dtype = numpy.uint16)
+  live = costs != REMOVED
+  return src[live], dst[live], costs[live], ports[live]
+
+
+def shortest_paths(graph):
+  "(dist, nextHop): n x n arrays over the node indices of *graph*, the "
+  "length of the shortest path from i to j (inf if there is none), and the "
+  "index of the node after i on it (-1 if j is i or cannot be reached)"
+  n = len(graph)
+  src, dst, costs, ports = _links(graph)
+  dist = numpy.full((n, n), numpy.inf)
+  numpy.minimum.at(dist, (src, dst), costs) # the cheapest of parallel links
+  nextHop = numpy.where(numpy.isfinite(dist), \
+    numpy.arange(n, dtype = numpy.int32)[numpy.newaxis, :], \
+    numpy.int32(-1)).astype(numpy.int32)
+  diagonal = numpy.arange(n)
+  dist[diagonal, diagonal] = 0
+  nextHop[diagonal, diagonal] = -1
+
+  # the two n x n buffers of every step, allocated once
+  through = numpy.empty((n, n))
+  better = numpy.empty((n, n), dtype = bool)
+  for k in xrange(n):
+    # the paths through k, from column k and row k, which stay the same in
+    # this step; copied, as dist and nextHop are written in place
+    numpy.add(dist[:, k, numpy.newaxis], dist[numpy.newaxis, k, :].copy(), \
+      out = through)
+    numpy.less(through, dist, out = better)
+    numpy.copyto(dist, through, where = better)
+    numpy.copyto(nextHop, nextHop[:, k, numpy.newaxis].copy(), where = better)
+  return dist, nextHop
+
+
+
+def out_ports(graph, nextHop, columns):
+  "the n x len(*columns*) uint16 array of the out-port of every node i "
+  "towards node columns[j], looked up in the CSR arrays of *graph* from the "
+  "next nodes *nextHop* of *shortest_paths*; 0 where there is none"
+  n = len(graph)
+  src, dst, costs, ports = _links(graph)
+  # the port of the slot from i to k at [i, k]; the extra column is the 0
+  # that a next node of -1 picks
+  portOf = numpy.zeros((n, n + 1), dtype = numpy.uint16)
+  portOf[src, dst] = ports
+  return portOf[numpy.arange(n)[:, numpy.newaxis], nextHop[:, columns]]
+
+
+def affected(dist, nextHop, a, b, newCost):
+  "the nodes j whose shortest path tree a change of the link between the "
+  "nodes of index *a* and *b* to *newCost* (None if it is removed) may "
+  "change: those whose tree holds the link, and those a path over the link "
+  "at its new cost is shorter for"
+  hit = (nextHop[a] == b) | (nextHop[b] == a)
+  if newCost is not None:
+    hit |= (dist[b] + newCost < dist[a]) | (dist[a] + newCost < dist[b])
+  return numpy.flatnonzero(hit).tolist()
@@ -0,0 +1,50 @@
+"""
+bounded queues between the main process of the evaluation components and
+their workers
+
+without a bound, a burst of PacketIns piles up in the pipes to the workers;
+their latency grows with the pile, and buffer ids are answered long after the
+switch has given up on them; a *Backpressure* keeps the PacketIns in flight
+to a worker (dispatched, and not completed by it) to *limit*, reading the
+counters of stageStats.py, and applies a policy to a PacketIn for a worker
+that has *limit* in flight:
+
+  dropOldest  dispatch it, and have the worker drop the oldest of those in
+              flight unhandled; the newest *limit* are kept
+  local       handle it in the main process, as in monoprocessing mode
+  flood       have the switch flood it, without looking its route up
+  drop        have the switch drop it (a packet_out without actions)
+
+a limit of 0 keeps the queues unbounded, as before
+"""
+
+DROP_OLDEST, LOCAL, FLOOD, DROP = "dropOldest", "local", "flood", "drop"
+POLICIES = (DROP_OLDEST, LOCAL, FLOOD, DROP)
+
+
+class Backpressure(object):
+  "the in-flight *limit* per worker and the *policy* beyond it; the PacketIns "
+  "shed are counted in *stats*, a *StageStats*"
+
+  def __init__(self, stats, limit = 0, policy = DROP_OLDEST):
+    self.stats = stats
+    self.change(limit, policy)
+
+  def change(self, limit, policy = None):
+    if policy is not None:
+      if policy not in POLICIES:
+        raise ValueError("overload policy is one of %s" \
+          % (", ".join(POLICIES),))
+      self.policy = policy
+    self.limit = max(0, int(limit))
+
+  def admit(self, i):
+    "whether a PacketIn is to be dispatched to worker *i*; if not, the "
+    "caller sheds it by *policy*"
+    if not self.limit or self.stats.in_flight(i) < self.limit:
+      return True
+    if self.policy == DROP_OLDEST:
+      self.stats.drop_oldest(i, self.limit)
+      return True
+    self.stats.shed(self.policy)
+    return False
@@ -0,0 +1,144 @@
+"""
+batching of the PacketIn descriptors the evaluation components send to their
+worker processes
+
+sending every descriptor on its own costs a pickle and a system call per
+packet; a *BatchDispatcher* collects the descriptors of each worker and sends
+them as a single message once *batchSize* of them are waiting or the oldest
+has waited *batchDelay* microseconds, whichever comes first; the size trades
+throughput for latency, the delay bounds the latency added under light load
+
+with a batch size of 1 every descriptor is sent at once, as before
+
+the deadline is kept by a daemon thread that sleeps while no batch is
+waiting; the threading.Condition timeouts of Python 2 poll in steps of up
+to 50 ms, far too coarse here, so it sleeps for the remaining delay instead
+
+a message to a worker that has died is dropped (its pipe is closed at the
+other end); the worker pool respawns the worker and attaches its new
+connection
+"""
+
+import threading
+import time
+
+
+class BatchDispatcher(object):
+  "sends (singleIndicator, descriptor) or (batchIndicator, [descriptors]) "
+  "through senders[i] for worker i"
+
+  def __init__(self, senders, batchSize, batchDelay, singleIndicator = 0, \
+    batchIndicator = 3):
+    self.senders = senders # of the active workers, attached by the pool
+    self.singleIndicator = singleIndicator
+    self.batchIndicator = batchIndicator
+    self.batches = {} # worker index -> [descriptors]
+    self.deadlines = {} # worker index -> time its batch has to be sent by
+    self.lock = threading.Lock()
+    self.waiting = threading.Event() # set while any batch is waiting
+    self.change(batchSize, batchDelay)
+
+    self.flushingThread = threading.Thread(target = self._flushing_task)
+    self.flushingThread.daemon = True
+    self.flushingThread.start()
+
+  def change(self, batchSize, batchDelay = None):
+    "*batchSize* descriptors per message, waiting *batchDelay* us at most"
+    self.batchSize = max(1, int(batchSize))
+    if batchDelay is not None:
+      self.batchDelay = int(batchDelay) / 1000000.0
+    self.flush()
+
+  def dispatch(self, i, descriptor):
+    "queues *descriptor* for worker *i*"
+    if self.batchSize == 1:
+      with self.lock:
+        self._write(i, (self.singleIndicator, descriptor))
+      return
+    with self.lock:
+      batch = self.batches.get(i)
+      if batch is None:
+        batch = self.batches[i] = []
+        self.deadlines[i] = time.time() + self.batchDelay
+        self.waiting.set()
+      batch.append(descriptor)
+      if len(batch) >= self.batchSize:
+        self._send(i)
+
+  def attach(self, i, sender):
+    "feeds worker *i* through *sender* from now on, the waiting batch "
+    "included; *i* is the number of workers for a new one; call with *lock* "
+    "held"
+    if i == len(self.senders):
+      self.senders.append(sender)
+    else:
+      self.senders[i] = sender
+
+  def detach(self, i, message):
+    "sends the waiting batch of worker *i*, the last one, and *message*, and "
+    "forgets its connection; call with *lock* held"
+    if i in self.batches:
+      self._send(i)
+    self._write(i, message)
+    self.senders.pop(i)
+
+  def broadcast(self, message):
+    "sends *message* to every worker after the descriptors waiting for it; "
+    "all other messages to the workers have to go through here, so that "
+    "no two threads write to a pipe at once"
+    with self.lock:
+      self.send_all(message)
+
+  def send_all(self, message):
+    "broadcasts *message*; call with *lock* held, so that no descriptor is "
+    "dispatched between it and what the caller changes along with it"
+    for i in self.batches.keys():
+      self._send(i)
+    for i in range(len(self.senders)):
+      self._write(i, message)
+
+  def send(self, i, message):
+    "sends *message* to worker *i* after the descriptors waiting for it"
+    with self.lock:
+      if i in self.batches:
+        self._send(i)
+      self._write(i, message)
+
+  def flush(self, i = None):
+    "sends the waiting batch of worker *i*, or of every worker if None"
+    with self.lock:
+      for j in ([i] if i is not None else self.batches.keys()):
+        if j in self.batches:
+          self._send(j)
+
+  def _send(self, i):
+    "call with *lock* held"
+    batch = self.batches.pop(i)
+    del self.deadlines[i]
+    self._write(i, (self.batchIndicator, batch))
+
+  def _write(self, i, message):
+    "call with *lock* held"
+    try:
+      self.senders[i].send(message)
+    except IndexError: # the pool has shrunk since worker *i* was chosen
+      if self.senders:
+        self._write(i % len(self.senders), message)
+    except (IOError, OSError): # the worker has died
+      pass
+
+  def _flushing_task(self):
+    "sends every batch whose deadline has passed"
+    while 1:
+      self.waiting.wait()
+      with self.lock:
+        if not self.deadlines:
+          self.waiting.clear()
+          continue
+        now = time.time()
+        for i, deadline in self.deadlines.items():
+          if deadline <= now:
+            self._send(i)
+        nextDeadline = min(self.deadlines.values()) if self.deadlines else None
+      if nextDeadline is not None:
+        time.sleep(max(0, nextDeadline - time.time()))
@@ -0,0 +1,95 @@
+"""
+latency benchmark of the result collectors of the evaluation components
+
+every worker process sends timestamps through its own result pipe at random
+(Poisson) intervals, at a total rate shared among the workers like PacketIns
+dispatched round robin; a collector in the main process receives them and
+notes how long each result has waited; the collector the components used
+before, which calls poll(1) on every pipe in turn, is compared with the one
+that waits on all pipes at once through *connectionSet.ConnectionSet*
+
+usage: python collectorBenchmark.py [rate per second] [seconds per run]
+"""
+
+import multiprocessing
+import random
+import sys
+import time
+
+import connectionSet
+
+
+def worker_task(sender, rate, duration, seed):
+  "sends a timestamp every 1/*rate* seconds on average, then None"
+  rng = random.Random(seed)
+  end = time.time() + duration
+  while 1:
+    time.sleep(rng.expovariate(rate))
+    if time.time() >= end:
+      break
+    sender.send(time.time())
+  sender.send(None)
+
+
+def polling_collector(receivers, latencies):
+  "the former collector: poll(1) on every pipe in turn"
+  running = set(receivers)
+  while running:
+    for receiver in receivers:
+      if receiver in running and receiver.poll(1):
+        sent = receiver.recv()
+        if sent is None:
+          running.discard(receiver)
+        else:
+          latencies.append(time.time() - sent)
+
+
+def waiting_collector(receivers, latencies):
+  "the collector the components use now: wait on all pipes at once"
+  results = connectionSet.ConnectionSet(receivers)
+  while len(results):
+    for receiver in results.wait():
+      sent = receiver.recv()
+      if sent is None:
+        results.remove(receiver)
+      else:
+        latencies.append(time.time() - sent)
+
+
+def run(collector, cWorkers, rate, duration):
+  "latencies in seconds of all results sent by *cWorkers* workers"
+  pipes = [ multiprocessing.Pipe(duplex = False) for i in range(cWorkers) ]
+  workers = [ multiprocessing.Process(target = worker_task, \
+    args = (pipes[i][1], rate / float(cWorkers), duration, i)) \
+    for i in range(cWorkers) ]
+  for p in workers:
+    p.start()
+  latencies = []
+  collector([ receiver for receiver, sender in pipes ], latencies)
+  for p in workers:
+    p.join()
+  return sorted(latencies)
+
+
+def percentile(values, p):
+  return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+
+def main(rate = 200.0, duration = 5.0):
+  print "%8s %10s %8s %11s %11s %11s %11s" % ("workers", "collector", \
+    "results", "mean (ms)", "p50 (ms)", "p99 (ms)", "max (ms)")
+  for cWorkers in (1, 2, 4, 8, 16):
+    for name, collector in (("polling", polling_collector), \
+      ("waiting", waiting_collector)):
+      latencies = run(collector, cWorkers, rate, duration)
+      if not latencies:
+        continue
+      print "%8i %10s %8i %11.3f %11.3f %11.3f %11.3f" % (cWorkers, name, \
+        len(latencies), sum(latencies) / len(latencies) * 1000, \
+        percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000, \
+        latencies[-1] * 1000)
+
+
+if __name__ == "__main__":
+  main(float(sys.argv[1]) if len(sys.argv) > 1 else 200.0, \
+    float(sys.argv[2]) if len(sys.argv) > 2 else 5.0)
@@ -0,0 +1,193 @@
+"""
+a compact, array-backed representation of the topology used by the
+complexEvaluation_*.py components
+
+dpids are mapped to dense indices 0..n-1 and the links are laid out in CSR
+form: the links of node i occupy the slots offsets[i]..offsets[i+1]-1 of the
+*neighbors* (index of the node at the other end), *ports* (out-port) and
+*costs* arrays; a link appears once in the slots of each of its end nodes
+
+compared with the adjacency table { dpid: { dpid: (outport, cost) } } this
+takes ten bytes per link end instead of a dict entry, a tuple and its ints,
+and Dijkstra's algorithm runs over plain integer indices
+
+a removed link keeps its slots with a cost of -1; only a link between nodes
+that have no slot for it yet makes the arrays be laid out again
+"""
+
+from array import array
+import heapq
+
+INFINITY = float("inf")
+REMOVED = -1 # the cost of the slots of a removed link
+MAX_PORT = 0xfeff # the highest physical OpenFlow 1.0 port
+MAX_COST = 0x7fffffff # the highest cost the arrays hold
+
+
+def check_port(port):
+  "raises ValueError unless *port* is a physical port number"
+  if isinstance(port, bool) or not isinstance(port, (int, long)) \
+    or not 1 <= port <= MAX_PORT:
+    raise ValueError("port %r is not in 1..%i" % (port, MAX_PORT))
+
+
+def check_cost(cost):
+  "raises ValueError unless *cost* is a link cost, a positive integer; "
+  "0 would let paths loop and -1 would mark the link removed"
+  if isinstance(cost, bool) or not isinstance(cost, (int, long)) \
+    or not 1 <= cost <= MAX_COST:
+    raise ValueError("link cost %r is not in 1..%i" % (cost, MAX_COST))
+
+
+class CompactGraph(object):
+  "the topology in CSR form"
+
+  def __init__(self, links, dpids = ()):
+    "*links* are tuples (dpid1, dpid2, port1, port2, cost), the format the "
+    "components list their links in; *dpids* may add nodes without links"
+    self._build(links, dpids)
+
+  def _build(self, links, dpids):
+    "lays the arrays out; they replace those of the graph only once all of "
+    "them have been filled"
+    nodes = set(dpids)
+    for tp in links:
+      nodes.add(tp[0])
+      nodes.add(tp[1])
+    dpids = sorted(nodes)
+    index = { dpid: i for i, dpid in enumerate(dpids) }
+
+    # count the links of every node to find where its slots begin
+    degrees = [0] * len(dpids)
+    for tp in links:
+      degrees[index[tp[0]]] += 1
+      degrees[index[tp[1]]] += 1
+    offsets = [0]
+    for degree in degrees:
+      offsets.append(offsets[-1] + degree)
+    cSlots = offsets[-1]
+    neighbors = array("I", [0]) * cSlots
+    ports = array("H", [0]) * cSlots
+    costs = array("i", [0]) * cSlots
+    fill = offsets[:-1] # the next free slot of every node
+    for dpid1, dpid2, port1, port2, cost in links:
+      for a, b, port in ((index[dpid1], index[dpid2], port1), \
+        (index[dpid2], index[dpid1], port2)):
+        slot = fill[a]
+        fill[a] += 1
+        neighbors[slot] = b
+        ports[slot] = port
+        costs[slot] = cost
+
+    self.dpids, self.index = dpids, index
+    self.offsets = array("I", offsets)
+    self.neighbors, self.ports, self.costs = neighbors, ports, costs
+
+  def __len__(self):
+    return len(self.dpids)
+
+  def __contains__(self, dpid):
+    return dpid in self.index
+
+  def slot(self, dpid1, dpid2):
+    "the slot of the link from *dpid1* to *dpid2*, removed or not; "
+    "None if there is none"
+    i, j = self.index.get(dpid1), self.index.get(dpid2)
+    if i is None or j is None:
+      return None
+    neighbors = self.neighbors
+    for slot in xrange(self.offsets[i], self.offsets[i + 1]):
+      if neighbors[slot] == j:
+        return slot
+    return None
+
+  def link(self, dpid1, dpid2):
+    "(outport, cost) of the link from *dpid1* to *dpid2*; None if there is none"
+    slot = self.slot(dpid1, dpid2)
+    if slot is None or self.costs[slot] == REMOVED:
+      return None
+    return (self.ports[slot], self.costs[slot])
+
+  def neighbors_of(self, dpid):
+    "(neighbor dpid, outport, cost) of every link of *dpid*"
+    i = self.index[dpid]
+    dpids, neighbors, ports, costs = \
+      self.dpids, self.neighbors, self.ports, self.costs
+    return [ (dpids[neighbors[slot]], ports[slot], costs[slot]) \
+      for slot in xrange(self.offsets[i], self.offsets[i + 1]) \
+      if costs[slot] != REMOVED ]
+
+  def links(self):
+    "every link once, as a tuple (dpid1, dpid2, port1, port2, cost)"
+    dpids, neighbors, ports, costs = \
+      self.dpids, self.neighbors, self.ports, self.costs
+    for i in xrange(len(dpids)):
+      for slot in xrange(self.offsets[i], self.offsets[i + 1]):
+        j = neighbors[slot]
+        if i < j and costs[slot] != REMOVED:
+          back = self.slot(dpids[j], dpids[i])
+          yield (dpids[i], dpids[j], ports[slot], ports[back], costs[slot])
+
+  def set_link(self, dpid1, dpid2, port1, port2, cost):
+    "adds a link, or replaces the ports and cost of an existing one; "
+    "returns False if the arrays had to be laid out again for it; a bad "
+    "port or cost raises ValueError and leaves the graph as it was"
+    check_port(port1)
+    check_port(port2)
+    check_cost(cost)
+    slot1, slot2 = self.slot(dpid1, dpid2), self.slot(dpid2, dpid1)
+    if slot1 is None:
+      self._build(list(self.links()) + [(dpid1, dpid2, port1, port2, cost)], \
+        self.dpids)
+      return False
+    self.ports[slot1], self.costs[slot1] = port1, cost
+    self.ports[slot2], self.costs[slot2] = port2, cost
+    return True
+
+  def remove_link(self, dpid1, dpid2):
+    "removes a link; its slots stay, so it can be added again in place"
+    for slot in (self.slot(dpid1, dpid2), self.slot(dpid2, dpid1)):
+      self.costs[slot] = REMOVED
+
+  def dijkstra(self, source, target = None):
+    "binary heap Dijkstra over node indices from index *source*, stopping "
+    "early once index *target* is settled; returns the distance and the "
+    "predecessor index (-1 for none) of every node"
+    cNodes = len(self.dpids)
+    offsets, neighbors, costs = self.offsets, self.neighbors, self.costs
+    dist = [INFINITY] * cNodes
+    pred = [-1] * cNodes
+    closed = [False] * cNodes
+    dist[source] = 0
+    heap = [(0, source)]
+    heappush, heappop = heapq.heappush, heapq.heappop
+    while heap:
+      distance, node = heappop(heap)
+      if closed[node]: # a stale entry
+        continue
+      closed[node] = True
+      if node == target:
+        break
+      for slot in xrange(offsets[node], offsets[node + 1]):
+        neighbor = neighbors[slot]
+        cost = costs[slot]
+        if closed[neighbor] or cost == REMOVED:
+          continue
+        newDistance = distance + cost
+        if newDistance < dist[neighbor]:
+          dist[neighbor] = newDistance
+          pred[neighbor] = node
+          heappush(heap, (newDistance, neighbor))
+    return dist, pred
+
+  def out_port(self, start, end):
+    "the port through which *start* should send a packet heading for *end*; "
+    "None if *end* cannot be reached"
+    i, j = self.index[start], self.index[end]
+    dist, pred = self.dijkstra(i, j)
+    if pred[j] == -1:
+      return None
+    succ = j
+    while pred[succ] != i:
+      succ = pred[succ]
+    return self.ports[self.slot(start, self.dpids[succ])]
@@ -4,339 +4,664 @@ Python-based SDN controllers
 
 this component works together with Mininet and complexTopo.py
 
-There are two working modes which can be switched interactively by the user
-during runtime: monoprocessing and multiprocessing
-
-the user can also trigger a change of the costs of all links in the topo
-
-the number of worker processes can be changed in runtime
+There are three working modes which can be switched interactively by the user
+during runtime: monoprocessing, multiprocessing and a pool of cThreads=...
+threads in the main process (see threadPool.py)
+
+the user can also trigger a change of the costs of all links in the topo,
+or change the cost of, add or remove a single link
+
+the number of worker processes can be changed in runtime; the pool grows or
+shrinks (a worker stopped finishes what it has been sent first), respawns a
+worker that dies and stops them all when POX goes down (see workerPool.py)
+
+the latency of every stage a PacketIn goes through and the queue depth of
+every worker are measured (stageStats.py); see stats, show_stats, dump_stats
+and reset_stats
+
+the PacketIns in flight to a worker can be bounded (inFlight=...), those
+beyond the bound being shed by an overload policy (overload=dropOldest,
+local, flood or drop; see backpressure.py); see change_backpressure
+
+the worker of a PacketIn is chosen round robin, or by the PacketIns in flight
+to the workers (scheduler=leastLoaded or twoChoices; see workerScheduler.py);
+see change_scheduler
+
+flow entries can be installed along the whole computed path, so that later
+packets of the host are forwarded by the switches without the controller;
+this can be switched at launch (flowmod=1) and in runtime
+
+packets are routed towards the switch their destination MAC has been learned
+at, and flooded along a spanning tree while it is unknown (hostTracker.py);
+the tree towards a switch is grown the first time a packet heads for it, or
+for every switch at once with allPairs=1 (see allPairs.py, using NumPy if
+available)
+
+the routing state is changed on a thread of its own and published as
+versioned snapshots that are never changed afterwards: a PacketIn is answered
+from one snapshot throughout, the workers switch over before they are sent
+a PacketIn handled with a newer one, and every result names the version it
+was computed from; a PacketIn a worker's store cannot answer is sent back
+and answered in the main process (see routingSnapshots.py); until the
+snapshot holding the tree towards a new destination is published, the
+packets heading for it are flooded
+
+the switches and links are read from a topology file, complexTopo.json unless
+another one is given at launch (topo=path; see topologyFile.py), or generated
+(e.g. topo=fatTree,8; see topoGenerators.py)
 """
 
 from pox.core import core
 import pox.openflow.libopenflow_01 as of
+from pox.lib.addresses import EthAddr
 import multiprocessing
 import threading
 import random
+import time
+
+import backpressure
+import batchDispatcher
+import connectionSet
+import compactGraph
+import hostTracker
+import packetHeaders
+import packetOut
+import routingSnapshots
+import shortestPath
+import stageStats
+import topoGenerators
+import threadPool
+import topologyStore
+import workerPool
+import workerScheduler
 
 log = core.getLogger()
 
 
-def launch(cWorkerProcesses = 1, mode = 1):
+def launch(cWorkerProcesses = 1, mode = 1, flowmod = 0, idleTimeout = 10, \
+  hardTimeout = 30, batchSize = 1, batchDelay = 200, topo = None, \
+  inFlight = 0, overload = backpressure.DROP_OLDEST, \
+  scheduler = workerScheduler.ROUND_ROBIN, cThreads = 4, allPairs = 0):
   "launch the component: construct an instance of *Evaluation*"
   
-  inst = Evaluation(cWorkerProcesses, mode)
+  inst = Evaluation(cWorkerProcesses, mode, flowmod, idleTimeout, hardTimeout, \
+    batchSize, batchDelay, topo, inFlight, overload, scheduler, cThreads, \
+    allPairs)
   core.openflow.addListeners(inst) # for listening to ConnectionUp and PacketIn
+  core.addListeners(inst) # for stopping the workers when POX goes down
   core.register("evaluation", inst) # for user interaction
 
 
 class Evaluation(object):
   "carrying all functionalities for this evaluation"
 
-  def __init__(self, cWorkerProcesses, mode):
+  def __init__(self, cWorkerProcesses, mode, flowmod, idleTimeout, hardTimeout, \
+    batchSize, batchDelay, topo = None, inFlight = 0, \
+    overload = backpressure.DROP_OLDEST, \
+    scheduler = workerScheduler.ROUND_ROBIN, cThreads = 4, allPairs = 0):
     log.info(" the *Evaluation* instance is initiating")
 
-    # initialization of objects related to multiprocessing
-    self.maxcWorkers = 0
-    self.g1Receivers = []
-    self.g1Senders = []
-    self.g2Receivers = []
-    self.g2Senders = []
-    self.workerProcesses = []
+    # the switches and links, read once; only their costs are regenerated
+    self.topology = topoGenerators.topology(topo)
+    log.info(" %i switches and %i links have been loaded" \
+      % (len(self.topology.switches), len(self.topology.links)))
+
+    # the latency of every stage and the counters, shared with the workers
+    self.stageStats = stageStats.StageStats()
 
-    # semaphore
-    self.sema = threading.Semaphore()
+    # at most *inFlight* PacketIns in flight to a worker (0 for no bound),
+    # those beyond shed by the *overload* policy
+    self.backpressure = backpressure.Backpressure(self.stageStats, \
+      int(inFlight), overload)
+
+    # the choice of the worker of every PacketIn
+    self.scheduler = workerScheduler.WorkerScheduler(self.stageStats, \
+      scheduler)
 
     # set the working mode
     self.change_mode(int(mode))
 
-    # launch the thread to send openflow messages to switches
+    # launch the thread to send openflow messages to switches; it waits on
+    # the result pipes of all worker processes at once
+    self.results = connectionSet.ConnectionSet()
     self.msgSendingThread = threading.Thread( \
-      target = msg_sending_thread_task, args = (self.g2Receivers, self.sema,))
+      target = msg_sending_thread_task, args = (self.results, self.stageStats, \
+      self.handle_in_thread))
+    self.msgSendingThread.daemon = True
     self.msgSendingThread.start()
 
-    # randomly generate link costs
+    # the packet_out messages of monoprocessing mode are filled into a
+    # preallocated template
+    self.packetOut = packetOut.PacketOutTemplate()
+
+    # PacketIns are sent to the workers in batches of up to *batchSize*,
+    # each waiting *batchDelay* microseconds at most
+    self.dispatcher = batchDispatcher.BatchDispatcher([], \
+      int(batchSize), int(batchDelay))
+
+    # whether to install flow entries along the path instead of only
+    # sending each packet out
+    self.change_flowmod(flowmod, idleTimeout, hardTimeout)
+
+    # randomly generate link costs; the routing state is changed by the
+    # builder thread alone, and each change is published as a snapshot: the
+    # topology and the next-hop table in a store shared with the worker
+    # processes
+    self.snapshot = None
+    self.routing = None
+    self.hosts = None
+    self.pending = set() # destinations whose trees are being grown
+    # whether every switch is a destination from the start, the table of
+    # all pairs being computed at once
+    self.allPairs = bool(int(allPairs))
+    self.builder = routingSnapshots.SnapshotBuilder(self.swap_snapshot, log)
     self.regenerate_link_costs()
+    self.builder.wait() # the workers start with the first snapshot
 
-    # launch worker processes
+    # launch worker processes; they are respawned if they die
+    self.pool = workerPool.WorkerPool(self.spawn_worker, self.dispatcher, \
+      self.stageStats, log)
+    self.cWorkerProcesses = 0
     self.change_num_worker_processes(int(cWorkerProcesses))
 
+    # the threads of mode 3, doing the work of the workers in this process
+    self.threadPool = threadPool.ThreadPool(self.handle_in_thread, \
+      core.openflow.sendToDPID, self.stageStats, int(cThreads))
+
+
+  def _handle_ConnectionUp(self, event):
+    "notes the ports of the switch, the edge ones among them are flooded"
+    log.info(" controlling %s" % (event.connection,))
+    self.hosts.add_switch(event.dpid, \
+      [ port.port_no for port in event.ofp.ports ])
 
-  # def _handle_ConnectionUp(self, event):
-  #   "add a listener to this connection"
-  #   log.info(" controlling %s" % (event.connection,))
-  #   event.connection.addListeners(self)
-  
   def change_num_worker_processes(self, newNum):
+    "grows or shrinks the pool to *newNum* worker processes; those stopped "
+    "finish the PacketIns they have been sent first "
+    "works with component py; will be invoked by the user and the class"
+    newNum = max(1, int(newNum))
+    if newNum < self.cWorkerProcesses: # no PacketIns for those to be stopped
+      self.cWorkerProcesses = newNum
+    self.pool.resize(newNum)
     self.cWorkerProcesses = newNum
     self.iProcess = -1
-    if newNum > self.maxcWorkers:
-      # spawn new pipes and worker processes
-      diff = newNum - self.maxcWorkers
-      newG1PipePairs = [ multiprocessing.Pipe(duplex=False) for i in range(diff) ]
-      newG2PipePairs = [ multiprocessing.Pipe(duplex=False) for i in range(diff) ]
-      newG1Receivers, newG1Senders = zip(*newG1PipePairs)
-      newG2Receivers, newG2Senders = zip(*newG2PipePairs)
-      newWorkers = [ multiprocessing.Process( \
-        target = worker_process_task, args = (newG1Receivers[i], newG2Senders[i],)) \
-        for i in range(diff) ]
-      for p in newWorkers:
-        p.start()
-      # scatter the adjacency table to the new worker processes
-      # (1 --- indicating this message contains an adjacency table, the table)
-      for sender in newG1Senders:
-        sender.send((1, self.adjTable,))
-      # append the references to self.
-      self.g1Receivers += list(newG1Receivers)
-      self.g1Senders += list(newG1Senders)
-      self.g2Receivers += list(newG2Receivers)
-      self.g2Senders += list(newG2Senders)
-      self.workerProcesses += newWorkers
-      self.maxcWorkers = newNum
 
     log.info(" number of active worker processes: %i" % (self.cWorkerProcesses,))
-    log.info(" number of spawned worker processes: %i" % (self.maxcWorkers,))
+    log.info(" number of worker processes draining: %i" \
+      % (len(self.pool.draining),))
+
+  def spawn_worker(self, i, stats):
+    "starts worker process *i* with the current store and flow entry "
+    "settings; called by the pool with the dispatcher held"
+    g1Receiver, g1Sender = multiprocessing.Pipe(duplex=False)
+    g2Receiver, g2Sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target = worker_process_task, \
+      args = (g1Receiver, g2Sender, self.snapshot.store.path, self.flowEntries, \
+      stats))
+    process.daemon = True
+    process.start()
+    # held by the worker alone, so its death closes the pipes
+    g1Receiver.close()
+    g2Sender.close()
+    self.results.add([g2Receiver])
+    return workerPool.Worker(process, g1Sender, g2Receiver)
+
+  def _handle_GoingDownEvent(self, event):
+    "stops the worker processes and removes the store"
+    self.builder.shutdown() # the store of a change running is published
+    self.pool.shutdown()
+    self.threadPool.resize(0)
+    self.snapshot.close()
+    log.info(" the worker processes have been stopped")
 
 
   def _handle_PacketIn(self, event):
     "multiprocessing: send necessary information of this packet to a worker process"
     "monoprocessing: immediately compute the packet's out-port and send msg out"
+    began = time.time()
     log.debug(" PacketIn event contains dpid == %i" % (event.dpid,))
 
-    if self.mode != 1: # multiprocessing mode
-      # information needed for a worker process to compute the shortest path to
-      # the destination: tuple (0 --- indication that packet info is contained in 
-      # this message, (source of the packet, dpid, buffer id of the packet))
-      self.iProcess = (self.iProcess + 1) % self.cWorkerProcesses
-      self.g1Senders[self.iProcess].send( \
-        (0, (event.parsed.src, event.dpid, event.ofp.buffer_id)) )
+    # learn where the source host is attached, and look the destination up
+    srcMAC, dstMAC = packetHeaders.event_macs(event)
+    start, bufferID = event.dpid, event.ofp.buffer_id
+    if self.hosts.learn(srcMAC, start, event.port):
+      log.info(" host %012x is attached to port %i of %i" \
+        % (srcMAC, event.port, start))
+    snapshot = self.snapshot # the routing may change while this runs
+    location = self.hosts.locate(dstMAC)
+    if location is None or location[0] not in snapshot.view.index:
+      self.flood(event) # an unknown, broadcast or multicast destination
+      self.stageStats.handled(began)
+      return
+    end, hostPort = location # the target switch and its port to the host
+    if end not in snapshot.view.destIndex: # no tree towards it yet
+      self.add_destination(end)
+      self.flood(event)
+      self.stageStats.handled(began)
+      return
+
+    if self.mode == 2: # multiprocessing mode
+      # information needed for a worker process to look up the out-port towards
+      # the destination: (destination MAC of the packet as an integer, dpid,
+      # buffer id of the packet, target switch, its port to the host, version
+      # of the snapshot it was handled with, time the handler began);
+      # the dispatcher sends it as (0 --- indication that packet info is
+      # contained in this message, the info) or batched with others as
+      # (3 --- indication of a batch of packet info, [the info])
+      self.iProcess = self.scheduler.pick(self.iProcess, self.cWorkerProcesses)
+      if self.backpressure.admit(self.iProcess):
+        self.dispatcher.dispatch(self.iProcess, (dstMAC, start, bufferID, \
+          end, hostPort, snapshot.version, began))
+        self.stageStats.dispatched(self.iProcess, began)
+      else: # the worker has as many in flight as it may
+        self.shed(event, snapshot, dstMAC, start, bufferID, end, hostPort)
+        self.stageStats.handled(began)
+    elif self.mode == 3: # a thread of the pool
+      self.threadPool.submit((dstMAC, start, bufferID, end, hostPort, \
+        snapshot.version, began))
+      self.stageStats.dispatched(None, began)
     else: # monoprocessing
-      # acquire the info about this packet
-      srcMAC, start, bufferID = event.parsed.src, event.dpid, event.ofp.buffer_id
-
-      # Dijkstra's algorithm, computing the output port for the packet
-      # preparations
-      closed = { x: False for x in self.adjTable.keys() }
-      d = { x: 10000 for x in self.adjTable.keys() } # 10000 is the infinite value
-      pred = { x: None for x in self.adjTable.keys() } # predecessor of each node
-      d[start] = 0
-      cOpenNodes = len(closed)
-      end = 200 if str(srcMAC) == "10:10:10:00:00:00" else 100 # the target
-      # running: the distance to each other node is to be calculated
-      while cOpenNodes > 0:
-        # take out the node with the smallest *d*
-        distance = 10000
-        node = -1
-        for switch, dist in d.iteritems():
-          if not closed[switch] and dist < distance:
-            distance = dist
-            node = switch
-        closed[node] = True
-        cOpenNodes -= 1
-        if node == end:
-          break
-        for neighbor, info in self.adjTable[node].iteritems():
-          if closed[neighbor]:
-            continue
-          if distance + info[1] < d[neighbor]:
-            d[neighbor] = distance + info[1]
-            pred[neighbor] = node
-
-      # extract the desired result
-      succ = end
-      while pred[succ] != start:
-        succ = pred[succ]
-      outport = self.adjTable[start][succ][0]
-
-      # construct ofp_packet_out message 
-      msg = of.ofp_packet_out()
-      msg.actions.append(of.ofp_action_output(port = outport))
-      msg.buffer_id = bufferID
-      core.openflow.sendToDPID(start, msg)
-      
+      self.answer(snapshot, dstMAC, start, bufferID, end, hostPort)
+      self.stageStats.handled(began)
+
+  def answer(self, snapshot, dstMAC, start, bufferID, end, hostPort):
+    "monoprocessing: computes the packet's out-port from *snapshot*, the "
+    "one the PacketIn has been handled with, and sends msg out"
+    # look up the output port for the packet in the next-hop table
+    if start == end: # the host is attached to this switch
+      outport = hostPort
+    else:
+      outport = snapshot.view.next_hop(start, end)
+      if outport is None: # the host cannot be reached from here any more
+        return
+
+    if self.flowmod: # install the whole path, releasing the packet at start
+      for msg, dpid in path_flow_mods( \
+        snapshot.view.path(start, end) + [(end, hostPort)], \
+        dstMAC, bufferID, self.idleTimeout, self.hardTimeout):
+        core.openflow.sendToDPID(dpid, msg)
+      return
+
+    # fill ofp_packet_out message into the template
+    core.openflow.sendToDPID(start, \
+      self.packetOut.message(bufferID, outport))
+
+  def handle_in_thread(self, packetInfo, records, msgs):
+    "mode 3: looks the packet's out-port up as a worker process does, in a "
+    "thread of the pool, or in the collecting thread for a PacketIn a worker "
+    "has sent back; returns the version of the snapshot used"
+    snapshot = self.snapshot
+    handle_packet(snapshot.view, self.flowEntries, packetInfo, records, msgs)
+    return snapshot.version
+
+  def shed(self, event, snapshot, dstMAC, start, bufferID, end, hostPort):
+    "answers a PacketIn a worker cannot take by the overload policy"
+    policy = self.backpressure.policy
+    if policy == backpressure.LOCAL:
+      self.answer(snapshot, dstMAC, start, bufferID, end, hostPort)
+    elif policy == backpressure.FLOOD:
+      self.flood(event)
+    else: # the switch is told to drop the packet
+      core.openflow.sendToDPID(start, \
+        self.packetOut.drop(bufferID, event.port))
+
+  def flood(self, event):
+    "sends the packet of a PacketIn out of the ports its switch floods "
+    "through, which keeps it on the spanning tree of the topology"
+    ports = self.hosts.flood_ports(event.dpid, event.port)
+    msg = of.ofp_packet_out()
+    msg.data = event.ofp # the buffered packet, or its data if unbuffered
+    for port in ports:
+      msg.actions.append(of.ofp_action_output(port = port))
+    core.openflow.sendToDPID(event.dpid, msg)
+
+  def add_destination(self, dpid):
+    "has the shortest path tree towards switch *dpid* grown, the first time "
+    "a packet heads for a host attached to it, and a snapshot that holds its "
+    "next-hop entries published"
+    if dpid not in self.pending:
+      self.pending.add(dpid)
+      self.builder.submit(self._add_destination, dpid)
+
+  def _add_destination(self, dpid):
+    "run by the builder"
+    if dpid not in self.routing.destIndex:
+      self.routing.add_destination(dpid)
+      self.publish()
+      log.info(" switch %i has become a destination" % (dpid,))
+    self.pending.discard(dpid)
 
   def change_mode(self, mode):
-    "mode 1 - monoprocessing; mode 2 - multiprocessing "
+    "mode 1 - monoprocessing; mode 2 - multiprocessing; "
+    "mode 3 - a pool of threads "
     "works with component py; will be invoked by the user and the class"
 
-    self.mode = mode
+    self.mode = int(mode)
 
-    # semaphore
-    if mode == 1:
-      self.sema.acquire()
-    else:
-      self.sema.release()
+    log.info(" now working in %s mode" % ({ 1: "monoprocessing", \
+      2: "multiprocessing", 3: "thread pool" }.get(self.mode, "unknown"),))
+
+  def change_num_threads(self, newNum):
+    "grows or shrinks the thread pool of mode 3 to *newNum* threads "
+    "works with component py; will be invoked by the user"
+
+    self.threadPool.resize(max(1, int(newNum)))
+    log.info(" number of threads in the pool: %i" % (len(self.threadPool),))
+
+  def change_flowmod(self, flowmod, idleTimeout = None, hardTimeout = None):
+    "flowmod 1 - install flow entries along the computed path; "
+    "flowmod 0 - only send each packet out (ofp_packet_out) "
+    "works with component py; will be invoked by the user and the class"
 
-    log.info(" now working in %s mode" \
-      % ("monoprocessing" if mode == 1 else "multiprocessing",))
+    self.flowmod = int(flowmod)
+    if idleTimeout is not None:
+      self.idleTimeout = int(idleTimeout)
+    if hardTimeout is not None:
+      self.hardTimeout = int(hardTimeout)
+
+    # scatter the settings to worker processes
+    # (2 --- indicating this message contains flow entry settings,
+    # (flowmod, idle timeout, hard timeout))
+    self.flowEntries = (self.flowmod, self.idleTimeout, self.hardTimeout)
+    self.dispatcher.broadcast((2, self.flowEntries,))
+
+    log.info(" flow entries are %s (idle timeout %i s, hard timeout %i s)" \
+      % ("installed" if self.flowmod else "not installed", \
+      self.idleTimeout, self.hardTimeout))
+
+  def change_batching(self, batchSize, batchDelay = None):
+    "sends PacketIns to a worker in batches of up to *batchSize*, each waiting "
+    "*batchDelay* microseconds at most; a size of 1 sends each one at once "
+    "works with component py; will be invoked by the user"
+
+    self.dispatcher.change(batchSize, batchDelay)
+    log.info(" PacketIns are sent to workers in batches of up to %i, " \
+      "waiting %i us at most" % (self.dispatcher.batchSize, \
+      self.dispatcher.batchDelay * 1000000))
+
+  def change_backpressure(self, inFlight, overload = None):
+    "bounds the PacketIns in flight to a worker to *inFlight*, 0 for no "
+    "bound, shedding those beyond by the *overload* policy: dropOldest, "
+    "local, flood or drop "
+    "works with component py; will be invoked by the user"
+
+    self.backpressure.change(inFlight, overload)
+    log.info(" PacketIns in flight to a worker: %s; overload policy: %s" \
+      % (self.backpressure.limit or "unbounded", self.backpressure.policy))
+
+  def change_scheduler(self, scheduler):
+    "chooses the worker of every PacketIn by *scheduler*: roundRobin, "
+    "leastLoaded or twoChoices "
+    "works with component py; will be invoked by the user"
+
+    self.scheduler.change(scheduler)
+    log.info(" workers are chosen by %s" % (scheduler,))
+
+  def stats(self):
+    "the latency of every stage (in ms) and the counters "
+    "works with component py; will be invoked by the user"
+    return self.stageStats.report()
+
+  def show_stats(self):
+    "logs the latency of every stage and the counters "
+    "works with component py; will be invoked by the user"
+    for line in self.stageStats.table():
+      log.info(" " + line)
+
+  def dump_stats(self, path):
+    "appends the stats and the histograms to the file at *path* as JSON "
+    "works with component py; will be invoked by the user"
+    self.stageStats.dump(path)
+    log.info(" the stats have been written to %s" % (path,))
+
+  def reset_stats(self):
+    "starts measuring the latencies anew "
+    "works with component py; will be invoked by the user"
+    self.stageStats.reset()
 
   def regenerate_link_costs(self):
-    "randomly assigns costs of links in topology *ComplextTopo* "
-    "and distributes this information to worker processes "
+    "randomly assigns costs of the links of the topology file "
+    "and publishes the resulting next-hop table in a new snapshot "
     "works with component py; will be invoked by both the user and the class"
+    self.builder.submit(self._regenerate_link_costs)
 
-    # all dpids
-    dpids = [ x + y for x in range(10, 80, 10) for y in range(1, 4) ]
-    # 100 and 200 are dummy dpids to identify the two hosts
-    dpids.append(100)
-    dpids.append(200)
-    dpids.append(1)
-    dpids.append(2)
+  def _regenerate_link_costs(self):
+    "run by the builder"
 
-    # a collection of all links
+    # a collection of all links: (dpid1, dpid2, port1, port2, link cost)
     random.seed()
-    # (dpid1, dpid2, port1, port2, link cost)
-    links = [ \
-      (100, 1, 1, 1, random.randint(1, 100)),
-
-      (1, 11, 2, 1, random.randint(1, 100)),
-      (1, 12, 3, 2, random.randint(1, 100)),
-      (1, 13, 4, 1, random.randint(1, 100)),
-
-      (11, 12, 2, 1, random.randint(1, 100)),
-      (12, 13, 3, 2, random.randint(1, 100)),
-      
-      (11, 21, 4, 1, random.randint(1, 100)),
-      (11, 22, 3, 2, random.randint(1, 100)),
-      (12, 22, 4, 3, random.randint(1, 100)),
-      (13, 22, 3, 4, random.randint(1, 100)),
-      (13, 23, 4, 1, random.randint(1, 100)),
-
-      (21, 22, 2, 1, random.randint(1, 100)),
-      (22, 23, 5, 2, random.randint(1, 100)),
-
-      (21, 31, 3, 1, random.randint(1, 100)),
-      (22, 31, 8, 2, random.randint(1, 100)),
-      (22, 32, 7, 2, random.randint(1, 100)),
-      (22, 33, 6, 2, random.randint(1, 100)),
-      (23, 33, 3, 1, random.randint(1, 100)),
-
-      (31, 32, 3, 1, random.randint(1, 100)),
-      (32, 33, 3, 3, random.randint(1, 100)),
-
-      (31, 41, 5, 1, random.randint(1, 100)),
-      (31, 42, 4, 2, random.randint(1, 100)),
-      (32, 42, 4, 3, random.randint(1, 100)),
-      (33, 42, 4, 4, random.randint(1, 100)),
-      (33, 43, 5, 1, random.randint(1, 100)),
-
-      (41, 42, 2, 1, random.randint(1, 100)),
-      (42, 43, 5, 2, random.randint(1, 100)),
-
-      (41, 51, 3, 1, random.randint(1, 100)),
-      (42, 51, 8, 2, random.randint(1, 100)),
-      (42, 52, 7, 2, random.randint(1, 100)),
-      (42, 53, 6, 2, random.randint(1, 100)),
-      (43, 53, 3, 1, random.randint(1, 100)),
-
-      (51, 52, 3, 1, random.randint(1, 100)),
-      (52, 53, 3, 3, random.randint(1, 100)),
-
-      (51, 61, 5, 1, random.randint(1, 100)),
-      (51, 62, 4, 2, random.randint(1, 100)),
-      (52, 62, 4, 3, random.randint(1, 100)),
-      (53, 62, 4, 4, random.randint(1, 100)),
-      (53, 63, 5, 1, random.randint(1, 100)),
-
-      (61, 62, 2, 1, random.randint(1, 100)),
-      (62, 63, 5, 2, random.randint(1, 100)),
-
-      (61, 71, 3, 1, random.randint(1, 100)),
-      (62, 71, 8, 2, random.randint(1, 100)),
-      (62, 72, 7, 2, random.randint(1, 100)),
-      (62, 73, 6, 2, random.randint(1, 100)),
-      (63, 73, 3, 1, random.randint(1, 100)),
-
-      (71, 72, 3, 1, random.randint(1, 100)),
-      (72, 73, 3, 3, random.randint(1, 100)),
-
-      (71, 2, 4, 2, random.randint(1, 100)),
-      (72, 2, 4, 3, random.randint(1, 100)),
-      (73, 2, 4, 4, random.randint(1, 100)),
-
-      (2, 200, 1, 1, random.randint(1, 100))
-      ]
-
-    # an adjacency table
-    self.adjTable = { dpid: {} for dpid in dpids }
-    for tp in links:
-      # set an entry for each node on a link
-      self.adjTable[tp[0]][tp[1]] = (tp[2], tp[4],) # (outport, cost)
-      self.adjTable[tp[1]][tp[0]] = (tp[3], tp[4],) # (outport, cost)
-
-    # scatter the adjacency table to worker processes
-    # (1 --- indicating this message contains an adjacency table, the table)
-    for sender in self.g1Senders:
-      sender.send((1, self.adjTable,))
-
-    log.info(" link costs have been regenerated, stored and sent to workers")
-    log.info(" the new adjacency table: %s" % (self.adjTable,))
-
-
-def worker_process_task(g1Receiver, g2Sender):
-  "a worker process receives topo (including link costs) "
-  "and packet information, and compute the shortest path"
-  adjTable = {}
+    links = self.topology.weighted_links(lambda: random.randint(1, 100))
+
+    # the topology in compact form: dense node indices and arrays of the
+    # neighbors, out-ports and costs of all nodes
+    self.graph = compactGraph.CompactGraph(links, self.topology.switches)
+
+    # the shortest path trees towards the switches hosts have been found at,
+    # and the resulting out-port of every node; a PacketIn just looks its
+    # out-port up, and a change of a single link only repairs the affected
+    # part of the trees; with *allPairs* every switch is a destination, the
+    # table comes from a single vectorised all-pairs run, and a tree is only
+    # grown when a link change may alter it
+    if self.allPairs:
+      destinations = self.topology.switches
+    elif self.routing is None:
+      destinations = ()
+    else:
+      destinations = self.routing.destinations()
+    self.routing = shortestPath.NextHopTable(self.graph, destinations, \
+      bulk = self.allPairs)
+
+    # the learned hosts stay where they are, the flooding tree is grown again
+    if self.hosts is None:
+      self.hosts = hostTracker.HostTracker(self.graph)
+    else:
+      self.hosts.update_graph(self.graph)
+
+    self.publish()
+
+    log.info(" link costs have been regenerated and published")
+    log.debug(" the new links: %s" % (list(self.graph.links()),))
+
+  def change_link_cost(self, dpid1, dpid2, cost):
+    "changes the cost of the link between *dpid1* and *dpid2* "
+    "works with component py; will be invoked by the user"
+    dpid1, dpid2, cost = int(dpid1), int(dpid2), int(cost)
+    self.check_link(dpid1, dpid2, cost)
+    self.builder.submit(lambda: self.link_changed(dpid1, dpid2, \
+      self.routing.set_link_cost(dpid1, dpid2, cost)))
+
+  def add_link(self, dpid1, dpid2, port1, port2, cost):
+    "adds a link, or replaces the ports and cost of an existing one "
+    "works with component py; will be invoked by the user"
+    dpid1, dpid2, port1, port2, cost \
+      = int(dpid1), int(dpid2), int(port1), int(port2), int(cost)
+    self.check_link(dpid1, dpid2, cost, (port1, port2))
+    self.builder.submit(lambda: self.link_changed(dpid1, dpid2, \
+      self.routing.set_link(dpid1, dpid2, port1, port2, cost)))
+
+  def remove_link(self, dpid1, dpid2):
+    "removes the link between *dpid1* and *dpid2* "
+    "works with component py; will be invoked by the user"
+    dpid1, dpid2 = int(dpid1), int(dpid2)
+    self.check_link(dpid1, dpid2)
+    self.builder.submit(lambda: self.link_changed(dpid1, dpid2, \
+      self.routing.remove_link(dpid1, dpid2)))
+
+  def check_link(self, dpid1, dpid2, cost = None, ports = None):
+    "raises ValueError for a link change the builder would refuse, so that "
+    "the user is told at once; without *ports* the link has to exist"
+    view = self.snapshot.view
+    for dpid in (dpid1, dpid2):
+      if dpid not in view.index:
+        raise ValueError("unknown switch %s" % (dpid,))
+    if ports is None:
+      if dpid2 not in [ neighbor for neighbor, port, c in view.links(dpid1) ]:
+        raise ValueError("no link between %s and %s" % (dpid1, dpid2))
+    else:
+      if dpid1 == dpid2:
+        raise ValueError("a link needs two switches")
+      for port in ports:
+        compactGraph.check_port(port)
+    if cost is not None:
+      compactGraph.check_cost(cost)
+
+  def link_changed(self, dpid1, dpid2, changes):
+    "publishes the routing after the link between *dpid1* and *dpid2* has "
+    "changed, which has changed the next-hop entries *changes*; only those "
+    "are written into a copy of the store; run by the builder"
+    self.hosts.update_graph(self.graph) # the flooding tree may have changed
+    self.builder.publish(self.graph, self.routing.destinations(), \
+      self.routing.ports, [(dpid1, dpid2)], changes)
+
+    log.info(" a link has changed; %i next-hop entries were updated" \
+      % (len(changes),))
+
+  def publish(self):
+    "publishes the routing state as the next snapshot; run by the builder"
+    self.builder.publish(self.graph, self.routing.destinations(), \
+      self.routing.ports)
+
+  def swap_snapshot(self, snapshot, submitted):
+    "puts *snapshot* in use and points the worker processes to its store; "
+    "called by the builder"
+    oldSnapshot = self.snapshot
+    # (1 --- indicating this message contains the path of a new store, the
+    # path); it is sent before a descriptor handled with the new snapshot can
+    # be dispatched, as the handler dispatches under the same lock
+    with self.dispatcher.lock:
+      self.dispatcher.send_all((1, snapshot.store.path,))
+      self.snapshot = snapshot
+    self.stageStats.swapped(snapshot.version, submitted)
+    # workers that have mapped the old store keep their mapping until they
+    # switch over; a worker that finds it removed waits for the newer path
+    if oldSnapshot is not None:
+      oldSnapshot.close()
+
+
+def worker_process_task(g1Receiver, g2Sender, storePath, flowEntries, stats):
+  "a worker process maps the store holding the topo and its next-hop table, "
+  "receives packet information, and looks up the packet's out-port; the "
+  "latency of its stages is noted in *stats*, shared with the main process"
+  try:
+    store = topologyStore.TopologyView(storePath)
+  except (IOError, OSError): # replaced before this worker got to map it; the
+    store = None # path of the newer store is on its way
   while 1:
     # receive a message from the main process
     (indicator, content) = g1Receiver.recv()
 
     # do different things for different kinds of message
-    if indicator == 1: # an adjacency table is received
-      adjTable = content
-      print "the new adjacency table has been received by one worker"
-    else: # a request to handle a packet
-      # acquire the info about this packet
-      (srcMAC, start, bufferID) = content
-
-      # Dijkstra's algorithm, computing the output port for the packet
-      # preparations
-      closed = { x: False for x in adjTable.keys() }
-      d = { x: 10000 for x in adjTable.keys() } # 10000 is the infinite value
-      pred = { x: None for x in adjTable.keys() } # predecessor of each node
-      d[start] = 0
-      cOpenNodes = len(closed)
-      end = 200 if str(srcMAC) == "10:10:10:00:00:00" else 100 # the target
-      # running: the distance to each other node is to be calculated
-      while cOpenNodes > 0:
-        # take out the node with the smallest *d*
-        distance = 10000
-        node = -1
-        for switch, dist in d.iteritems():
-          if not closed[switch] and dist < distance:
-            distance = dist
-            node = switch
-        closed[node] = True
-        cOpenNodes -= 1
-        if node == end:
-          break
-        for neighbor, info in adjTable[node].iteritems():
-          if closed[neighbor]:
-            continue
-          if distance + info[1] < d[neighbor]:
-            d[neighbor] = distance + info[1]
-            pred[neighbor] = node
-
-      # extract the desired result
-      succ = end
-      while pred[succ] != start:
-        succ = pred[succ]
-      outport = adjTable[start][succ][0]
-
-      # construct ofp_packet_out message and deliver it to main proc
-      msg = of.ofp_packet_out()
-      msg.actions.append(of.ofp_action_output(port = outport))
+    if indicator == -1: # to exit, the messages sent before have been handled
+      break
+    elif indicator == 1: # the path of a new store is received
+      try:
+        newStore = topologyStore.TopologyView(content)
+      except (IOError, OSError): # already replaced by a newer store
+        continue
+      if store is not None:
+        store.close()
+      store = newStore
+      print "the new store has been mapped by one worker"
+    elif indicator == 2: # flow entry settings are received
+      flowEntries = content
+    else: # a request to handle a packet, or a batch of them (3), answered
+      # with a single message: (the packet_out records, the other (msg, dpid),
+      # the time the first packet was dispatched, the number of packets, the
+      # time it is sent, the version of the snapshot in the store, the
+      # descriptors the store cannot answer, sent back to the main process)
+      received = time.time()
+      packetInfos = content if indicator == 3 else (content,)
+      # the oldest ones the main process has given up on are dropped
+      dropped = stats.dropping(len(packetInfos))
+      records, msgs, bounced = [], [], []
+      for i in xrange(dropped, len(packetInfos)):
+        if store is None or not handle_packet(store, flowEntries, \
+          packetInfos[i], records, msgs):
+          bounced.append(packetInfos[i])
+      stats.received(packetInfos, received, time.time(), dropped)
+      if records or msgs or bounced:
+        g2Sender.send(("".join(records), msgs, packetInfos[dropped][-1], \
+          len(packetInfos) - dropped, time.time(), \
+          store.version if store is not None else 0, bounced,))
+  if store is not None:
+    store.close()
+
+def handle_packet(store, flowEntries, packetInfo, records, msgs):
+  "looks up the packet's out-port in the shared next-hop table; appends "
+  "the packet_out record to *records*, or the (msg, dpid) pairs of the flow "
+  "entries to *msgs*, to be delivered to the main proc; False if *store* "
+  "cannot answer: it is older than the snapshot the PacketIn was handled "
+  "with, or has no next hop towards the destination"
+  # acquire the info about this packet
+  (dstMAC, start, bufferID, end, hostPort, version, began) = packetInfo
+  (flowmod, idleTimeout, hardTimeout) = flowEntries
+  if store.version < version: # the newer store could not be mapped
+    return False
+
+  # look up the output port for the packet in the shared next-hop table
+  if start == end: # the host is attached to this switch
+    outport = hostPort
+  else:
+    outport = store.next_hop(start, end)
+    if outport is None: # the host cannot be reached from here any more
+      return False
+
+  if flowmod: # install the whole path, releasing the packet at start
+    path = store.path(start, end)
+    if path is None:
+      return False
+    msgs += path_flow_mods(path + [(end, hostPort)], dstMAC, bufferID, \
+      idleTimeout, hardTimeout)
+    return True
+
+  # the main process turns the record into an ofp_packet_out message
+  records.append(packetOut.record(start, bufferID, outport))
+  return True
+
+def path_flow_mods(path, dstMAC, bufferID, idleTimeout, hardTimeout):
+  "ofp_flow_mod messages that forward packets to *dstMAC* (an integer) "
+  "along *path*, a list of (dpid, outport) ending at the host's port; the "
+  "entries are listed from the last switch backwards, and the entry of the "
+  "first switch also releases the buffered packet; returns (msg, dpid) pairs "
+  "in the order they are to be sent"
+  msgs = []
+  dstMAC = EthAddr(packetHeaders.int_to_raw(dstMAC))
+  for i in range(len(path) - 1, -1, -1):
+    dpid, outport = path[i]
+    msg = of.ofp_flow_mod()
+    msg.match.dl_dst = dstMAC
+    msg.idle_timeout = idleTimeout
+    msg.hard_timeout = hardTimeout
+    msg.actions.append(of.ofp_action_output(port = outport))
+    if i == 0:
       msg.buffer_id = bufferID
-      g2Sender.send((msg, start))
-
-def msg_sending_thread_task(g2Receivers, sema):
-  "this thread identifies the switch to whom a msg is to be sent, "
-  "then sends the msg"
+    msgs.append((msg, dpid))
+  return msgs
+
+def msg_sending_thread_task(results, stats, handle):
+  "this thread waits until any worker process has sent its results, "
+  "identifies the switch to whom each msg is to be sent, then sends the msg; "
+  "the latency of the results is noted in *stats*; the PacketIns a worker "
+  "has sent back are answered by *handle*"
   
+  template = packetOut.PacketOutTemplate()
   while 1:
-    sema.acquire()
-    for i in range(100):
-      for receiver in g2Receivers:
-        if receiver.poll(1):
-          (msg, dpid,) = receiver.recv()
-          core.openflow.sendToDPID(dpid, msg)
-    sema.release()
+    for connection in results.wait():
+      try:
+        records, msgs, dispatched, count, sent, version, bounced \
+          = connection.recv()
+      except EOFError: # the worker process has gone
+        results.remove(connection)
+        connection.close()
+        continue
+      received = time.time()
+      if bounced: # answered from the snapshot in use here
+        records = [records]
+        for packetInfo in bounced:
+          handle(packetInfo, records, msgs)
+        records = "".join(records)
+      template.send_records(records, core.openflow.sendToDPID)
+      for msg, dpid in msgs:
+        core.openflow.sendToDPID(dpid, msg)
+      stats.collected(dispatched, count, sent, received, version, \
+        len(bounced))
@@ -0,0 +1,60 @@
+"""
+a set of multiprocessing connections that one thread can block on until any of
+them has something to read
+
+the result collectors of the evaluation components used to call poll(1) on
+every worker pipe in turn, so an idle pipe held up the others for a second and
+the latency of a result depended on how many workers there were; waiting on
+all of them at once (epoll, or select where there is no epoll) hands over a
+result as soon as any worker has produced one
+
+connections can be added and removed while another thread is waiting; with
+epoll that takes effect at once, the select fallback picks it up within
+*RESCAN* seconds
+"""
+
+import select
+
+RESCAN = 0.1
+
+
+class ConnectionSet(object):
+  "connections (anything with a fileno()) to wait on"
+
+  def __init__(self, connections = ()):
+    self.connections = {} # fileno -> connection
+    self.epoll = select.epoll() if hasattr(select, "epoll") else None
+    self.add(connections)
+
+  def __len__(self):
+    return len(self.connections)
+
+  def add(self, connections):
+    for connection in connections:
+      fileno = connection.fileno()
+      self.connections[fileno] = connection
+      if self.epoll is not None:
+        self.epoll.register(fileno, select.EPOLLIN)
+
+  def remove(self, connection):
+    "stops waiting on *connection*, e.g. once its other end has been closed"
+    fileno = connection.fileno()
+    if self.connections.pop(fileno, None) is not None \
+      and self.epoll is not None:
+      self.epoll.unregister(fileno)
+
+  def wait(self, timeout = None):
+    "blocks until at least one connection is readable, or closed at the other "
+    "end, and returns those connections; an empty list after *timeout* seconds"
+    if self.epoll is not None:
+      events = self.epoll.poll(-1 if timeout is None else timeout)
+      return [ self.connections[fileno] for fileno, event in events \
+        if fileno in self.connections ]
+
+    while 1:
+      filenos = self.connections.keys()
+      readable = select.select(filenos, [], [], \
+        RESCAN if timeout is None else min(timeout, RESCAN))[0]
+      if readable or timeout is not None:
+        return [ self.connections[fileno] for fileno in readable \
+          if fileno in self.connections ]
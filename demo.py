@@ -1,28 +1,64 @@
 """
 static router demo: pox hello world
+
+packets between hosts are resent by the controller one by one; with flowmod=1
+(at launch, or core.staticRouter.change_flowmod(1) from the py component) a
+flow entry is installed instead, so later packets stay in the data plane
+
+only ARP, ICMP and packets that are not plain IPv4 are parsed in full; the
+other packets between hosts are resent from the headers read by packetHeaders
 """
 
 from pox.core import core
 import pox.openflow.libopenflow_01 as of
 import pox.lib.packet as Packet
 import string
+import socket
 import pox.lib.addresses as Addr
 
+import packetHeaders
+
 log = core.getLogger()
 
-def launch ():
+def launch (flowmod = 0, idleTimeout = 10, hardTimeout = 30):
     "starts the component\n"
+    settings = FlowmodSettings(flowmod, idleTimeout, hardTimeout)
+    core.register("staticRouter", settings) # for user interaction
     def start_switch (event):
         log.info("Controlling %s" % (event.connection))
-        StaticRouterNoFlowmod(event.connection)
+        StaticRouterNoFlowmod(event.connection, settings)
     core.openflow.addListenerByName("ConnectionUp", start_switch)
 
+class FlowmodSettings (object):
+    "whether and how flow entries are installed, shared by all switches\n"
+
+    def __init__ (self, flowmod, idleTimeout, hardTimeout):
+        self.change_flowmod(flowmod, idleTimeout, hardTimeout)
+
+    def change_flowmod (self, flowmod, idleTimeout = None, hardTimeout = None):
+        "flowmod 1 - install flow entries; flowmod 0 - resend every packet\n"
+        self.flowmod = int(flowmod)
+        if idleTimeout is not None:
+            self.idleTimeout = int(idleTimeout)
+        if hardTimeout is not None:
+            self.hardTimeout = int(hardTimeout)
+        log.info("flow entries are %s" \
+            % ("installed" if self.flowmod else "not installed"))
+
 class StaticRouterNoFlowmod (object):
     "arp reply, ping reply and static routing\n"
 
-    def __init__ (self, connection):
+    def __init__ (self, connection, settings):
         self.connection = connection
+        self.settings = settings
         connection.addListeners(self)
+
+        # the routing table keyed by raw destination IP, with raw MACs
+        self.raw_routes = {}
+        for ip, entry in self.routing_table.items():
+            self.raw_routes[socket.inet_aton(ip)] = (entry["port"],
+                Addr.EthAddr(entry["intMAC"]).toRaw(),
+                Addr.EthAddr(entry["hostMAC"]).toRaw())
         
     def resend_packet (self, packet_in, out_port):
         msg = of.ofp_packet_out()
@@ -32,6 +68,8 @@ class StaticRouterNoFlowmod (object):
         self.connection.send(msg)
 
     def _handle_PacketIn (self, event):
+        if self.route_raw(event.ofp):
+            return
         packet = event.parsed
         if not packet.parsed:
             log.info("Ignoring incomplete packet")
@@ -39,6 +77,28 @@ class StaticRouterNoFlowmod (object):
         packet_in = event.ofp
         self.packet_handler(packet, packet_in)
         
+    def route_raw (self, packet_in):
+        "resends a packet between hosts from its raw headers; False if it\n"
+        "has to be parsed: ARP, ICMP, unknown, or a flow entry is to be made\n"
+        if self.settings.flowmod: # the match is made from the parsed packet
+            return False
+        data = packet_in.data
+        fields = packetHeaders.ipv4_fields(data)
+        if fields is None or fields[0] == packetHeaders.ICMP_PROTOCOL:
+            return False
+        route = self.raw_routes.get(fields[2])
+        if route is None: # dropped, after parsing, by packet_handler
+            return False
+        log.info("a packet between hosts is got")
+
+        # modify data link src and dst and resend it out
+        port, intMAC, hostMAC = route
+        msg = of.ofp_packet_out()
+        msg.data = hostMAC + intMAC + data[12:]
+        msg.actions.append(of.ofp_action_output(port = port))
+        self.connection.send(msg)
+        return True
+
     def packet_handler (self, frame, packet_in):
         "process every packet\n"
 
@@ -118,16 +178,22 @@ class StaticRouterNoFlowmod (object):
                 log.info("a packet between hosts is got")
 
                 tableEntry = self.routing_table[dstIPStr]
-                # # # flow mod
-                # msg = of.ofp_flow_mod(match = of.ofp_match.from_packet(frame))
-                # msg.actions.append(
-                #     of.ofp_action_dl_addr.set_src(Addr.EthAddr(tableEntry["intMAC"])))
-                # msg.actions.append(
-                #     of.ofp_action_dl_addr.set_dst(Addr.EthAddr(tableEntry["hostMAC"])))
-                # msg.actions.append(of.ofp_action_output(port = tableEntry["port"]))
-                # self.connection.send(msg)
-
-                # log.info("a flow entry is installed")
+                if self.settings.flowmod:
+                    # flow mod; it also sends the buffered packet on
+                    msg = of.ofp_flow_mod(match = of.ofp_match.from_packet(
+                        frame, packet_in.in_port))
+                    msg.idle_timeout = self.settings.idleTimeout
+                    msg.hard_timeout = self.settings.hardTimeout
+                    msg.actions.append(
+                        of.ofp_action_dl_addr.set_src(Addr.EthAddr(tableEntry["intMAC"])))
+                    msg.actions.append(
+                        of.ofp_action_dl_addr.set_dst(Addr.EthAddr(tableEntry["hostMAC"])))
+                    msg.actions.append(of.ofp_action_output(port = tableEntry["port"]))
+                    msg.data = packet_in
+                    self.connection.send(msg)
+
+                    log.info("a flow entry is installed")
+                    return
 
                 # modify data link src and dst
                 frame.src = Addr.EthAddr(tableEntry["intMAC"])
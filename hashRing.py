@@ -0,0 +1,38 @@
+"""
+a consistent hash ring mapping dpids to worker processes
+
+l2learningEvaluation.py hands all PacketIns of a switch to the same worker
+when it works with affinity, so the frames of a switch are learned from in
+the order they arrived; every worker is placed on the ring *REPLICAS* times, and a dpid
+belongs to the first worker point at or after its own hash, so when the pool
+grows from n to n + 1 workers only about 1/(n + 1) of the switches move
+
+the ring is deterministic: the same number of workers gives the same ring
+"""
+
+import bisect
+import zlib
+
+REPLICAS = 256
+
+
+def _hash(key):
+  return zlib.crc32(key) & 0xffffffff
+
+
+class HashRing(object):
+  "worker indices 0..cWorkers-1 on a ring"
+
+  def __init__(self, cWorkers, replicas = REPLICAS):
+    self.cWorkers = cWorkers
+    points = sorted((_hash("worker-%i-%i" % (i, replica)), i) \
+      for i in range(cWorkers) for replica in range(replicas))
+    self.hashes = [ h for h, i in points ]
+    self.workers = [ i for h, i in points ]
+
+  def lookup(self, dpid):
+    "the index of the worker *dpid* belongs to; None if there is no worker"
+    if not self.hashes:
+      return None
+    i = bisect.bisect_left(self.hashes, _hash("dpid-%i" % (dpid,)))
+    return self.workers[i if i < len(self.hashes) else 0]
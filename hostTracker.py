@@ -0,0 +1,96 @@
+"""
+the locations of the hosts for the complexEvaluation_*.py components
+
+the components used to pick the destination of a packet by comparing its
+source MAC with the one host of ComplexTopo that sends to the other; a
+*HostTracker* learns where every host is attached, MAC -> (dpid, port), from
+the source of the PacketIns that arrive at edge ports, the ports that are not
+an end of a link of the topology, so a packet is routed towards the switch of
+its destination MAC and out of that host's port
+
+a packet to a MAC that has not been seen yet, or to a broadcast or multicast
+MAC, is flooded along a spanning tree of the topology (one tree per connected
+part, grown from its lowest dpid) and out of the edge ports, so it reaches
+every host once and cannot loop
+"""
+
+import compactGraph
+import shortestPath
+
+MULTICAST = 0x010000000000 # the group bit of a MAC
+
+
+class HostTracker(object):
+  "MAC -> (dpid, port) of the hosts, and the ports to flood through"
+
+  def __init__(self, graph):
+    self.hosts = {} # MAC -> (dpid, port)
+    self.switchPorts = {} # dpid -> the physical ports the switch reported
+    self.hostPorts = {} # dpid -> the ports hosts have been learned at
+    self.update_graph(graph)
+
+  def __len__(self):
+    return len(self.hosts)
+
+  def update_graph(self, graph):
+    "takes the links of a changed topology, a *compactGraph.CompactGraph*; "
+    "the tables are built aside and then replace the old ones in a single "
+    "assignment, with a cache of their own, as PacketIns may be handled "
+    "meanwhile and fill the old cache from the old tables"
+    linkPorts = {} # dpid -> the ports of its links, removed ones too
+    for i, dpid in enumerate(graph.dpids):
+      linkPorts[dpid] = set(graph.ports[slot] \
+        for slot in xrange(graph.offsets[i], graph.offsets[i + 1]))
+
+    treePorts = dict((dpid, set()) for dpid in graph.dpids)
+    reached = set()
+    for root in graph.dpids:
+      if root in reached:
+        continue
+      tree = shortestPath.ShortestPathTree(graph, root)
+      for node, parent in tree.pred.iteritems():
+        reached.add(node)
+        if parent is not None:
+          treePorts[node].add(graph.link(node, parent)[0])
+          treePorts[parent].add(graph.link(parent, node)[0])
+
+    # the ports of the links and of the spanning tree of every dpid, and the
+    # cache of all the ports it floods through
+    self.tables = (linkPorts, treePorts, {})
+    self.graph = graph
+
+  def add_switch(self, dpid, ports):
+    "takes the ports a switch reported when it connected"
+    self.switchPorts[dpid] = set(port for port in ports \
+      if port <= compactGraph.MAX_PORT)
+    self.tables[2].pop(dpid, None)
+
+  def learn(self, mac, dpid, port):
+    "notes that *mac* sent a packet into *port* of switch *dpid*; a MAC is "
+    "only learned at edge ports; True if it is new there"
+    if port in self.tables[0].get(dpid, ()) or mac & MULTICAST:
+      return False
+    location = (dpid, port)
+    if self.hosts.get(mac) == location:
+      return False
+    self.hosts[mac] = location
+    if port not in self.hostPorts.setdefault(dpid, set()):
+      self.hostPorts[dpid].add(port)
+      self.tables[2].pop(dpid, None)
+    return True
+
+  def locate(self, mac):
+    "(dpid, port) the host *mac* is attached to; None if it is unknown"
+    return self.hosts.get(mac)
+
+  def flood_ports(self, dpid, inPort):
+    "the ports switch *dpid* floods a packet from *inPort* through: its "
+    "ports on the spanning tree, its edge ports and the ports hosts were "
+    "learned at"
+    linkPorts, treePorts, floodPorts = self.tables # of the same topology
+    ports = floodPorts.get(dpid)
+    if ports is None:
+      ports = treePorts.get(dpid, set()) | self.hostPorts.get(dpid, set()) \
+        | (self.switchPorts.get(dpid, set()) - linkPorts.get(dpid, set()))
+      ports = floodPorts[dpid] = sorted(ports)
+    return [ port for port in ports if port != inPort ]
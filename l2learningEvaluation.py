@@ -2,169 +2,444 @@
 a POX component for evaluation of the multiprocessing technique in design of
 Python-based SDN controllers
 this component works together with Mininet; you can also use cbench
-there are two working modes which can be switched interactively by the user
-during runtime: monoprocessing and multiprocessing
-the number of worker processes can be changed in runtime
+there are three working modes which can be switched interactively by the user
+during runtime: monoprocessing, multiprocessing and a pool of cThreads=...
+threads in the main process (see threadPool.py)
+the number of worker processes can be changed in runtime; the pool grows or
+shrinks (a worker stopped finishes what it has been sent first), respawns a
+worker that dies and stops them all when POX goes down (see workerPool.py)
+once the destination is learned, a flow entry can be installed instead of only
+sending the packet out; this can be switched at launch (flowmod=1) and in runtime
+the MAC learning tables are shared by the main process and all the workers,
+so nothing learned is lost when the mode or the number of workers changes;
+the table of a switch holds macTableSize=... entries at most, evicting its
+own by macEviction=clock or lru, and forgets a MAC not seen for macAge=...
+seconds (0 for never); room is made for macTableSwitches=... switches (see
+macTable.py)
+the worker of a PacketIn is chosen by the scheduler (scheduler=roundRobin,
+the default, leastLoaded or twoChoices, which go by the PacketIns in flight
+to the workers; see workerScheduler.py), or with affinity (affinity=1) all
+PacketIns of a switch go to the same worker, chosen by consistent hashing of
+its dpid, so that the frames of a switch are learned from in order
+the busy loop of every frame runs add=... times; a list (add=0,0,0,50000)
+gives worker i the i-th count, modulo the length of the list, so that the
+workers are unevenly loaded; monoprocessing mode uses the first
+the latency of every stage a PacketIn goes through and the queue depth of
+every worker are measured (stageStats.py); see stats, show_stats, dump_stats
+and reset_stats
+the PacketIns in flight to a worker can be bounded (inFlight=...), those
+beyond the bound being shed by an overload policy (overload=dropOldest,
+local, flood or drop; see backpressure.py); see change_backpressure
 """
 
 from pox.core import core
 import pox.openflow.libopenflow_01 as of
+from pox.lib.addresses import EthAddr
 import multiprocessing
 import threading
+import time
+
+import backpressure
+import batchDispatcher
+import connectionSet
+import hashRing
+import macTable
+import packetHeaders
+import packetOut
+import stageStats
+import threadPool
+import workerPool
+import workerScheduler
 
 log = core.getLogger()
 
 
-def launch(cWorkerProcesses = 1, mode = 1, add = 0):
+def launch(cWorkerProcesses = 1, mode = 1, add = 0, flowmod = 0, \
+  idleTimeout = 10, hardTimeout = 30, batchSize = 1, batchDelay = 200, \
+  affinity = 0, macTableSize = 4096, macAge = 300, macEviction = "clock", \
+  inFlight = 0, overload = backpressure.DROP_OLDEST, \
+  scheduler = workerScheduler.ROUND_ROBIN, cThreads = 4, \
+  macTableSwitches = 64):
   "launch the component: construct an instance of *Evaluation*"
   
-  inst = Evaluation(cWorkerProcesses, mode, add)
+  inst = Evaluation(cWorkerProcesses, mode, add, flowmod, idleTimeout, \
+    hardTimeout, batchSize, batchDelay, affinity, macTableSize, macAge, \
+    macEviction, inFlight, overload, scheduler, cThreads, macTableSwitches)
   core.openflow.addListeners(inst) # for listening to ConnectionUp and PacketIn
+  core.addListeners(inst) # for stopping the workers when POX goes down
   core.register("evaluation", inst) # for user interaction
 
 
 class Evaluation(object):
   "carrying all functionalities for this evaluation"
 
-  def __init__(self, cWorkerProcesses, mode, add):
+  def __init__(self, cWorkerProcesses, mode, add, flowmod, idleTimeout, \
+    hardTimeout, batchSize, batchDelay, affinity, macTableSize, macAge, \
+    macEviction, inFlight = 0, overload = backpressure.DROP_OLDEST, \
+    scheduler = workerScheduler.ROUND_ROBIN, cThreads = 4, \
+    macTableSwitches = 64):
     log.info(" the *Evaluation* instance is initiating")
 
-    # initialization of objects related to multiprocessing
-    self.maxcWorkers = 0
-    self.g1Receivers = []
-    self.g1Senders = []
-    self.g2Receivers = []
-    self.g2Senders = []
-    self.workerProcesses = []
+    # the latency of every stage and the counters, shared with the workers
+    self.stageStats = stageStats.StageStats()
+
+    # at most *inFlight* PacketIns in flight to a worker (0 for no bound),
+    # those beyond shed by the *overload* policy
+    self.backpressure = backpressure.Backpressure(self.stageStats, \
+      int(inFlight), overload)
+
+    # the choice of the worker of every PacketIn, but with affinity
+    self.scheduler = workerScheduler.WorkerScheduler(self.stageStats, \
+      scheduler)
+
+    # the busy loop count of every worker, the first also of the main process
+    self.adds = [ int(count) for count in str(add).split(",") ]
+    self.add = self.adds[0]
 
-    self.add = int(add)
+    # the MAC learning tables of the switches, shared with the worker
+    # processes, which are forked with them; bounded per switch, with aging
+    self.macTable = macTable.MacTable(int(macTableSize), int(macAge), \
+      macEviction, int(macTableSwitches))
 
-    # semaphore
-    self.sema = threading.Semaphore()
+    # the packet_out messages of monoprocessing mode are filled into a
+    # preallocated template
+    self.packetOut = packetOut.PacketOutTemplate()
+
+    # PacketIns are sent to the workers in batches of up to *batchSize*,
+    # each waiting *batchDelay* microseconds at most
+    # (2 --- indication of a batch of packet info, [the info])
+    self.dispatcher = batchDispatcher.BatchDispatcher([], \
+      int(batchSize), int(batchDelay), batchIndicator = 2)
+
+    # whether to install flow entries for learned destinations
+    self.change_flowmod(flowmod, idleTimeout, hardTimeout)
 
     # set the working mode
     self.change_mode(int(mode))
 
-    # launch the thread to send openflow messages to switches
+    # launch the thread to send openflow messages to switches; it waits on
+    # the result pipes of all worker processes at once
+    self.results = connectionSet.ConnectionSet()
     self.msgSendingThread = threading.Thread( \
-      target = msg_sending_thread_task, args = (self.g2Receivers, self.sema,))
+      target = msg_sending_thread_task, args = (self.results, self.stageStats))
+    self.msgSendingThread.daemon = True
     self.msgSendingThread.start()
 
-    # launch worker processes
+    # whether all PacketIns of a switch go to the same worker
+    self.affinity = int(affinity)
+
+    # launch worker processes; they are respawned if they die
+    self.pool = workerPool.WorkerPool(self.spawn_worker, self.dispatcher, \
+      self.stageStats, log, self.recover_table)
+    self.spread(0)
     self.change_num_worker_processes(int(cWorkerProcesses))
 
-    # forwading tables
-    self.forwardingTables = {}
+    # the threads of mode 3, doing the work of the workers in this process
+    self.threadPool = threadPool.ThreadPool(self.handle_in_thread, \
+      core.openflow.sendToDPID, self.stageStats, int(cThreads))
   
   def change_num_worker_processes(self, newNum):
-    self.cWorkerProcesses = newNum
-    self.iProcess = -1
-    if newNum > self.maxcWorkers:
-      # spawn new pipes and worker processes
-      diff = newNum - self.maxcWorkers
-      newG1PipePairs = [ multiprocessing.Pipe(duplex=False) for i in range(diff) ]
-      newG2PipePairs = [ multiprocessing.Pipe(duplex=False) for i in range(diff) ]
-      newG1Receivers, newG1Senders = zip(*newG1PipePairs)
-      newG2Receivers, newG2Senders = zip(*newG2PipePairs)
-      newWorkers = [ multiprocessing.Process( \
-        target = worker_process_task, args = (newG1Receivers[i], newG2Senders[i], self.add)) \
-        for i in range(diff) ]
-      for p in newWorkers:
-        p.start()
-
-      # append the references to self.
-      self.g1Receivers += list(newG1Receivers)
-      self.g1Senders += list(newG1Senders)
-      self.g2Receivers += list(newG2Receivers)
-      self.g2Senders += list(newG2Senders)
-      self.workerProcesses += newWorkers
-      self.maxcWorkers = newNum
+    "grows or shrinks the pool to *newNum* worker processes; those stopped "
+    "finish the PacketIns they have been sent first "
+    "works with component py; will be invoked by the user and the class"
+    newNum = max(1, int(newNum))
+    if newNum < self.cWorkerProcesses: # no PacketIns for those to be stopped
+      self.spread(newNum)
+    self.pool.resize(newNum)
+    self.spread(newNum)
 
     log.info(" number of active worker processes: %i" % (self.cWorkerProcesses,))
-    log.info(" number of spawned worker processes: %i" % (self.maxcWorkers,))
+    log.info(" number of worker processes draining: %i" \
+      % (len(self.pool.draining),))
+
+  def spread(self, cWorkers):
+    "hands the PacketIns to *cWorkers* workers from now on"
+    self.cWorkerProcesses = cWorkers
+    self.iProcess = -1
+    # the switches are spread over the active workers anew
+    self.ring = hashRing.HashRing(cWorkers)
+    self.owners = {} # dpid -> index of its worker, filled from *ring*
+
+  def spawn_worker(self, i, stats):
+    "starts worker process *i*, sharing the MAC table, with the current flow "
+    "entry settings; called by the pool with the dispatcher held"
+    g1Receiver, g1Sender = multiprocessing.Pipe(duplex=False)
+    g2Receiver, g2Sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target = worker_process_task, \
+      args = (g1Receiver, g2Sender, self.adds[i % len(self.adds)], \
+      self.flowEntries, self.macTable, stats))
+    process.daemon = True
+    process.start()
+    # held by the worker alone, so its death closes the pipes
+    g1Receiver.close()
+    g2Sender.close()
+    self.results.add([g2Receiver])
+    return workerPool.Worker(process, g1Sender, g2Receiver)
+
+  def recover_table(self, pids):
+    "puts right the stripes of the MAC table the workers of *pids*, which "
+    "died, were writing; False, the live workers carrying on; called by the "
+    "pool with its lock held"
+    cRecovered = self.macTable.recover(pids)
+    if cRecovered:
+      log.warning(" %i stripes of the MAC table left by a dead worker have " \
+        "been emptied" % (cRecovered,))
+    return False
 
+  def _handle_GoingDownEvent(self, event):
+    "stops the worker processes"
+    self.pool.shutdown()
+    self.threadPool.resize(0)
+    log.info(" the worker processes have been stopped")
 
   def _handle_PacketIn(self, event):
     "multiprocessing: send necessary information of this packet to a worker process"
     "monoprocessing: immediately compute the packet's out-port and send msg out"
+    began = time.time()
     log.debug(" PacketIn event contains dpid == %i" % (event.dpid,))
 
-    if self.mode != 1: # multiprocessing mode
-      self.iProcess = (self.iProcess + 1) % self.cWorkerProcesses
-      self.g1Senders[self.iProcess].send( \
-        (event.dpid, event.parsed.src, event.parsed.dst, event.port, event.ofp.buffer_id,) )
-    else: # monoprocessing
-      if event.dpid not in self.forwardingTables:
-        self.forwardingTables[event.dpid] = {}
-      table = self.forwardingTables[event.dpid]
-      frame = event.parsed
-      table[frame.src] = event.port
-      load = 0
-      for i in range(self.add):
-        load += 1
-      if frame.dst in table:
-        outPort = table[frame.dst]
+    if self.mode == 2: # multiprocessing mode
+      if self.affinity: # the worker the switch belongs to
+        iProcess = self.owners.get(event.dpid)
+        if iProcess is None:
+          iProcess = self.owners[event.dpid] = self.ring.lookup(event.dpid)
       else:
-        outPort = of.OFPP_ALL
-
-      # construct ofp_packet_out message 
-      msg = of.ofp_packet_out()
-      msg.actions.append(of.ofp_action_output(port = outPort))
-      msg.in_port = event.port
-      msg.buffer_id = event.ofp.buffer_id
-      msg.data = None
-      core.openflow.sendToDPID(event.dpid, msg)
+        iProcess = self.iProcess = \
+          self.scheduler.pick(self.iProcess, self.cWorkerProcesses)
+      # (0 --- indication that packet info is contained in this message,
+      # (dpid, source and destination MAC as integers, in-port, buffer id of
+      # the packet, time the handler began))
+      src, dst = packetHeaders.event_macs(event)
+      if self.backpressure.admit(iProcess):
+        self.dispatcher.dispatch(iProcess, \
+          (event.dpid, src, dst, event.port, event.ofp.buffer_id, began,))
+        self.stageStats.dispatched(iProcess, began)
+      else: # the worker has as many in flight as it may
+        self.shed(event, src, dst)
+        self.stageStats.handled(began)
+    elif self.mode == 3: # a thread of the pool
+      src, dst = packetHeaders.event_macs(event)
+      self.threadPool.submit( \
+        (event.dpid, src, dst, event.port, event.ofp.buffer_id, began,))
+      self.stageStats.dispatched(None, began)
+    else: # monoprocessing
+      self.answer(event, *packetHeaders.event_macs(event))
+      self.stageStats.handled(began)
+
+  def answer(self, event, src, dst):
+    "monoprocessing: learns the source, looks the out-port up and sends msg out"
+    self.macTable.learn(event.dpid, src, event.port)
+    load = 0
+    for i in range(self.add):
+      load += 1
+    outPort = self.macTable.lookup(event.dpid, dst)
+    if outPort is None:
+      outPort = of.OFPP_ALL
+
+    if self.flowmod and outPort != of.OFPP_ALL:
+      core.openflow.sendToDPID(event.dpid, flow_mod(src, dst, \
+        event.port, outPort, event.ofp.buffer_id, self.idleTimeout, \
+        self.hardTimeout))
+    else: # fill ofp_packet_out message into the template
+      core.openflow.sendToDPID(event.dpid, \
+        self.packetOut.message(event.ofp.buffer_id, outPort, event.port))
+
+  def handle_in_thread(self, frameInfo, records, msgs):
+    "mode 3: learns from the frame and looks its out-port up as a worker "
+    "process does, in a thread of the pool"
+    handle_frame(self.macTable, self.add, self.flowEntries, frameInfo, \
+      records, msgs)
+
+  def shed(self, event, src, dst):
+    "answers a PacketIn a worker cannot take by the overload policy"
+    policy = self.backpressure.policy
+    if policy == backpressure.LOCAL:
+      self.answer(event, src, dst)
+    elif policy == backpressure.FLOOD: # without learning from it
+      core.openflow.sendToDPID(event.dpid, self.packetOut.message( \
+        event.ofp.buffer_id, of.OFPP_ALL, event.port))
+    else: # the switch is told to drop the packet
+      core.openflow.sendToDPID(event.dpid, \
+        self.packetOut.drop(event.ofp.buffer_id, event.port))
       
 
   def change_mode(self, mode):
-    "mode 1 - monoprocessing; mode 2 - multiprocessing "
+    "mode 1 - monoprocessing; mode 2 - multiprocessing; "
+    "mode 3 - a pool of threads "
+    "works with component py; will be invoked by the user and the class"
+
+    self.mode = int(mode)
+
+    log.info(" now working in %s mode" % ({ 1: "monoprocessing", \
+      2: "multiprocessing", 3: "thread pool" }.get(self.mode, "unknown"),))
+
+  def change_num_threads(self, newNum):
+    "grows or shrinks the thread pool of mode 3 to *newNum* threads "
+    "works with component py; will be invoked by the user"
+
+    self.threadPool.resize(max(1, int(newNum)))
+    log.info(" number of threads in the pool: %i" % (len(self.threadPool),))
+
+  def change_affinity(self, affinity):
+    "affinity 1 - all PacketIns of a switch go to the same worker; "
+    "affinity 0 - the worker of a PacketIn is chosen by the scheduler "
+    "(roundRobin, leastLoaded or twoChoices; see change_scheduler) "
+    "works with component py; will be invoked by the user"
+
+    self.affinity = int(affinity)
+    self.owners = {}
+
+    log.info(" PacketIns are handed to the workers %s" \
+      % ("by dpid" if self.affinity else "by " + self.scheduler.scheduler,))
+
+  def change_flowmod(self, flowmod, idleTimeout = None, hardTimeout = None):
+    "flowmod 1 - install a flow entry once the destination is learned; "
+    "flowmod 0 - only send each packet out (ofp_packet_out) "
     "works with component py; will be invoked by the user and the class"
 
-    self.mode = mode
+    self.flowmod = int(flowmod)
+    if idleTimeout is not None:
+      self.idleTimeout = int(idleTimeout)
+    if hardTimeout is not None:
+      self.hardTimeout = int(hardTimeout)
+
+    # scatter the settings to worker processes
+    # (1 --- indicating this message contains flow entry settings,
+    # (flowmod, idle timeout, hard timeout))
+    self.flowEntries = (self.flowmod, self.idleTimeout, self.hardTimeout)
+    self.dispatcher.broadcast((1, self.flowEntries,))
+
+    log.info(" flow entries are %s (idle timeout %i s, hard timeout %i s)" \
+      % ("installed" if self.flowmod else "not installed", \
+      self.idleTimeout, self.hardTimeout))
+
+  def change_backpressure(self, inFlight, overload = None):
+    "bounds the PacketIns in flight to a worker to *inFlight*, 0 for no "
+    "bound, shedding those beyond by the *overload* policy: dropOldest, "
+    "local, flood or drop "
+    "works with component py; will be invoked by the user"
+
+    self.backpressure.change(inFlight, overload)
+    log.info(" PacketIns in flight to a worker: %s; overload policy: %s" \
+      % (self.backpressure.limit or "unbounded", self.backpressure.policy))
+
+  def change_scheduler(self, scheduler):
+    "chooses the worker of every PacketIn without affinity by *scheduler*: "
+    "roundRobin, leastLoaded or twoChoices "
+    "works with component py; will be invoked by the user"
+
+    self.scheduler.change(scheduler)
+    log.info(" workers are chosen by %s" % (scheduler,))
+
+  def stats(self):
+    "the latency of every stage (in ms) and the counters "
+    "works with component py; will be invoked by the user"
+    return self.stageStats.report()
 
-    # semaphore
-    if mode == 1:
-      self.sema.acquire()
-    else:
-      self.sema.release()
+  def show_stats(self):
+    "logs the latency of every stage and the counters "
+    "works with component py; will be invoked by the user"
+    for line in self.stageStats.table():
+      log.info(" " + line)
 
-    log.info(" now working in %s mode" \
-      % ("monoprocessing" if mode == 1 else "multiprocessing",))
+  def dump_stats(self, path):
+    "appends the stats and the histograms to the file at *path* as JSON "
+    "works with component py; will be invoked by the user"
+    self.stageStats.dump(path)
+    log.info(" the stats have been written to %s" % (path,))
 
+  def reset_stats(self):
+    "starts measuring the latencies anew "
+    "works with component py; will be invoked by the user"
+    self.stageStats.reset()
 
-def worker_process_task(g1Receiver, g2Sender, add):
-  forwardingTables = {}
+  def change_batching(self, batchSize, batchDelay = None):
+    "sends PacketIns to a worker in batches of up to *batchSize*, each waiting "
+    "*batchDelay* microseconds at most; a size of 1 sends each one at once "
+    "works with component py; will be invoked by the user"
+
+    self.dispatcher.change(batchSize, batchDelay)
+    log.info(" PacketIns are sent to workers in batches of up to %i, " \
+      "waiting %i us at most" % (self.dispatcher.batchSize, \
+      self.dispatcher.batchDelay * 1000000))
+
+
+def worker_process_task(g1Receiver, g2Sender, add, flowEntries, table, \
+  stats):
   while 1:
-    (dpid, src, dst, inPort, bufferID,) = g1Receiver.recv()
-    if dpid not in forwardingTables:
-      forwardingTables[dpid] = {}
-    table = forwardingTables[dpid]
-    table[src] = inPort
-    load = 0
-    for i in range(add):
-      load += 1
-    if dst in table:
-      outPort = table[dst]
-    else:
-      outPort = of.OFPP_ALL
-    # construct ofp_packet_out message and deliver it to main proc
-    msg = of.ofp_packet_out()
-    msg.actions.append(of.ofp_action_output(port = outPort))
-    msg.buffer_id = bufferID
-    msg.in_port = inPort
-    msg.data = None
-    g2Sender.send((msg, dpid,))
-
-
-def msg_sending_thread_task(g2Receivers, sema):
-  "this thread identifies the switch to whom a msg is to be sent, "
-  "then sends the msg"
+    (indicator, content) = g1Receiver.recv()
+    if indicator == -1: # to exit, the messages sent before have been handled
+      break
+    elif indicator == 1: # flow entry settings are received
+      flowEntries = content
+    else: # a frame, or a batch of them (2), answered with a single message:
+      # (the packet_out records, the (msg, dpid) of the flow entries, the
+      # time the first frame was dispatched, the number of frames, the time
+      # it is sent); the latency of the stages is noted in *stats*
+      received = time.time()
+      frameInfos = content if indicator == 2 else (content,)
+      # the oldest ones the main process has given up on are dropped
+      dropped = stats.dropping(len(frameInfos))
+      records, msgs = [], []
+      for i in xrange(dropped, len(frameInfos)):
+        handle_frame(table, add, flowEntries, frameInfos[i], records, msgs)
+      stats.received(frameInfos, received, time.time(), dropped)
+      if records or msgs:
+        g2Sender.send(("".join(records), msgs, frameInfos[dropped][-1], \
+          len(frameInfos) - dropped, time.time(),))
+
+
+def handle_frame(table, add, flowEntries, frameInfo, records, msgs):
+  "learns the source of a frame in the shared MAC table and appends the "
+  "packet_out record to *records*, or the (msg, dpid) pair of the flow entry "
+  "to *msgs*, to be delivered to the main proc"
+  (dpid, src, dst, inPort, bufferID, began,) = frameInfo
+  (flowmod, idleTimeout, hardTimeout) = flowEntries
+  table.learn(dpid, src, inPort)
+  load = 0
+  for i in range(add):
+    load += 1
+  outPort = table.lookup(dpid, dst)
+  if outPort is None:
+    outPort = of.OFPP_ALL
+  if flowmod and outPort != of.OFPP_ALL:
+    msgs.append((flow_mod(src, dst, inPort, outPort, bufferID, idleTimeout, \
+      hardTimeout), dpid,))
+    return
+  # the main process turns the record into an ofp_packet_out message
+  records.append(packetOut.record(dpid, bufferID, outPort, inPort))
+
+
+def flow_mod(src, dst, inPort, outPort, bufferID, idleTimeout, hardTimeout):
+  "an ofp_flow_mod message forwarding frames from *src* to the learned *dst* "
+  "(MACs as integers) and releasing the buffered frame"
+  msg = of.ofp_flow_mod()
+  msg.match.in_port = inPort
+  msg.match.dl_src = EthAddr(packetHeaders.int_to_raw(src))
+  msg.match.dl_dst = EthAddr(packetHeaders.int_to_raw(dst))
+  msg.idle_timeout = idleTimeout
+  msg.hard_timeout = hardTimeout
+  msg.actions.append(of.ofp_action_output(port = outPort))
+  msg.buffer_id = bufferID
+  return msg
+
+
+def msg_sending_thread_task(results, stats):
+  "this thread waits until any worker process has sent its results, "
+  "identifies the switch to whom each msg is to be sent, then sends the msg; "
+  "the latency of the results is noted in *stats*"
   
+  template = packetOut.PacketOutTemplate()
   while 1:
-    sema.acquire()
-    sema.release()
-    for i in range(5):
-      for receiver in g2Receivers:
-        if receiver.poll(1):
-          (msg, dpid,) = receiver.recv()
-          core.openflow.sendToDPID(dpid, msg)
+    for connection in results.wait():
+      try:
+        records, msgs, dispatched, count, sent = connection.recv()
+      except EOFError: # the worker process has gone
+        results.remove(connection)
+        connection.close()
+        continue
+      received = time.time()
+      template.send_records(records, core.openflow.sendToDPID)
+      for msg, dpid in msgs:
+        core.openflow.sendToDPID(dpid, msg)
+      stats.collected(dispatched, count, sent, received)
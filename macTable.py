@@ -0,0 +1,257 @@
+"""
+a MAC learning table per switch, shared by the main process and the worker
+processes of l2learningEvaluation.py
+
+the tables live in an anonymous shared mapping made before the workers are
+forked, so all of them read and write the same pages, and nothing learned is
+lost when the mode or the number of workers changes; room is made for
+*cSwitches* switches, each given a region of its own the first time it is
+learned on, and every region holds *capacity* entries at most, so a switch
+flooded with MACs evicts its own entries and no other switch's:
+
+  directory        number of regions in use, holder pid,    (16 bytes)
+                   the dpid of every region                 (8 bytes each)
+  stripe headers   version, number of entries, holder pid   (16 bytes each)
+  buckets          *WAYS* entries of MAC | USED, port,      (121 bytes each)
+                   time last seen and referenced bit,
+                   and the clock hand
+
+a region is a set-associative table: a MAC belongs to one bucket of *WAYS*
+entries, read with a single struct call, and a bucket that is full evicts
+one of its own entries for a new one, so no entry is ever moved; the
+buckets of a region are cut into *cStripes* stripes, each with its own lock
+and version; writers take the lock of the stripe, readers take none and
+retry a read that overlapped a write (the version is odd while a stripe is
+being written, a sequence lock); a MAC is marked with the USED bit, so that
+an empty entry is 0 even for MAC 0
+
+"clock" evicts the first entry under the hand of the bucket that has not
+been seen again since it was learned or the hand last passed it, "lru" the
+one of the bucket seen longest ago, the hand taking turns among those seen
+within the same second, the resolution of the times; an entry that has not
+been seen for *maxAge* seconds (0 for never) is not found any more and is
+the first to be evicted; the frames of a MAC refresh its entry, looking it
+up as a destination does not; the switches beyond *cSwitches* are not
+learned on, their frames being flooded
+
+a writer records its pid in the header of the stripe (or the directory) in
+the same write that makes the version odd, and clears it in the write that
+makes it even again, so a pid is there only while its process holds the
+lock; *recover*, given the pids of workers found dead, empties the stripes
+such a worker was writing (their MACs are learned again from the next
+frames) and releases their locks; a worker killed in the few instructions
+between taking a lock and recording its pid, or between clearing it and
+releasing the lock, leaves a lock nobody can tell from a live writer's,
+which is not recovered
+"""
+
+import mmap
+import multiprocessing
+import os
+import struct
+import time
+
+WAYS = 8 # entries of a bucket
+EVICTIONS = ("clock", "lru")
+USED = 1 << 48 # marks the MAC of an entry
+
+_HEADER = struct.Struct("=QII") # version, number of entries or regions, pid
+_VERSION = struct.Struct("=Q")
+_DPID = struct.Struct("=Q")
+_ENTRY = struct.Struct("=QHIB") # MAC | USED, port, last seen, referenced
+_BUCKET = struct.Struct("=" + "QHIB" * WAYS + "B") # the entries, clock hand
+_FIELDS = 4 # of an entry
+_HAND = _FIELDS * WAYS
+
+
+class MacTable(object):
+  "room for *capacity* MAC -> port entries of each of *cSwitches* switches"
+
+  def __init__(self, capacity = 4096, maxAge = 0, eviction = "clock", \
+    cSwitches = 64, cStripes = 4):
+    if eviction not in EVICTIONS:
+      raise ValueError("eviction is one of %s" % (", ".join(EVICTIONS),))
+    self.maxAge = int(maxAge)
+    self.clock = eviction == "clock"
+    self.cSwitches = int(cSwitches)
+    self.cBuckets = max(1, -(-int(capacity) // WAYS)) # per region
+    self.cStripes = min(int(cStripes), self.cBuckets) # per region
+    self.stripeBuckets = -(-self.cBuckets // self.cStripes)
+    self.headersOffset = _HEADER.size + _DPID.size * self.cSwitches
+    self.bucketsOffset = self.headersOffset \
+      + _HEADER.size * self.cStripes * self.cSwitches
+    self.buf = mmap.mmap(-1, self.bucketsOffset \
+      + _BUCKET.size * self.cBuckets * self.cSwitches)
+    self.directoryLock = multiprocessing.Lock()
+    self.locks = [ multiprocessing.Lock() \
+      for i in range(self.cStripes * self.cSwitches) ]
+    self.regions = {} # dpid -> region, as far as this process has seen
+
+  @property
+  def capacity(self):
+    "entries per switch"
+    return self.cBuckets * WAYS
+
+  def __len__(self):
+    "the number of entries, aged ones included"
+    return sum(_HEADER.unpack_from(self.buf, self.headersOffset \
+      + _HEADER.size * stripe)[1] for stripe in xrange(len(self.locks)))
+
+  def count(self, dpid):
+    "the number of entries of switch *dpid*, aged ones included"
+    region = self._region(dpid, False)
+    if region is None:
+      return 0
+    first = self.cStripes * region
+    return sum(_HEADER.unpack_from(self.buf, self.headersOffset \
+      + _HEADER.size * stripe)[1] for stripe in xrange(first, \
+      first + self.cStripes))
+
+  def _region(self, dpid, assign = True):
+    "the region of switch *dpid*, given one if *assign* and there is room; "
+    "None otherwise"
+    region = self.regions.get(dpid)
+    if region is not None:
+      return region
+    buf = self.buf
+    with self.directoryLock:
+      version, cRegions, pid = _HEADER.unpack_from(buf, 0)
+      dpids = struct.unpack_from("=%iQ" % (cRegions,), buf, _HEADER.size)
+      if dpid in dpids:
+        region = dpids.index(dpid)
+      elif assign and cRegions < self.cSwitches:
+        _HEADER.pack_into(buf, 0, version + 1, cRegions, os.getpid())
+        _DPID.pack_into(buf, _HEADER.size + _DPID.size * cRegions, dpid)
+        region = cRegions
+        _HEADER.pack_into(buf, 0, version + 2, cRegions + 1, 0)
+      else:
+        return None
+    self.regions[dpid] = region
+    return region
+
+  def _place(self, region, mac):
+    "the offsets of the stripe header and of the bucket of *mac*, and the "
+    "stripe; inlined in *lookup* and *learn*"
+    bucket = (mac ^ mac >> 24) % self.cBuckets
+    stripe = self.cStripes * region + bucket // self.stripeBuckets
+    return self.headersOffset + _HEADER.size * stripe, self.bucketsOffset \
+      + _BUCKET.size * (self.cBuckets * region + bucket), stripe
+
+  def _expired(self, seen, now):
+    return self.maxAge and now - seen > self.maxAge
+
+  def lookup(self, dpid, mac):
+    "the port of switch *dpid* *mac* was learned on; None if it is unknown"
+    mac = int(mac) # compares faster with the fields as an int than as a long
+    region = self.regions.get(dpid)
+    if region is None:
+      region = self._region(dpid, False)
+      if region is None:
+        return None
+    bucket = (mac ^ mac >> 24) % self.cBuckets
+    header = self.headersOffset + _HEADER.size * (self.cStripes * region \
+      + bucket // self.stripeBuckets)
+    offset = self.bucketsOffset + _BUCKET.size \
+      * (self.cBuckets * region + bucket)
+    buf, key = self.buf, mac | USED
+    while 1:
+      version = _VERSION.unpack_from(buf, header)[0]
+      fields = _BUCKET.unpack_from(buf, offset)
+      if not version & 1 and version == _VERSION.unpack_from(buf, header)[0]:
+        break
+    keys = fields[0:_HAND:_FIELDS]
+    if key not in keys:
+      return None
+    i = _FIELDS * keys.index(key)
+    if self.maxAge and self._expired(fields[i + 2], int(time.time())):
+      return None
+    return fields[i + 1]
+
+  def learn(self, dpid, mac, port):
+    "records that switch *dpid* reaches *mac* through *port*"
+    mac = int(mac)
+    region = self.regions.get(dpid)
+    if region is None:
+      region = self._region(dpid)
+      if region is None: # no room for another switch
+        return
+    bucket = (mac ^ mac >> 24) % self.cBuckets
+    stripe = self.cStripes * region + bucket // self.stripeBuckets
+    header = self.headersOffset + _HEADER.size * stripe
+    offset = self.bucketsOffset + _BUCKET.size \
+      * (self.cBuckets * region + bucket)
+    buf, key = self.buf, mac | USED
+    now = int(time.time())
+    # the common case, a known MAC seen within the second, takes no lock
+    while 1:
+      version = _VERSION.unpack_from(buf, header)[0]
+      fields = _BUCKET.unpack_from(buf, offset)
+      if not version & 1 and version == _VERSION.unpack_from(buf, header)[0]:
+        break
+    keys = fields[0:_HAND:_FIELDS]
+    if key in keys:
+      i = _FIELDS * keys.index(key)
+      if fields[i + 1] == port and fields[i + 2] == now:
+        return
+
+    with self.locks[stripe]:
+      version, count, pid = _HEADER.unpack_from(buf, header)
+      _HEADER.pack_into(buf, header, version + 1, count, os.getpid())
+      fields = _BUCKET.unpack_from(buf, offset)
+      keys = fields[0:_HAND:_FIELDS]
+      if key in keys: # seen again
+        way, referenced = keys.index(key), 1
+      elif 0 in keys:
+        way, referenced = keys.index(0), 0
+        count += 1
+      else:
+        way, referenced = self._victim(offset, fields, now), 0
+      _ENTRY.pack_into(buf, offset + _ENTRY.size * way, key, port, now, \
+        referenced)
+      _HEADER.pack_into(buf, header, version + 2, count, 0)
+
+  def _victim(self, offset, fields, now):
+    "the way of the full bucket at *offset* whose entry is evicted; writes "
+    "the referenced bits and the clock hand"
+    buf, hand = self.buf, fields[_HAND]
+    seen = fields[2:_HAND:_FIELDS]
+    oldest = min(seen)
+    if not self.clock or self.maxAge and now - oldest > self.maxAge:
+      # the entries seen within the same second leave in turn
+      while seen[hand] != oldest:
+        hand = (hand + 1) % WAYS
+    else:
+      referenced = list(fields[3:_HAND:_FIELDS])
+      while referenced[hand]: # found within one round
+        referenced[hand] = 0
+        buf[offset + _ENTRY.size * hand + 14] = "\0" # a second chance
+        hand = (hand + 1) % WAYS
+    buf[offset + _BUCKET.size - 1] = chr((hand + 1) % WAYS)
+    return hand
+
+  def recover(self, pids):
+    "empties the stripes the workers of *pids*, found dead, were writing, "
+    "and releases their locks; returns the number of them"
+    buf, pids = self.buf, set(pids)
+    cRecovered = 0
+    version, cRegions, pid = _HEADER.unpack_from(buf, 0)
+    if pid in pids: # its dpid is written before the count, and not used
+      _HEADER.pack_into(buf, 0, version + 2 - (version & 1), cRegions, 0)
+      self.directoryLock.release()
+    size = _BUCKET.size * self.stripeBuckets
+    for stripe, lock in enumerate(self.locks):
+      header = self.headersOffset + _HEADER.size * stripe
+      version, count, pid = _HEADER.unpack_from(buf, header)
+      if pid not in pids:
+        continue
+      region, first = divmod(stripe, self.cStripes)
+      base = self.bucketsOffset + _BUCKET.size * (self.cBuckets * region \
+        + self.stripeBuckets * first)
+      end = min(base + size, self.bucketsOffset + _BUCKET.size \
+        * self.cBuckets * (region + 1))
+      buf[base:end] = "\0" * (end - base)
+      # readers that began before see the version changed and retry
+      _HEADER.pack_into(buf, header, version + 2 - (version & 1), 0, 0)
+      lock.release() # held by the dead worker
+      cRecovered += 1
+    return cRecovered
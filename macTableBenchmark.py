@@ -0,0 +1,98 @@
+"""
+memory benchmark of the MAC learning tables of l2learningEvaluation.py under
+MAC churn, such as cbench with many fake MACs
+
+random source MACs spread over a number of switches are learned one after the
+other by the former dict of dicts { dpid: { MAC: port } } and by the bounded
+*macTable.MacTable* with either eviction; each table runs in a process of its
+own, which reports its resident set size (RSS) along the way; the dicts grow
+with every new MAC, the bounded table stays at its size
+
+the cost per MAC is that of the learning alone, the drawing of the random
+MACs being timed apart and taken off; before the churn a quiet switch, which
+sees no frames afterwards, learns *QUIET* MACs, and the share of them still
+found at the end shows whether the switches flooded with MACs evicted them
+
+usage: python macTableBenchmark.py [million MACs] [capacity per switch]
+  [switches]
+"""
+
+import multiprocessing
+import random
+import resource
+import sys
+import time
+
+import macTable
+
+CHECKPOINTS = 5
+QUIET = 1000 # MACs of the switch that sees no churn
+
+
+def rss():
+  "resident set size of this process in MB"
+  with open("/proc/self/statm") as f:
+    pages = int(f.read().split()[1])
+  return pages * resource.getpagesize() / 1048576.0
+
+
+def replay(kind, cMacs, capacity, cSwitches, results):
+  "learns *cMacs* random MACs; puts (kind, [RSS], microseconds per MAC, "
+  "share of the MACs of the quiet switch kept)"
+  rng = random.Random(1)
+  if kind == "dict":
+    tables = {}
+    def learn(dpid, mac, port):
+      if dpid not in tables:
+        tables[dpid] = {}
+      tables[dpid][mac] = port
+    lookup = lambda dpid, mac: tables[dpid].get(mac)
+  else:
+    table = macTable.MacTable(capacity, 300, kind, cSwitches + 1)
+    learn, lookup = table.learn, table.lookup
+
+  quiet = [ rng.getrandbits(48) for i in range(QUIET) ]
+  for mac in quiet:
+    learn(0, mac, 1)
+
+  sizes = []
+  step = cMacs // CHECKPOINTS
+  begin = time.time()
+  for i in xrange(cMacs):
+    learn(rng.randint(1, cSwitches), rng.getrandbits(48), rng.randint(1, 48))
+    if (i + 1) % step == 0:
+      sizes.append(rss())
+  elapsed = time.time() - begin
+  begin = time.time()
+  for i in xrange(cMacs): # the same draws, without learning
+    rng.randint(1, cSwitches), rng.getrandbits(48), rng.randint(1, 48)
+  elapsed -= time.time() - begin
+
+  kept = sum(lookup(0, mac) == 1 for mac in quiet) / float(QUIET)
+  results.put((kind, sizes, elapsed / cMacs * 1e6, kept))
+
+
+def main(cMacs = 2000000, capacity = 4096, cSwitches = 16):
+  results = multiprocessing.Queue()
+  rows = []
+  for kind in ("dict",) + macTable.EVICTIONS:
+    p = multiprocessing.Process(target = replay, \
+      args = (kind, cMacs, capacity, cSwitches, results))
+    p.start()
+    rows.append(results.get())
+    p.join()
+
+  print "RSS (MB) after learning a share of %i random MACs on %i switches; " \
+    "capacity %i per switch" % (cMacs, cSwitches, capacity)
+  print "%8s" % ("table",) + "".join("%9s" % ("%i%%" % (100 * (i + 1) \
+    // CHECKPOINTS),) for i in range(CHECKPOINTS)) + "%10s %11s" \
+    % ("us/MAC", "quiet kept")
+  for kind, sizes, perMac, kept in rows:
+    print "%8s" % (kind,) + "".join("%9.1f" % (size,) for size in sizes) \
+      + "%10.2f %10.0f%%" % (perMac, kept * 100)
+
+
+if __name__ == "__main__":
+  main(int(float(sys.argv[1]) * 1000000) if len(sys.argv) > 1 else 2000000, \
+    int(sys.argv[2]) if len(sys.argv) > 2 else 4096, \
+    int(sys.argv[3]) if len(sys.argv) > 3 else 16)
@@ -0,0 +1,101 @@
+"""
+micro-benchmark of reading the headers of a PacketIn: the full parse POX does
+for event.parsed against the fields packetHeaders.py slices out of the raw
+frame, per PacketIn
+
+  macs       source and destination MAC (l2learningEvaluation.py and
+             complexEvaluation_*.py, which read both through the same call)
+  ipv4       protocol and destination IP of an IPv4 packet (demo.py)
+
+the frames are UDP, TCP and ICMP over IPv4 and ARP, cut to the 128 bytes a
+switch sends by default; the full parse is POX's, or the stand-in of
+poxStandIn.py if POX cannot be imported (marked *); either way the two ways
+are checked to read the same fields
+
+usage: python packetHeadersBenchmark.py [path to pox] [PacketIns]
+"""
+
+import socket
+import struct
+import sys
+import time
+
+import packetHeaders
+import poxStandIn
+
+MISS_SEND_LEN = 128
+
+
+def frame(etherType, payload):
+  "an Ethernet frame from 00:00:00:00:01:01 to 00:00:00:00:00:11"
+  return "\0\0\0\0\0\x11" + "\0\0\0\0\x01\x01" + struct.pack("!H", etherType) \
+    + payload
+
+
+def ipv4_frame(protocol, payload):
+  "an IPv4 packet from 10.0.1.100 to 10.0.2.100"
+  return struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(payload), 1, 0, 64, \
+    protocol, 0, socket.inet_aton("10.0.1.100"), \
+    socket.inet_aton("10.0.2.100")) + payload
+
+
+FRAMES = {
+  "udp": frame(0x0800, ipv4_frame(17, \
+    struct.pack("!HHHH", 5000, 5001, 1008, 0) + "x" * 1000)),
+  "tcp": frame(0x0800, ipv4_frame(6, struct.pack("!HHIIBBHHH", 5000, 80, 1, \
+    0, 0x50, 0x10, 8192, 0, 0) + "x" * 1000)),
+  "icmp": frame(0x0800, ipv4_frame(1, struct.pack("!BBHHH", 8, 0, 0, 1, 1) \
+    + "x" * 56)),
+  "arp": frame(0x0806, struct.pack("!HHBBH6s4s6s4s", 1, 0x0800, 6, 4, 1, \
+    "\0\0\0\0\x01\x01", socket.inet_aton("10.0.1.100"), "\0" * 6, \
+    socket.inet_aton("10.0.1.1"))),
+}
+
+
+def parsed_fields(ethernet, data):
+  "what the components took from event.parsed"
+  packet = ethernet(raw = data)
+  src, dst = packet.src, packet.dst
+  ip = packet.find("ipv4")
+  return (packetHeaders.mac_to_int(src.toRaw()), \
+    packetHeaders.mac_to_int(dst.toRaw()), \
+    (ip.protocol, ip.dstip.toRaw()) if ip is not None else None)
+
+
+def raw_fields(data):
+  "what the components take from the raw frame now"
+  src, dst = packetHeaders.macs(data)
+  fields = packetHeaders.ipv4_fields(data)
+  return (src, dst, (fields[0], fields[2]) if fields is not None else None)
+
+
+def per_packet_in(read, data, cPacketIns):
+  "microseconds per read"
+  begin = time.time()
+  for i in xrange(cPacketIns):
+    read(data)
+  return (time.time() - begin) / cPacketIns * 1e6
+
+
+def main(poxPath = None, cPacketIns = 100000):
+  module, standIn = poxStandIn.load(poxPath, "pox.lib.packet.ethernet")
+  parser = module.ethernet
+
+  print "%6s %12s %12s %12s %12s" % ("frame", "parse* (us)" if standIn \
+    else "parse (us)", "macs (us)", "ipv4 (us)", "speedup")
+  for name in ("udp", "tcp", "icmp", "arp"):
+    data = FRAMES[name][:MISS_SEND_LEN]
+    macs = per_packet_in(packetHeaders.macs, data, cPacketIns)
+    fields = per_packet_in(packetHeaders.ipv4_fields, data, cPacketIns)
+    assert parsed_fields(parser, data) == raw_fields(data), name
+    parsing = per_packet_in(lambda data: parser(raw = data), data, cPacketIns)
+    print "%6s %12.3f %12.3f %12.3f %11.1fx" % (name, parsing, macs, fields, \
+      parsing / (macs + fields))
+  if standIn:
+    print poxStandIn.caveat("the checks of POX's header parsing and the " \
+      "fields and properties of its packet classes")
+
+
+if __name__ == "__main__":
+  main(sys.argv[1] if len(sys.argv) > 1 else None, \
+    int(sys.argv[2]) if len(sys.argv) > 2 else 100000)
@@ -0,0 +1,75 @@
+"""
+compact packet_out results of the worker processes of the evaluation
+components
+
+a worker used to build an ofp_packet_out with an ofp_action_output for every
+packet and pickle the objects back to the main process, which packed them
+again before writing them to the switch; now a worker appends a fixed-size
+record (dpid, buffer id, in-port, out-port) per packet to a byte string, and
+the main process fills these fields into a preallocated OpenFlow 1.0
+packet_out with a single output action and hands the bytes to sendToDPID,
+which writes bytes as they are; no message object is built on either side
+
+  record       =QIHH   dpid, buffer id, in-port, out-port   (16 bytes)
+  packet_out   !BBHI IHH HHHH                               (24 bytes)
+               header (version, type, length, xid), buffer id, in-port,
+               length of the actions, output action (type, length, port,
+               max length)
+
+the messages are the same POX packs from ofp_packet_out, except that the xids
+come from a counter of the template; a packet_out without actions, which has
+the switch drop the buffered packet, is the first 16 bytes with an actions
+length of 0
+"""
+
+import struct
+
+OFP_VERSION = 0x01
+OFPT_PACKET_OUT = 13
+OFPAT_OUTPUT = 0
+OFPP_NONE = 0xffff
+NO_BUFFER = 0xffffffff # the buffer id of a packet the switch has not buffered
+
+RECORD = struct.Struct("=QIHH")
+_PACKET_OUT = struct.Struct("!BBHIIHHHHHH")
+_DROP = struct.Struct("!BBHIIHH")
+_XID_TO_IN_PORT = struct.Struct("!IIH") # xid, buffer id, in-port
+_OUT_PORT = struct.Struct("!H")
+
+
+def record(dpid, bufferID, outPort, inPort = OFPP_NONE):
+  "the record of a packet_out releasing buffer *bufferID* of switch *dpid* "
+  "through *outPort*"
+  return RECORD.pack(dpid, NO_BUFFER if bufferID is None else bufferID, \
+    inPort, outPort)
+
+
+class PacketOutTemplate(object):
+  "a preallocated packet_out; not to be shared between threads"
+
+  def __init__(self):
+    self.buf = bytearray(_PACKET_OUT.size)
+    _PACKET_OUT.pack_into(self.buf, 0, OFP_VERSION, OFPT_PACKET_OUT, \
+      _PACKET_OUT.size, 0, NO_BUFFER, OFPP_NONE, 8, OFPAT_OUTPUT, 8, 0, 0xffff)
+    self.xid = 0
+
+  def message(self, bufferID, outPort, inPort = OFPP_NONE):
+    "the wire bytes of a packet_out with these fields"
+    self.xid = (self.xid + 1) & 0xffffffff
+    _XID_TO_IN_PORT.pack_into(self.buf, 4, self.xid, \
+      NO_BUFFER if bufferID is None else bufferID, inPort)
+    _OUT_PORT.pack_into(self.buf, 20, outPort)
+    return bytes(self.buf)
+
+  def drop(self, bufferID, inPort = OFPP_NONE):
+    "the wire bytes of a packet_out that drops buffer *bufferID*"
+    self.xid = (self.xid + 1) & 0xffffffff
+    return _DROP.pack(OFP_VERSION, OFPT_PACKET_OUT, _DROP.size, self.xid, \
+      NO_BUFFER if bufferID is None else bufferID, inPort, 0)
+
+  def send_records(self, records, send):
+    "calls send(dpid, message) for every record in the byte string *records*"
+    unpack_from, size = RECORD.unpack_from, RECORD.size
+    for offset in xrange(0, len(records), size):
+      dpid, bufferID, inPort, outPort = unpack_from(records, offset)
+      send(dpid, self.message(bufferID, outPort, inPort))
@@ -0,0 +1,97 @@
+"""
+micro-benchmark of the way packet_out results travel from a worker process to
+the switch, per message and without the pipe itself
+
+  objects   the worker builds an ofp_packet_out with an ofp_action_output,
+            the list of (msg, dpid) pairs is pickled and unpickled, and the
+            main process packs every message (what sendToDPID does with it)
+  records   the worker packs a record per packet into a byte string, which is
+            pickled and unpickled, and the main process fills every record
+            into the preallocated template of packetOut.py
+
+both are run with results sent one at a time and in batches of 64; the
+objects path is measured with POX's classes, or the stand-ins of
+poxStandIn.py if POX cannot be imported (marked *); either way the two paths
+are checked to produce the same bytes, xids aside
+
+usage: python packetOutBenchmark.py [path to pox] [messages]
+"""
+
+import cPickle as pickle
+import random
+import sys
+import time
+
+import packetOut
+import poxStandIn
+
+
+def objects_path(packets, batchSize, of):
+  "seconds per message through the objects path"
+  begin = time.time()
+  for i in xrange(0, len(packets), batchSize):
+    results = []
+    for dpid, bufferID, inPort, outPort in packets[i:i + batchSize]:
+      msg = of.ofp_packet_out()
+      msg.actions.append(of.ofp_action_output(port = outPort))
+      msg.buffer_id = bufferID
+      msg.in_port = inPort
+      results.append((msg, dpid))
+    for msg, dpid in pickle.loads(pickle.dumps(results, 2)):
+      msg.pack()
+  return (time.time() - begin) / len(packets)
+
+
+def records_path(packets, batchSize, template):
+  "seconds per message through the records path"
+  sent = []
+  send = lambda dpid, data: sent.append(data)
+  begin = time.time()
+  for i in xrange(0, len(packets), batchSize):
+    records = [ packetOut.record(dpid, bufferID, outPort, inPort) \
+      for dpid, bufferID, inPort, outPort in packets[i:i + batchSize] ]
+    results = pickle.loads(pickle.dumps(("".join(records), []), 2))
+    template.send_records(results[0], send)
+    del sent[:]
+  return (time.time() - begin) / len(packets)
+
+
+def check(of, template, packet):
+  "both paths produce the same bytes for *packet*, xids aside"
+  dpid, bufferID, inPort, outPort = packet
+  msg = of.ofp_packet_out()
+  msg.actions.append(of.ofp_action_output(port = outPort))
+  msg.buffer_id = bufferID
+  msg.in_port = inPort
+  msg.xid = 0
+  data = template.message(bufferID, outPort, inPort)
+  packed = msg.pack()
+  assert packed[:4] == data[:4] and packed[8:] == data[8:], \
+    (packed.encode("hex"), data.encode("hex"))
+
+
+def main(poxPath = None, cMessages = 200000):
+  of, standIn = poxStandIn.load(poxPath, "pox.openflow.libopenflow_01")
+
+  rng = random.Random(1)
+  packets = [ (rng.randint(1, 23), rng.randint(0, 0xfffffff), \
+    rng.randint(1, 8), rng.randint(1, 8)) for i in xrange(cMessages) ]
+  template = packetOut.PacketOutTemplate()
+  for packet in packets[:1000]:
+    check(of, template, packet)
+
+  print "%6s %14s %14s %8s" % ("batch", "objects* (us)" if standIn \
+    else "objects (us)", "records (us)", "speedup")
+  for batchSize in (1, 64):
+    new = records_path(packets, batchSize, template)
+    old = objects_path(packets, batchSize, of)
+    print "%6i %14.2f %14.2f %7.1fx" % (batchSize, old * 1e6, new * 1e6, \
+      old / new)
+  if standIn:
+    print poxStandIn.caveat("the validation and property accessors POX's " \
+      "ofp_packet_out and ofp_action_output go through to pack a message")
+
+
+if __name__ == "__main__":
+  main(sys.argv[1] if len(sys.argv) > 1 else None, \
+    int(sys.argv[2]) if len(sys.argv) > 2 else 200000)
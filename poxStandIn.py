@@ -0,0 +1,146 @@
+"""
+plain stand-ins of the POX classes packetOutBenchmark.py and
+packetHeadersBenchmark.py measure against, for when POX cannot be imported
+
+  ofp_packet_out, ofp_action_output   pox.openflow.libopenflow_01
+  ethernet and the layers it carries  pox.lib.packet.ethernet
+
+*load* imports the POX module if it can (from *poxPath*, the directory
+holding the pox package, or from PYTHONPATH) and hands out this module in
+its place otherwise; a stand-in produces what POX's class does with less
+work, so a speedup measured against it is a lower bound, which *caveat*
+says below the results, naming what the benchmark's stand-in leaves out
+"""
+
+import importlib
+import itertools
+import struct
+import sys
+
+import packetOut
+
+_HEADER = struct.Struct("!BBHIIHH") # header, buffer id, in-port, actions len
+_ACTION_OUTPUT = struct.Struct("!HHHH") # type, length, port, max length
+_ETHERNET = struct.Struct("!6s6sH")
+_IPV4 = struct.Struct("!BBHHHBBH4s4s")
+_ARP = struct.Struct("!HHBBH6s4s6s4s")
+_PORTS = struct.Struct("!HH")
+_TCP = struct.Struct("!HHIIBBHHH")
+_ICMP = struct.Struct("!BBH")
+_xids = itertools.count(1)
+
+
+def load(poxPath, name):
+  "(the POX module *name*, False), or (this module, True) if it cannot be "
+  "imported"
+  if poxPath:
+    sys.path.insert(0, poxPath)
+  try:
+    return importlib.import_module(name), False
+  except ImportError:
+    return sys.modules[__name__], True
+
+
+def caveat(leftOut):
+  "the note printed below the results measured with a stand-in that leaves "
+  "*leftOut* out"
+  return "* POX cannot be imported: measured with a plain stand-in, which " \
+    "leaves out %s; the speedup over POX is larger" % (leftOut,)
+
+
+# pox.openflow.libopenflow_01
+
+class ofp_action_output(object):
+  def __init__(self, port = None, max_len = 0xffff):
+    self.port = port
+    self.max_len = max_len
+
+  def pack(self):
+    return _ACTION_OUTPUT.pack(packetOut.OFPAT_OUTPUT, _ACTION_OUTPUT.size, \
+      self.port, self.max_len)
+
+
+class ofp_packet_out(object):
+  def __init__(self):
+    self.xid = next(_xids) & 0xffffffff
+    self.buffer_id = packetOut.NO_BUFFER
+    self.in_port = packetOut.OFPP_NONE
+    self.actions = []
+    self.data = None
+
+  def pack(self):
+    actions = "".join(action.pack() for action in self.actions)
+    data = self.data or ""
+    return _HEADER.pack(packetOut.OFP_VERSION, packetOut.OFPT_PACKET_OUT, \
+      _HEADER.size + len(actions) + len(data), self.xid, self.buffer_id, \
+      self.in_port, len(actions)) + actions + data
+
+
+# pox.lib.packet.ethernet
+
+class address(object):
+  def __init__(self, raw):
+    self.raw = raw
+
+  def toRaw(self):
+    return self.raw
+
+
+class layer(object):
+  "a header and what it carries, in *next* (a layer or the raw payload)"
+
+  def find(self, name):
+    packet = self
+    while isinstance(packet, layer):
+      if type(packet).__name__ == name:
+        return packet
+      packet = packet.next
+    return None
+
+
+class ethernet(layer):
+  def __init__(self, raw):
+    dst, src, self.type = _ETHERNET.unpack_from(raw, 0)
+    self.dst, self.src = address(dst), address(src)
+    self.next = _LAYERS.get(self.type, str)(raw[_ETHERNET.size:])
+
+
+class ipv4(layer):
+  def __init__(self, raw):
+    (versionIHL, self.tos, self.iplen, self.id, self.frag, self.ttl, \
+      self.protocol, self.csum, srcip, dstip) = _IPV4.unpack_from(raw, 0)
+    self.srcip, self.dstip = address(srcip), address(dstip)
+    headerLength = (versionIHL & 0xf) * 4
+    self.next = _LAYERS.get(-self.protocol, str)(raw[headerLength:])
+
+
+class arp(layer):
+  def __init__(self, raw):
+    (self.hwtype, self.prototype, self.hwlen, self.protolen, self.opcode, \
+      hwsrc, protosrc, hwdst, protodst) = _ARP.unpack_from(raw, 0)
+    self.hwsrc, self.hwdst = address(hwsrc), address(hwdst)
+    self.protosrc, self.protodst = address(protosrc), address(protodst)
+    self.next = raw[_ARP.size:]
+
+
+class udp(layer):
+  def __init__(self, raw):
+    self.srcport, self.dstport = _PORTS.unpack_from(raw, 0)
+    self.next = raw[8:]
+
+
+class tcp(layer):
+  def __init__(self, raw):
+    (self.srcport, self.dstport, self.seq, self.ack, offset, self.flags, \
+      self.win, self.csum, self.urg) = _TCP.unpack_from(raw, 0)
+    self.next = raw[(offset >> 4) * 4:]
+
+
+class icmp(layer):
+  def __init__(self, raw):
+    self.type, self.code, self.csum = _ICMP.unpack_from(raw, 0)
+    self.next = raw[_ICMP.size:]
+
+
+# EtherTypes, and IP protocols negated
+_LAYERS = { 0x0800: ipv4, 0x0806: arp, -17: udp, -6: tcp, -1: icmp }
@@ -0,0 +1,500 @@
+"""
+offline replay benchmark of the evaluation components: synthesized PacketIns
+are fed to an *Evaluation* instance without Mininet, cbench or a switch, and
+the throughput and latency percentiles of its answers are measured, in
+monoprocessing mode and in multiprocessing mode with 1..N workers
+
+pox.core is replaced by a stub: core.openflow hands every message the
+component sends to sendToDPID to the benchmark, which matches it with its
+PacketIn by the buffer id and notes the time taken; pox.openflow and pox.lib
+are stubbed as far as the components use them, unless POX can be imported
+(pass pox=path, the directory holding the pox package), in which case only
+pox.core is replaced
+
+every run is made in a process of its own, so the worker processes, threads
+and shared tables of one run cannot disturb the next; the PacketIns are made
+before a run starts and sent from a single thread, as POX's event loop does,
+at *rate* per second (0 for as fast as the component takes them)
+
+  complexEvaluation_*.py  before the run every host sends a frame from its
+                          edge port to be learned, and is sent one to build
+                          its shortest path tree; the PacketIns then head
+                          for a host drawn from the *dist* distribution over
+                          the hosts of the topology (topo=...), at a switch
+                          drawn from it as well, entering by one of its links
+  l2learningEvaluation.py frames between *macs* MACs drawn from *dist*, at
+                          *switches* switches; a MAC enters a switch by a port
+                          of its own, so it is learned from the first frames
+
+dist is uniform or zipf (exponent 1)
+
+usage: python replayBenchmark.py [key=value ...]
+  variants  comma-separated: duplexPipes, simplexPipes, sharedQueue, l2
+            (default: all four)
+  workers   the largest number of workers, 1..N are run (default 4)
+  threads   the largest number of threads of mode 3, 1..N are run
+            (default 4, 0 for none)
+  packets   PacketIns per run (default 20000)
+  rate      PacketIns per second, 0 for no pacing (default 0)
+  batchSize, batchDelay, add, affinity, inFlight, overload, scheduler
+            passed to the components as at launch; add may be a list
+            per worker, e.g. add=0,0,0,50000 for a slow fourth worker
+  topo, allPairs
+            for complexEvaluation_*.py, as at launch (default complexTopo.json
+            and 0)
+  regenerate
+            for complexEvaluation_*.py, seconds between regenerations of the
+            link costs during a run, 0 for none (default 0); the answers
+            computed from an older routing snapshot are in the stages
+  switches, macs
+            for l2learningEvaluation.py (default 16 and 1000)
+  dist      uniform or zipf (default uniform)
+  seed      of the PacketIns (default 1)
+  stages    1 to print the latency of every stage of each run as well
+            (stageStats.py; always in the output file)
+  output    a file the results are appended to, a JSON object per run
+  pox       the directory holding the pox package, if it is to be used
+"""
+
+import bisect
+import json
+import logging
+import os
+import random
+import struct
+import sys
+import threading
+import time
+import types
+
+VARIANTS = { "duplexPipes": "complexEvaluation_duplexPipes", \
+  "simplexPipes": "complexEvaluation_simplexPipes", \
+  "sharedQueue": "complexEvaluation_sharedQueue", \
+  "l2": "l2learningEvaluation" }
+MODES = { 1: "mono", 2: "multi", 3: "thread" }
+NO_BUFFER = 0xffffffff
+DRAIN_TIMEOUT = 5.0 # seconds without an answer after which a run ends
+_BUFFER_ID = struct.Struct("!I") # of a packet_out in wire bytes, at offset 8
+_FRAME = struct.Struct("!HIHIH") # destination and source MAC, EtherType
+
+
+# the stub of POX
+
+class Core(object):
+  "what the components use of pox.core.core"
+
+  def __init__(self):
+    self.openflow = OpenFlow()
+    self.components = {}
+    self.listeners = []
+
+  def addListeners(self, listener):
+    self.listeners.append(listener)
+
+  def getLogger(self, name = None):
+    return logging.getLogger(name or "replay")
+
+  def register(self, name, component):
+    self.components[name] = component
+    setattr(self, name, component)
+
+
+class OpenFlow(object):
+  "core.openflow; every message sent is handed to *sink*(dpid, message)"
+
+  def __init__(self):
+    self.listeners = []
+    self.sink = lambda dpid, message: None
+
+  def addListeners(self, listener):
+    self.listeners.append(listener)
+
+  def sendToDPID(self, dpid, message):
+    self.sink(dpid, message)
+
+
+class ofp_match(object):
+  pass
+
+
+class ofp_action_output(object):
+  def __init__(self, port = None):
+    self.port = port
+
+
+class ofp_packet_in(object):
+  def __init__(self, data = "", buffer_id = NO_BUFFER, in_port = 0):
+    self.data = data
+    self.buffer_id = buffer_id
+    self.in_port = in_port
+
+
+class ofp_packet_out(object):
+  def __init__(self):
+    self.data = None
+    self.buffer_id = None
+    self.actions = []
+
+
+class ofp_flow_mod(object):
+  def __init__(self):
+    self.match = ofp_match()
+    self.buffer_id = None
+    self.idle_timeout = self.hard_timeout = 0
+    self.actions = []
+
+
+class ofp_phy_port(object):
+  def __init__(self, port_no = 0):
+    self.port_no = port_no
+
+
+class ofp_features_reply(object):
+  def __init__(self, ports = ()):
+    self.ports = list(ports)
+
+
+class EthAddr(object):
+  def __init__(self, raw):
+    self.raw = raw
+
+  def toRaw(self):
+    return self.raw
+
+
+def install_pox_stub(poxPath = None):
+  "puts the stub of pox.core, and of the rest of POX if it cannot be "
+  "imported, into sys.modules; returns the stub core"
+  core = Core()
+  poxCore = types.ModuleType("pox.core")
+  poxCore.core = core
+  sys.modules["pox.core"] = poxCore
+  if poxPath:
+    sys.path.insert(0, poxPath)
+  try:
+    __import__("pox").core = poxCore
+    __import__("pox.openflow.libopenflow_01")
+    __import__("pox.lib.addresses")
+    return core
+  except ImportError:
+    pass
+
+  for name in ("pox", "pox.openflow", "pox.lib"):
+    sys.modules.pop(name, None)
+  of = types.ModuleType("pox.openflow.libopenflow_01")
+  of.OFPP_ALL = 0xfffc
+  of.OFPP_FLOOD = 0xfffb
+  of.OFPP_NONE = 0xffff
+  of.NO_BUFFER = NO_BUFFER
+  for cls in (ofp_match, ofp_action_output, ofp_packet_in, ofp_packet_out, \
+    ofp_flow_mod, ofp_phy_port, ofp_features_reply):
+    setattr(of, cls.__name__, cls)
+  addresses = types.ModuleType("pox.lib.addresses")
+  addresses.EthAddr = EthAddr
+  openflow = types.ModuleType("pox.openflow")
+  openflow.libopenflow_01 = of
+  lib = types.ModuleType("pox.lib")
+  lib.addresses = addresses
+  pox = types.ModuleType("pox")
+  pox.__path__ = []
+  pox.core, pox.openflow, pox.lib = poxCore, openflow, lib
+  sys.modules.update({ "pox": pox, "pox.openflow": openflow, \
+    "pox.openflow.libopenflow_01": of, "pox.lib": lib, \
+    "pox.lib.addresses": addresses })
+  return core
+
+
+# the PacketIns
+
+class PacketIn(object):
+  "what the components read from a PacketIn event"
+
+  def __init__(self, of, dpid, port, data, bufferID):
+    self.dpid = dpid
+    self.port = port
+    self.ofp = of.ofp_packet_in(data = data, buffer_id = bufferID, \
+      in_port = port)
+    self.connection = None
+
+
+class ConnectionUp(object):
+  "what the components read from a ConnectionUp event"
+
+  def __init__(self, of, dpid, ports):
+    self.dpid = dpid
+    self.connection = "switch %i" % (dpid,)
+    self.ofp = of.ofp_features_reply(ports = \
+      [ of.ofp_phy_port(port_no = port) for port in ports ])
+
+
+def frame(src, dst):
+  "a 64-byte IPv4 frame from *src* to *dst* (MACs as integers)"
+  return _FRAME.pack(dst >> 32, dst & 0xffffffff, src >> 32, \
+    src & 0xffffffff, 0x0800) + "\0" * 50
+
+
+def sampler(n, dist, rng):
+  "a function drawing an index 0..n-1 from the distribution *dist*"
+  if dist == "uniform":
+    return lambda: rng.randrange(n)
+  if dist != "zipf":
+    raise ValueError("unknown distribution %s" % (dist,))
+  cumulative = []
+  total = 0.0
+  for k in range(1, n + 1):
+    total += 1.0 / k
+    cumulative.append(total)
+  return lambda: min(n - 1, bisect.bisect(cumulative, rng.random() * total))
+
+
+def complex_workload(topo, cPackets, dist, rng):
+  "(warm-up PacketIns, PacketIns, the ports of every switch) over the "
+  "topology; a PacketIn is (dpid, in-port, frame)"
+  import topoGenerators
+  topology = topoGenerators.topology(topo)
+  linkPorts = dict((dpid, []) for dpid in topology.switches)
+  for dpid1, dpid2, port1, port2 in topology.links:
+    linkPorts[dpid1].append(port1)
+    linkPorts[dpid2].append(port2)
+  ports = dict((dpid, list(p)) for dpid, p in linkPorts.iteritems())
+  hosts = []
+  for i, host in enumerate(topology.hosts):
+    mac = int(host["mac"].replace(":", ""), 16) if "mac" in host \
+      else 0x020000000000 + i
+    hosts.append((mac, host["dpid"], host["port"]))
+    ports[host["dpid"]].append(host["port"])
+  if len(hosts) < 2:
+    raise ValueError("the topology needs two hosts")
+
+  switches = [ dpid for dpid in topology.switches if linkPorts[dpid] ]
+  warmUp = [ (dpid, port, frame(mac, 0xffffffffffff)) \
+    for mac, dpid, port in hosts ]
+  for i, (mac, dpid, port) in enumerate(hosts):
+    src = hosts[i - 1]
+    warmUp.append((src[1], src[2], frame(src[0], mac)))
+
+  pickHost = sampler(len(hosts), dist, rng)
+  pickSwitch = sampler(len(switches), dist, rng)
+  packets = []
+  for i in xrange(cPackets):
+    dst, src = hosts[pickHost()], hosts[rng.randrange(len(hosts))]
+    dpid = switches[pickSwitch()]
+    packets.append((dpid, rng.choice(linkPorts[dpid]), frame(src[0], dst[0])))
+  return warmUp, packets, ports
+
+
+def l2_workload(cSwitches, cMacs, cPackets, dist, rng):
+  "(warm-up PacketIns, PacketIns, the ports of every switch) between *cMacs* "
+  "MACs at *cSwitches* switches; MAC m enters a switch by port m % 47 + 1"
+  macs = [ 0x020000000000 + i for i in range(cMacs) ]
+  port = lambda mac: mac % 47 + 1
+  pickMac = sampler(cMacs, dist, rng)
+  pickSwitch = sampler(cSwitches, dist, rng)
+  packets = []
+  for i in xrange(cPackets):
+    src, dst = macs[pickMac()], macs[pickMac()]
+    packets.append((pickSwitch() + 1, port(src), frame(src, dst)))
+  ports = dict((dpid, range(1, 48)) for dpid in range(1, cSwitches + 1))
+  return [], packets, ports
+
+
+# a run
+
+def buffer_id(message):
+  "the buffer id a message sent to a switch releases; None if none"
+  if isinstance(message, (str, bytes, bytearray)):
+    return _BUFFER_ID.unpack_from(message, 8)[0]
+  bufferID = getattr(message, "buffer_id", None)
+  if bufferID in (None, NO_BUFFER, -1):
+    bufferID = getattr(getattr(message, "data", None), "buffer_id", None)
+  return bufferID
+
+
+def percentile(values, p):
+  return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+
+class Run(object):
+  "feeds PacketIns to an *Evaluation* and notes when each one is answered"
+
+  def __init__(self, core, of, inst):
+    self.of = of
+    self.inst = inst
+    self.pending = {} # buffer id -> time its PacketIn was sent
+    self.latencies = []
+    self.lastAnswer = self.lastSent = 0
+    self.nextBufferID = 0
+    core.openflow.sink = self.answered
+
+  def answered(self, dpid, message):
+    sent = self.pending.pop(buffer_id(message), None)
+    if sent is not None:
+      self.lastAnswer = time.time()
+      self.latencies.append(self.lastAnswer - sent)
+
+  def connect(self, ports):
+    if hasattr(self.inst, "_handle_ConnectionUp"):
+      for dpid, switchPorts in sorted(ports.iteritems()):
+        self.inst._handle_ConnectionUp( \
+          ConnectionUp(self.of, dpid, switchPorts))
+
+  def send(self, packets, rate = 0):
+    "sends the PacketIns, paced at *rate* per second if not 0"
+    events = []
+    for dpid, port, data in packets:
+      self.nextBufferID += 1
+      events.append(PacketIn(self.of, dpid, port, data, self.nextBufferID))
+    handle, pending = self.inst._handle_PacketIn, self.pending
+    begin = time.time()
+    for i, event in enumerate(events):
+      if rate:
+        ahead = begin + i / float(rate) - time.time()
+        if ahead > 0.001:
+          time.sleep(ahead)
+      pending[event.ofp.buffer_id] = self.lastSent = time.time()
+      handle(event)
+    return begin
+
+  def drain(self):
+    "waits until every PacketIn has been answered, or none has been for "
+    "DRAIN_TIMEOUT seconds"
+    while self.pending:
+      last = max(self.lastAnswer, self.lastSent)
+      if time.time() - last > DRAIN_TIMEOUT:
+        break
+      time.sleep(0.01)
+
+
+def regenerate(inst, interval, stopped):
+  "regenerates the link costs every *interval* seconds until *stopped* is set"
+  while not stopped.wait(interval):
+    inst.regenerate_link_costs()
+
+
+def run(variant, mode, cWorkers, packets, warmUp, ports, settings):
+  "the results of a run of *variant*, made in a process of its own"
+  reader, writer = os.pipe()
+  pid = os.fork()
+  if pid:
+    os.close(writer)
+    data = ""
+    while 1:
+      chunk = os.read(reader, 65536)
+      if not chunk:
+        break
+      data += chunk
+    os.close(reader)
+    os.waitpid(pid, 0)
+    return json.loads(data) if data else None
+
+  os.close(reader)
+  result = None
+  try:
+    # the workers print when they map a store
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    core = sys.modules["pox.core"].core
+    of = sys.modules["pox.openflow.libopenflow_01"]
+    component = __import__(VARIANTS[variant])
+    # in mode 3 *cWorkers* is the number of threads
+    options = dict(cWorkerProcesses = cWorkers if mode != 3 else 1, \
+      cThreads = cWorkers, mode = mode, \
+      batchSize = settings["batchSize"], batchDelay = settings["batchDelay"], \
+      inFlight = settings["inFlight"], overload = settings["overload"], \
+      scheduler = settings["scheduler"])
+    if variant == "l2":
+      options.update(add = settings["add"], affinity = settings["affinity"])
+    else:
+      options.update(topo = settings["topo"], allPairs = settings["allPairs"])
+    component.launch(**options)
+    inst = core.components["evaluation"]
+    replay = Run(core, of, inst)
+    replay.connect(ports)
+    replay.send(warmUp)
+    replay.drain()
+    if variant != "l2":
+      inst.builder.wait() # the trees towards the hosts
+    time.sleep(0.2) # the workers map the store of the new trees
+    replay.latencies = []
+    inst.reset_stats()
+
+    regenerating = threading.Event()
+    if variant != "l2" and settings["regenerate"]:
+      regenerator = threading.Thread(target = regenerate, \
+        args = (inst, settings["regenerate"], regenerating))
+      regenerator.daemon = True
+      regenerator.start()
+    begin = replay.send(packets, settings["rate"])
+    replay.drain()
+    regenerating.set()
+    latencies = sorted(replay.latencies)
+    elapsed = (replay.lastAnswer or time.time()) - begin
+    result = { "variant": variant, \
+      "mode": MODES[mode], "workers": cWorkers, \
+      "packets": len(packets), "answered": len(latencies), \
+      "throughput": len(latencies) / elapsed if elapsed > 0 else 0 }
+    for p in (50, 90, 99, 99.9):
+      result["p%s" % (p,)] = percentile(latencies, p) * 1000 \
+        if latencies else None
+    result["max"] = latencies[-1] * 1000 if latencies else None
+    result["stages"] = inst.stats()
+    result["stageTable"] = inst.stageStats.table()
+    inst._handle_GoingDownEvent(None) # as when POX goes down
+  finally:
+    os.write(writer, json.dumps(result))
+    os.close(writer)
+    os._exit(0)
+
+
+def main(variants = ",".join(sorted(VARIANTS)), workers = 4, threads = 4, \
+  packets = 20000, rate = 0, batchSize = 1, batchDelay = 200, add = 0, \
+  affinity = 0, \
+  inFlight = 0, overload = "dropOldest", scheduler = "roundRobin", \
+  topo = None, allPairs = 0, regenerate = 0, switches = 16, macs = 1000, dist = "uniform", seed = 1, \
+  stages = 0, output = None, pox = None):
+  logging.basicConfig(level = logging.WARNING)
+  install_pox_stub(pox)
+  settings = { "rate": float(rate), "batchSize": int(batchSize), \
+    "batchDelay": int(batchDelay), "add": str(add), \
+    "affinity": int(affinity), "inFlight": int(inFlight), \
+    "overload": overload, "scheduler": scheduler, "topo": topo, \
+    "allPairs": int(allPairs), "regenerate": float(regenerate) }
+
+  print "%13s %6s %8s %8s %10s %9s %9s %9s %9s %9s" % ("variant", "mode", \
+    "workers", "answered", "PacketIn/s", "p50 (ms)", "p90 (ms)", \
+    "p99 (ms)", "p99.9 (ms)", "max (ms)")
+  for variant in variants.split(","):
+    if variant not in VARIANTS:
+      sys.exit("unknown variant %s" % (variant,))
+    rng = random.Random(int(seed))
+    if variant == "l2":
+      warmUp, replayed, ports = l2_workload(int(switches), int(macs), \
+        int(packets), dist, rng)
+    else:
+      warmUp, replayed, ports = complex_workload(topo, int(packets), dist, rng)
+
+    for mode, cWorkers in [(1, 1)] \
+      + [ (2, i) for i in range(1, int(workers) + 1) ] \
+      + [ (3, i) for i in range(1, int(threads) + 1) ]:
+      result = run(variant, mode, cWorkers, replayed, warmUp, ports, settings)
+      if result is None:
+        print "%13s %6s %8i   failed" % (variant, \
+          MODES[mode], cWorkers)
+        continue
+      print "%13s %6s %8i %8i %10.0f %9s %9s %9s %9s %9s" % ((variant, \
+        result["mode"], cWorkers, result["answered"], result["throughput"]) \
+        + tuple("%.3f" % result[key] if result[key] is not None else "-" \
+        for key in ("p50", "p90", "p99", "p99.9", "max")))
+      stageTable = result.pop("stageTable")
+      if int(stages):
+        for line in stageTable:
+          print " " * 15 + line
+      sys.stdout.flush()
+      if output:
+        with open(output, "a") as f:
+          f.write(json.dumps(dict(result, settings = settings, \
+            dist = dist, seed = int(seed))) + "\n")
+
+
+if __name__ == "__main__":
+  main(**dict(arg.split("=", 1) for arg in sys.argv[1:]))
@@ -0,0 +1,131 @@
+"""
+versioned snapshots of the routing state of the complexEvaluation_*.py
+components, built off the path of the PacketIns
+
+the routing state is double-buffered: the graph, the shortest path trees and
+the next-hop table they lead to are the back buffer, changed by one thread of
+its own, the *SnapshotBuilder*, one change after another; once a change is
+complete it is published as a *Snapshot*, the front buffer, which is never
+changed again:
+
+  version     numbered from 1 in the order the snapshots were published
+  store       the topologyStore.TopologyStore the workers map, holding the
+              version in its header
+  view        a TopologyView of the store, read by the PacketIn handler in
+              monoprocessing mode and by the thread pool
+
+the component swaps its snapshot by a single assignment, which is atomic, and
+a PacketIn handler reads it once, so it sees one version throughout however
+the routing changes meanwhile; the path of each new store is sent to the
+workers before the snapshot is swapped in, both under the lock of the
+dispatcher, so a worker has switched over by the time it is sent a PacketIn
+handled with the new snapshot; every descriptor names the version it was
+handled with and every result the version it was computed from, and a worker
+whose store is older, or has no next hop, sends the PacketIn back to be
+answered in the main process (see stageStats.py for the counts)
+
+what a change costs: after a link change the store is derived from the one
+before, a single copy of its bytes plus the writes of the changed link slots
+and next-hop entries, so the cost grows with the size of the store only as
+fast as copying memory; a store is laid out in full, in time linear in
+nodes x destinations, for a change of all link costs, a new destination, or
+a link the graph had no slots for; the copy instead of a write in place keeps
+a store from changing under a worker that has not switched over yet
+
+the builder takes turns on the GIL with the other threads, so a big change
+slows the PacketIns down instead of holding them up; the store it replaces
+is removed once the new one is published, and mappings of the old one stay
+valid until they are closed; *shutdown* waits for the change running, so
+that its store is not left behind
+"""
+
+import Queue
+import threading
+import time
+
+import topologyStore
+
+
+class Snapshot(object):
+  "the routing state published as *version* in *store*; its fields are "
+  "never changed"
+
+  def __init__(self, version, store):
+    self.version = version
+    self.store = store
+    self.view = topologyStore.TopologyView(store.path)
+
+  def close(self):
+    "removes the store; views that are open keep their mapping"
+    self.store.close()
+
+
+class SnapshotBuilder(object):
+  "runs the changes submitted, one after another, on a thread of its own; "
+  "a change builds the back buffer and publishes it with *publish*, which "
+  "hands the new snapshot to swap(snapshot, submitted), *submitted* being "
+  "the time the change was submitted"
+
+  def __init__(self, swap, log):
+    self.swap = swap
+    self.log = log
+    self.changes = Queue.Queue()
+    self.version = 0 # of the last snapshot published
+    self.snapshot = None # the last one published
+    self.submitted = None # the time the running change was submitted
+
+    self.buildingThread = threading.Thread(target = self._building_task)
+    self.buildingThread.daemon = True
+    self.buildingThread.start()
+
+  def submit(self, change, *args):
+    "has change(*args) run after the changes submitted before"
+    self.changes.put((change, args, time.time()))
+
+  def wait(self):
+    "returns once the changes submitted so far have been published"
+    self.changes.join()
+
+  def shutdown(self):
+    "drops the changes that have not started and returns once the running "
+    "one has been published; no change runs afterwards"
+    while 1:
+      try:
+        self.changes.get_nowait()
+      except Queue.Empty:
+        break
+      self.changes.task_done()
+    self.changes.put(None)
+    self.buildingThread.join()
+
+  def publish(self, graph, destinations, nextHops, links = None, \
+    changes = None):
+    "lays the back buffer out as the next snapshot and has it swapped in, "
+    "*nextHops* being the ports of the next-hop table; given the *links* (dpid1, dpid2) and the next-hop entries *changes* a "
+    "change has made, the store is derived from the last one if the layout "
+    "is the same; call from a change"
+    self.version += 1
+    last = self.snapshot
+    if changes is not None and last is not None \
+      and last.store.fits(graph, destinations):
+      store = last.store.derive(self.version, graph, links, changes)
+    else:
+      store = topologyStore.TopologyStore(graph, destinations, nextHops, \
+        self.version)
+    self.snapshot = Snapshot(self.version, store)
+    self.swap(self.snapshot, self.submitted)
+
+  def _building_task(self):
+    "runs every change submitted, until a None"
+    while 1:
+      item = self.changes.get()
+      if item is None:
+        self.changes.task_done()
+        return
+      change, args, self.submitted = item
+      try:
+        change(*args)
+      except Exception:
+        self.log.exception(" a change of the routing state has failed")
+      finally:
+        self.changes.task_done()
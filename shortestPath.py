@@ -0,0 +1,397 @@
+"""
+shortest path engines shared by the complexEvaluation_*.py components
+
+the engines below take the topology as an adjacency table, the structure the
+components originally kept:
+  { dpid: { neighbor dpid: (outport, link cost) } }
+
+linear_scan_dijkstra is the engine the components originally ran for every
+PacketIn: it picks the next node by scanning all distances, so a single run
+costs O(V^2); it is kept for reference and for shortestPathBenchmark.py
+
+dijkstra keeps the open nodes in a binary heap; a node whose distance drops is
+pushed again instead of being updated in place, and the stale entries are
+skipped when they are popped (lazy deletion), so a run costs O(E log V)
+
+ShortestPathTree and NextHopTable hold the routing state of the components;
+they work over the array-backed topology of compactGraph.py; a NextHopTable
+built in *bulk* takes its table from a single all-pairs run of allPairs.py
+when NumPy is available, the out-ports looked up in the CSR arrays at once,
+instead of running Dijkstra's algorithm once per destination, and grows a
+tree only for a destination a link change may alter
+"""
+
+import array
+import heapq
+
+import allPairs
+import compactGraph
+
+INFINITY = float("inf") # the original engine used 10000, too small for big topos
+
+
+def linear_scan_dijkstra(adjTable, start, end):
+  "the original O(V^2) engine; returns the distance and predecessor dicts"
+
+  # preparations
+  closed = { x: False for x in adjTable.keys() }
+  d = { x: INFINITY for x in adjTable.keys() }
+  pred = { x: None for x in adjTable.keys() } # predecessor of each node
+  d[start] = 0
+  cOpenNodes = len(closed)
+  # running: the distance to each other node is to be calculated
+  while cOpenNodes > 0:
+    # take out the node with the smallest *d*
+    distance = INFINITY
+    node = -1
+    for switch, dist in d.iteritems():
+      if not closed[switch] and dist < distance:
+        distance = dist
+        node = switch
+    if node == -1: # the remaining nodes are unreachable
+      break
+    closed[node] = True
+    cOpenNodes -= 1
+    if node == end:
+      break
+    for neighbor, info in adjTable[node].iteritems():
+      if closed[neighbor]:
+        continue
+      if distance + info[1] < d[neighbor]:
+        d[neighbor] = distance + info[1]
+        pred[neighbor] = node
+
+  return d, pred
+
+
+def dijkstra(adjTable, start, end = None):
+  "binary heap engine with lazy deletion; stops early once *end* is settled "
+  "returns the distance and predecessor dicts of the settled nodes"
+
+  d = { start: 0 }
+  pred = { start: None }
+  closed = set()
+  heap = [(0, start)]
+  heappush, heappop = heapq.heappush, heapq.heappop
+  while heap:
+    distance, node = heappop(heap)
+    if node in closed: # a stale entry
+      continue
+    closed.add(node)
+    if node == end:
+      break
+    for neighbor, info in adjTable[node].iteritems():
+      if neighbor in closed:
+        continue
+      newDistance = distance + info[1]
+      if newDistance < d.get(neighbor, newDistance + 1):
+        d[neighbor] = newDistance
+        pred[neighbor] = node
+        heappush(heap, (newDistance, neighbor))
+
+  return d, pred
+
+
+def first_hop(pred, start, end):
+  "walk the predecessor chain back from *end*; None if *end* is unreachable"
+  if pred.get(end) is None:
+    return None
+  succ = end
+  while pred[succ] != start:
+    succ = pred[succ]
+  return succ
+
+
+def out_port(adjTable, start, end, engine = dijkstra):
+  "the port through which *start* should send a packet heading for *end*"
+  d, pred = engine(adjTable, start, end)
+  succ = first_hop(pred, start, end)
+  if succ is None:
+    return None
+  return adjTable[start][succ][0]
+
+
+class ShortestPathTree(object):
+  "the shortest path tree of every node towards *root*, repaired in place "
+  "when a single link changes instead of being grown again from scratch; "
+  "*pred* maps a node to its next hop towards the root, *d* to its distance, "
+  "and nodes that cannot reach the root appear in neither; the topology is "
+  "a *compactGraph.CompactGraph*; *paths*, the (dist, pred) lists over the "
+  "node indices, spares running Dijkstra's algorithm if already known"
+
+  def __init__(self, graph, root, paths = None):
+    self.graph = graph
+    self.root = root
+    dist, pred = paths if paths is not None \
+      else graph.dijkstra(graph.index[root])
+    dpids = graph.dpids
+    self.d = {}
+    self.pred = {}
+    for i, distance in enumerate(dist):
+      if distance < INFINITY:
+        self.d[dpids[i]] = distance
+        self.pred[dpids[i]] = dpids[pred[i]] if pred[i] != -1 else None
+    self.children = {}
+    for node, parent in self.pred.iteritems():
+      if parent is not None:
+        self.children.setdefault(parent, set()).add(node)
+
+  def next_hop(self, node):
+    "the out-port of *node* towards the root; None for the root itself and "
+    "for nodes that cannot reach it"
+    parent = self.pred.get(node)
+    if parent is None:
+      return None
+    return self.graph.link(node, parent)[0]
+
+  def next_hops(self):
+    "{ (dpid, root): outport } for every node that can reach the root"
+    return { (node, self.root): self.graph.link(node, parent)[0] \
+      for node, parent in self.pred.iteritems() if parent is not None }
+
+  def path(self, node):
+    "(dpid, outport) of every node on the way from *node* to the root, the "
+    "root excluded; None if *node* cannot reach the root"
+    hops = []
+    while node != self.root:
+      parent = self.pred.get(node)
+      if parent is None:
+        return None
+      hops.append((node, self.graph.link(node, parent)[0]))
+      node = parent
+    return hops
+
+  def link_changed(self, a, b, oldCost, newCost):
+    "repairs the tree after the link a-b changed from *oldCost* to *newCost* "
+    "(None standing for an absent link); the graph must already hold the "
+    "new state; returns the nodes whose distance or next hop may have changed"
+    changed = set()
+    if oldCost is not None and (newCost is None or newCost > oldCost):
+      self._link_degraded(a, b, changed)
+    if newCost is not None and (oldCost is None or newCost < oldCost):
+      self._link_improved(a, b, newCost, changed)
+    return changed
+
+  def _attach(self, node, parent):
+    old = self.pred.get(node)
+    if old is not None:
+      self.children[old].discard(node)
+    self.pred[node] = parent
+    self.children.setdefault(parent, set()).add(node)
+
+  def _detach(self, node):
+    old = self.pred.pop(node)
+    if old is not None:
+      self.children[old].discard(node)
+    del self.d[node]
+
+  def _propagate(self, heap, changed, region = None):
+    "Dijkstra's algorithm run from the nodes seeded in *heap*; only nodes in "
+    "*region* (any node if None) may get a shorter distance"
+    d = self.d
+    while heap:
+      distance, node = heapq.heappop(heap)
+      if distance > d[node]: # a stale entry
+        continue
+      for neighbor, port, cost in self.graph.neighbors_of(node):
+        if region is not None and neighbor not in region:
+          continue
+        newDistance = distance + cost
+        if newDistance < d.get(neighbor, INFINITY):
+          d[neighbor] = newDistance
+          self._attach(neighbor, node)
+          changed.add(neighbor)
+          heapq.heappush(heap, (newDistance, neighbor))
+
+  def _link_improved(self, a, b, cost, changed):
+    "a link got cheaper or appeared: only nodes that can now reach the root "
+    "through it improve, and they are found by relaxing outwards from it"
+    heap = []
+    for u, v in ((a, b), (b, a)):
+      if v in self.d and self.d[v] + cost < self.d.get(u, INFINITY):
+        self.d[u] = self.d[v] + cost
+        self._attach(u, v)
+        changed.add(u)
+        heap.append((self.d[u], u))
+    heapq.heapify(heap)
+    self._propagate(heap, changed)
+
+  def _link_degraded(self, a, b, changed):
+    "a link got dearer or disappeared: only the subtree hanging below it is "
+    "affected; its nodes are reattached from their best neighbor outside the "
+    "subtree and the distances are then settled inside the subtree"
+    if self.pred.get(a) == b:
+      top = a
+    elif self.pred.get(b) == a:
+      top = b
+    else: # not a tree link, no path uses it
+      return
+
+    region = set()
+    stack = [top]
+    while stack:
+      node = stack.pop()
+      region.add(node)
+      stack.extend(self.children.get(node, ()))
+
+    d = self.d
+    for node in region:
+      d[node] = INFINITY
+    heap = []
+    for node in region:
+      for neighbor, port, cost in self.graph.neighbors_of(node):
+        if neighbor not in region and neighbor in d \
+          and d[neighbor] + cost < d[node]:
+          d[node] = d[neighbor] + cost
+          self._attach(node, neighbor)
+      if d[node] < INFINITY:
+        heap.append((d[node], node))
+    heapq.heapify(heap)
+    self._propagate(heap, changed, region)
+
+    changed.update(region)
+    for node in region:
+      if d[node] == INFINITY: # cut off from the root
+        self._detach(node)
+
+
+class NextHopTable(object):
+  "the out-port of every node towards each destination, kept consistent "
+  "with the graph by repairing the shortest path trees link by link; "
+  "*ports* is the flat array of them, node i towards destination j at "
+  "i * number of destinations + j, 0 for none, laid out as the next-hop "
+  "section of a topologyStore.TopologyStore; the link methods return the "
+  "changed entries { (dpid, destination): outport }, an out-port of None "
+  "meaning the entry has been removed; with *bulk* the table comes from a "
+  "single all-pairs run, which pays off when most nodes are destinations, "
+  "and the trees are only grown for the destinations a link change may "
+  "alter, from the distance and next-node matrices of the run, which are "
+  "kept up to date"
+
+  def __init__(self, graph, destinations, bulk = False):
+    self.graph = graph
+    self.destinationList = list(destinations)
+    self.destIndex = { dpid: j for j, dpid in \
+      enumerate(self.destinationList) }
+    self.treeTo = {} # every tree, or with the matrices the ones grown
+    self.dist = self.nextHop = None
+    if bulk and allPairs.available() and len(graph):
+      self.dist, self.nextHop = allPairs.shortest_paths(graph)
+      self.ports = allPairs.out_ports(graph, self.nextHop, \
+        [ graph.index[dpid] for dpid in self.destinationList ]).ravel()
+    else:
+      for end in self.destinationList:
+        self.treeTo[end] = ShortestPathTree(graph, end)
+      self._lay_out()
+
+  def _lay_out(self):
+    "fills *ports* from the trees"
+    cDestinations, index = len(self.destinationList), self.graph.index
+    self.ports = array.array("H", [0]) * (len(self.graph) * cDestinations)
+    for j, end in enumerate(self.destinationList):
+      for (node, root), port in self.treeTo[end].next_hops().iteritems():
+        self.ports[index[node] * cDestinations + j] = port
+
+  def destinations(self):
+    return list(self.destinationList)
+
+  def next_hop(self, dpid, destination):
+    "the out-port of *dpid* towards *destination*; None if there is none"
+    return self.ports[self.graph.index[dpid] * len(self.destinationList) \
+      + self.destIndex[destination]] or None
+
+  def tree(self, destination):
+    "the shortest path tree towards *destination*, grown from the matrices "
+    "the first time it is asked for"
+    tree = self.treeTo.get(destination)
+    if tree is None:
+      k = self.graph.index[destination]
+      tree = self.treeTo[destination] = ShortestPathTree(self.graph, \
+        destination, (self.dist[:, k].tolist(), self.nextHop[:, k].tolist()))
+    return tree
+
+  def add_destination(self, destination):
+    "adds the tree towards a new destination; returns its entries"
+    self.destinationList.append(destination)
+    self.destIndex[destination] = len(self.destinationList) - 1
+    if self.dist is None:
+      self.treeTo[destination] = ShortestPathTree(self.graph, destination)
+    entries = self.tree(destination).next_hops()
+    if self.dist is None:
+      self._lay_out()
+    else:
+      self.ports = allPairs.out_ports(self.graph, self.nextHop, \
+        [ self.graph.index[dpid] for dpid in self.destinationList ]).ravel()
+    return entries
+
+  def path(self, start, end):
+    "(dpid, outport) of every node on the way from *start* to *end*, *end* "
+    "excluded; None if *end* cannot be reached"
+    return self.tree(end).path(start)
+
+  def set_link_cost(self, dpid1, dpid2, cost):
+    "changes the cost of an existing link"
+    link1, link2 = self.graph.link(dpid1, dpid2), self.graph.link(dpid2, dpid1)
+    if link1 is None:
+      raise ValueError("no link between %s and %s" % (dpid1, dpid2))
+    return self.set_link(dpid1, dpid2, link1[0], link2[0], cost)
+
+  def set_link(self, dpid1, dpid2, port1, port2, cost):
+    "adds a link, or replaces the ports and cost of an existing one; "
+    "ValueError for unknown switches, bad ports or a cost below 1, before "
+    "the graph or the trees are touched"
+    for dpid in (dpid1, dpid2):
+      if dpid not in self.graph:
+        raise ValueError("unknown switch %s" % (dpid,))
+    if dpid1 == dpid2:
+      raise ValueError("a link needs two switches")
+    compactGraph.check_port(port1)
+    compactGraph.check_port(port2)
+    compactGraph.check_cost(cost)
+    link = self.graph.link(dpid1, dpid2)
+    oldCost = link[1] if link is not None else None
+    self.graph.set_link(dpid1, dpid2, port1, port2, cost)
+    return self._repair(dpid1, dpid2, oldCost, cost)
+
+  def remove_link(self, dpid1, dpid2):
+    "removes an existing link; its end nodes stay in the topology"
+    link = self.graph.link(dpid1, dpid2)
+    if link is None:
+      raise ValueError("no link between %s and %s" % (dpid1, dpid2))
+    self.graph.remove_link(dpid1, dpid2)
+    return self._repair(dpid1, dpid2, link[1], None)
+
+  def _repair(self, a, b, oldCost, newCost):
+    changes = {}
+    index, cDestinations = self.graph.index, len(self.destinationList)
+    if self.dist is None:
+      ends = self.destinationList
+    else:
+      k = allPairs.affected(self.dist, self.nextHop, index[a], index[b], \
+        newCost)
+      ends = [ self.graph.dpids[i] for i in k if self.graph.dpids[i] \
+        in self.destIndex ]
+    for end in ends:
+      tree = self.tree(end)
+      j = self.destIndex[end]
+      # the ports of a and b may have changed even if no distance did
+      nodes = tree.link_changed(a, b, oldCost, newCost) | set((a, b))
+      for node in nodes:
+        port = tree.next_hop(node)
+        i = index[node] * cDestinations + j
+        if self.ports[i] != (port or 0):
+          changes[(node, end)] = port
+          self.ports[i] = port or 0
+      if self.dist is not None:
+        self._update_matrices(tree, nodes)
+    return changes
+
+  def _update_matrices(self, tree, nodes):
+    "writes the distances and next nodes of *nodes* in *tree* back into the "
+    "matrices of the all-pairs run"
+    index, k = self.graph.index, self.graph.index[tree.root]
+    for node in nodes:
+      parent = tree.pred.get(node)
+      self.dist[index[node], k] = tree.d.get(node, INFINITY)
+      self.nextHop[index[node], k] = index[parent] \
+        if parent is not None else -1
@@ -0,0 +1,226 @@
+"""
+micro-benchmark of the shortest path engines in shortestPath.py and of the
+array-backed graph in compactGraph.py
+
+the original linear-scan engine, the binary heap engine over the adjacency
+table and the one over *CompactGraph* are run on layered topologies shaped
+like *ComplexTopo* (two hosts, two edge switches and layers of switches meshed
+with their neighbors) of roughly 25, 500 and 5,000 nodes;
+each run answers the question a PacketIn asks: the out-port of a random switch
+towards one of the two hosts; the memory the two topology representations
+take per link is listed as well (the int objects of the adjacency table are
+not counted, which flatters it)
+
+the whole next-hop table, every node towards every other, is also built on
+the topologies of up to *MAX_ALL_PAIRS* nodes: with a tree grown by
+Dijkstra's algorithm per destination, and with the vectorised all-pairs run
+of allPairs.py ("-" if NumPy is missing), and laid out in a store as a
+component publishes it; the vectorised table is checked against the trees
+first, as built and after each of a series of random link changes, removals
+among them: the same distances and reachable switches, every next hop on a
+shortest path, and the changed entries the repairs return complete
+
+topologies of topoGenerators.py (or topology files) can be given instead, the
+queries then heading for the switches their hosts are attached to
+
+usage: python shortestPathBenchmark.py [seed] [topology ...]
+  e.g. python shortestPathBenchmark.py 1 fatTree,16 random,5000,4,1,50
+"""
+
+import random
+import sys
+import time
+
+import allPairs
+import compactGraph
+import shortestPath
+import topoGenerators
+import topologyStore
+
+MAX_ALL_PAIRS = 600 # nodes; the table has n^2 entries
+
+
+def layered_links(layers, width, rng):
+  "links (dpid1, dpid2, port1, port2, cost) of a layered topology: "
+  "host 100 - switch 1 - *layers* x *width* switches - switch 2 - host 200"
+
+  nextPort = {}
+  def port(dpid):
+    nextPort[dpid] = nextPort.get(dpid, 0) + 1
+    return nextPort[dpid]
+
+  links = []
+  def link(a, b):
+    links.append((a, b, port(a), port(b), rng.randint(1, 100)))
+
+  node = lambda layer, i: 1000 + layer * width + i
+  link(100, 1)
+  for i in range(width):
+    link(1, node(0, i))
+  for layer in range(layers):
+    for i in range(width - 1):
+      link(node(layer, i), node(layer, i + 1))
+    if layer + 1 < layers:
+      for i in range(width):
+        for j in range(max(0, i - 1), min(width, i + 2)):
+          link(node(layer, i), node(layer + 1, j))
+  for i in range(width):
+    link(node(layers - 1, i), 2)
+  link(2, 200)
+  return links
+
+
+def adj_table(links):
+  "the adjacency table the components build from their links"
+  adjTable = {}
+  for tp in links:
+    adjTable.setdefault(tp[0], {})[tp[1]] = (tp[2], tp[4],)
+    adjTable.setdefault(tp[1], {})[tp[0]] = (tp[3], tp[4],)
+  return adjTable
+
+
+def time_engine(engine, adjTable, queries):
+  "average seconds per query"
+  begin = time.time()
+  for start, end in queries:
+    shortestPath.out_port(adjTable, start, end, engine)
+  return (time.time() - begin) / len(queries)
+
+
+def time_compact(graph, queries):
+  "average seconds per query"
+  begin = time.time()
+  for start, end in queries:
+    graph.out_port(start, end)
+  return (time.time() - begin) / len(queries)
+
+
+def time_table(graph, bulk):
+  "seconds to build the next-hop table of all pairs and lay it out in a "
+  "store, as a component publishes it"
+  begin = time.time()
+  table = shortestPath.NextHopTable(graph, graph.dpids, bulk)
+  topologyStore.TopologyStore(graph, graph.dpids, table.ports).close()
+  return time.time() - begin
+
+
+def check_all_pairs(links, rng, cChanges = 30):
+  "asserts that the table of the all-pairs run agrees with the trees grown "
+  "by Dijkstra's algorithm, as built and after each of *cChanges* random "
+  "link changes: no out-port where there is no path, every other one on a "
+  "shortest path, the changes returned leading from the old ports to the "
+  "new, and the distances of the matrices and of the trees grown from them "
+  "right; the out-ports themselves may differ between paths of equal length"
+  graph = compactGraph.CompactGraph(links)
+  table = shortestPath.NextHopTable(graph, graph.dpids)
+  bulk = shortestPath.NextHopTable(compactGraph.CompactGraph(links), \
+    graph.dpids, True)
+  check_table(table, bulk)
+  for i in range(cChanges):
+    dpid1, dpid2, port1, port2, cost = rng.choice(links)
+    if table.graph.link(dpid1, dpid2) is None:
+      change = lambda t: t.set_link(dpid1, dpid2, port1, port2, cost)
+    elif rng.random() < 0.3:
+      change = lambda t: t.remove_link(dpid1, dpid2)
+    else:
+      newCost = rng.randint(1, 100)
+      change = lambda t: t.set_link_cost(dpid1, dpid2, newCost)
+    change(table)
+    ports = list(bulk.ports)
+    cDestinations = len(bulk.destinationList)
+    for (dpid, end), port in change(bulk).iteritems():
+      ports[bulk.graph.index[dpid] * cDestinations + bulk.destIndex[end]] \
+        = port or 0
+    assert ports == list(bulk.ports), (dpid1, dpid2, "changes")
+    check_table(table, bulk)
+
+
+def check_table(table, bulk):
+  "asserts that *bulk* agrees with the trees of *table*"
+  graph, dpids = bulk.graph, bulk.graph.dpids
+  for end in bulk.destinationList:
+    d = table.treeTo[end].d
+    assert bulk.dist[:, graph.index[end]].tolist() \
+      == [ d.get(dpid, shortestPath.INFINITY) for dpid in dpids ], \
+      (end, "distances")
+    if end in bulk.treeTo:
+      assert bulk.treeTo[end].d == d, (end, "grown tree")
+    for node in dpids:
+      port = bulk.next_hop(node, end)
+      if node == end or node not in d:
+        assert port is None, (node, end, "port without a path")
+        continue
+      neighbor, cost = [ (neighbor, cost) for neighbor, p, cost \
+        in graph.neighbors_of(node) if p == port ][0]
+      assert cost + d[neighbor] == d[node], \
+        (node, end, "not on a shortest path")
+
+
+def adj_table_size(adjTable):
+  "bytes taken by the dicts and tuples of an adjacency table"
+  size = sys.getsizeof(adjTable)
+  for neighbors in adjTable.itervalues():
+    size += sys.getsizeof(neighbors)
+    size += sum(sys.getsizeof(info) for info in neighbors.itervalues())
+  return size
+
+
+def graph_size(graph):
+  "bytes taken by the arrays and the index of a *CompactGraph*"
+  size = sys.getsizeof(graph.dpids) + sys.getsizeof(graph.index)
+  for values in (graph.offsets, graph.neighbors, graph.ports, graph.costs):
+    size += values.itemsize * len(values)
+  return size
+
+
+def run(links, targets, rng):
+  "times the engines on the queries from random switches to *targets*"
+  adjTable = adj_table(links)
+  graph = compactGraph.CompactGraph(links)
+  switches = [ x for x in adjTable if x not in targets ] or list(adjTable)
+  # the O(V^2) engine gets fewer queries on the large topologies
+  cQueries = max(3, 20000 // len(adjTable))
+  queries = [ (rng.choice(switches), rng.choice(targets)) \
+    for i in range(cQueries) ]
+
+  # both engines must agree on the length of every path
+  for start, end in queries:
+    dOld = shortestPath.linear_scan_dijkstra(adjTable, start, end)[0]
+    dNew = shortestPath.dijkstra(adjTable, start, end)[0]
+    assert dOld[end] == dNew[end], (start, end, dOld[end], dNew[end])
+
+  old = time_engine(shortestPath.linear_scan_dijkstra, adjTable, queries)
+  new = time_engine(shortestPath.dijkstra, adjTable, queries)
+  compact = time_compact(graph, queries)
+  trees = vectorised = "-"
+  if len(graph) <= MAX_ALL_PAIRS:
+    trees = "%.1f" % (time_table(graph, False) * 1000,)
+    if allPairs.available():
+      check_all_pairs(links, random.Random(len(links)))
+      vectorised = "%.1f" % (time_table(graph, True) * 1000,)
+  print "%7i %7i %7i %12.3f %12.3f %12.3f %9.1f %9.1f %11s %11s" \
+    % (len(adjTable), len(links), cQueries, old * 1000, new * 1000, \
+    compact * 1000, adj_table_size(adjTable) / float(len(links)), \
+    graph_size(graph) / float(len(links)), trees, vectorised)
+
+
+def main(seed = 1, specs = ()):
+  rng = random.Random(seed)
+  print "%7s %7s %7s %12s %12s %12s %9s %9s %11s %11s" % ("nodes", "links", \
+    "queries", "linear (ms)", "heap (ms)", "compact (ms)", "B/link", "B/link", \
+    "table (ms)", "table (ms)")
+  print "%7s %7s %7s %12s %12s %12s %9s %9s %11s %11s" \
+    % ("", "", "", "", "", "", "(table)", "(arrays)", "(trees)", "(numpy)")
+  if specs:
+    for spec in specs:
+      topology = topoGenerators.topology(spec)
+      run(topology.weighted_links(lambda: rng.randint(1, 100)), \
+        sorted(set(host["dpid"] for host in topology.hosts)) \
+        or topology.switches, rng)
+    return
+  for layers, width in ((7, 3), (62, 8), (166, 30)):
+    run(layered_links(layers, width, rng), (100, 200), rng)
+
+
+if __name__ == "__main__":
+  main(int(sys.argv[1]) if len(sys.argv) > 1 else 1, sys.argv[2:])
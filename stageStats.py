@@ -0,0 +1,374 @@
+"""
+per-stage latency histograms and counters of the evaluation components
+
+a PacketIn is stamped when its handler starts, and the stamp travels with its
+descriptor to the worker process (or thread, threadPool.py); the stages timed
+are
+
+  handle    the PacketIn handler of the main process, from its start until
+            the descriptor is handed to the dispatcher (or, in
+            monoprocessing mode, until the answer has been sent)
+  queue     from the start of the handler until a worker receives the
+            descriptor: batching, the pipe and the wait behind earlier ones
+  compute   the work of the worker per packet (the time it spends on a
+            batch divided among its packets)
+  return    from a worker sending its results until the collecting thread
+            of the main process receives them
+  send      the collecting thread turning the results into messages and
+            handing them to sendToDPID
+  total     from the start of the handler until the answer is handed to
+            sendToDPID; the results a worker sends at once are all timed
+            from the oldest stamp among them
+
+the histograms are log-linear, like HDR histograms: a latency in microseconds
+falls into one of 32 buckets per power of two, so it is kept to about 3 %,
+from 1 us to more than a minute, and recording one is a few integer
+operations and increments, about 1.5 us; the main process records a single
+latency per PacketIn, the worker stages are recorded by every worker
+into a block of memory shared with the main process, which only reads it, so
+no message is added to the pipes and nothing is locked
+
+the counters are the descriptors dispatched to every worker, the packets
+every worker has handled and, their difference, its queue depth, and the
+PacketIns answered in the main process; with bounded queues (backpressure.py)
+also the PacketIns shed by every policy, and the PacketIns lost in workers
+that died (workerPool.py); with versioned routing snapshots
+(routingSnapshots.py) the version in use, the time from a change of the
+routing being submitted until its snapshot is in use, the PacketIns
+answered from a snapshot older than the one in use by then, and those a
+worker sent back to be answered in the main process
+
+a worker drops the oldest descriptors it has been sent when the main process
+raises their bound in the shared block: the descriptors a worker is sent are
+numbered in order, and those numbered below *dropBelow* are counted as
+completed and dropped without being handled
+"""
+
+import ctypes
+import json
+import mmap
+import threading
+import time
+
+SUB_BUCKETS = 32 # per power of two
+OCTAVES = 28 # 2^27 us, more than two minutes
+BUCKETS = (OCTAVES + 1) * SUB_BUCKETS
+_SIZE = BUCKETS + 3 # the buckets, the count, the sum and the maximum (in us)
+_COUNT, _SUM, _MAX = BUCKETS, BUCKETS + 1, BUCKETS + 2
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def bucket(us):
+  "the index of the bucket of a latency of *us* microseconds"
+  shift = us.bit_length() - 6 # 64 = 2 * SUB_BUCKETS
+  if shift <= 0:
+    return us
+  return min(BUCKETS - 1, shift * SUB_BUCKETS + (us >> shift))
+
+
+def bucket_bound(i):
+  "the lowest latency in microseconds falling into bucket *i*"
+  if i < 2 * SUB_BUCKETS:
+    return i
+  shift = i // SUB_BUCKETS - 1
+  return (i - shift * SUB_BUCKETS) << shift
+
+
+class Histogram(object):
+  "the latencies of a stage, counted in *buf* at *offset* (a fresh buffer "
+  "if None); a histogram is to be recorded into by a single thread"
+
+  SIZE = _SIZE * 8 # bytes
+
+  def __init__(self, buf = None, offset = 0):
+    if buf is None:
+      buf = bytearray(self.SIZE)
+    self.counts = (ctypes.c_uint64 * _SIZE).from_buffer(buf, offset)
+
+  def record(self, seconds, count = 1):
+    "notes *count* latencies of *seconds*; bucket() inlined"
+    us = int(seconds * 1000000)
+    shift = us.bit_length() - 6
+    if shift > 0:
+      i = shift * SUB_BUCKETS + (us >> shift)
+      if i >= BUCKETS:
+        i = BUCKETS - 1
+    elif us >= 0:
+      i = us
+    else: # the clock has been set back
+      i = us = 0
+    counts = self.counts
+    counts[i] += count
+    counts[_COUNT] += count
+    counts[_SUM] += us * count
+    if us > counts[_MAX]:
+      counts[_MAX] = us
+
+  def reset(self):
+    ctypes.memset(ctypes.addressof(self.counts), 0, self.SIZE)
+
+  def merged(self, others):
+    "a new histogram holding this one and *others*"
+    merged = Histogram()
+    for histogram in (self,) + tuple(others):
+      counts = histogram.counts[:]
+      for i in xrange(_SIZE - 1):
+        merged.counts[i] += counts[i]
+      merged.counts[_MAX] = max(merged.counts[_MAX], counts[_MAX])
+    return merged
+
+  def percentile(self, p):
+    "the latency in seconds *p* % of the recorded ones do not exceed"
+    counts = self.counts[:]
+    if not counts[_COUNT]:
+      return None
+    rank = max(1, int(counts[_COUNT] * p / 100.0 + 0.5))
+    seen = 0
+    for i in xrange(BUCKETS):
+      seen += counts[i]
+      if seen >= rank:
+        return min(bucket_bound(i + 1) - 1, counts[_MAX]) / 1000000.0
+    return counts[_MAX] / 1000000.0
+
+  def summary(self):
+    "the count, and the mean, percentiles and maximum in milliseconds"
+    count = self.counts[_COUNT]
+    summary = { "count": count, \
+      "mean": self.counts[_SUM] / 1000.0 / count if count else None, \
+      "max": self.counts[_MAX] / 1000.0 if count else None }
+    for p in PERCENTILES:
+      value = self.percentile(p)
+      summary["p%s" % (p,)] = value * 1000 if value is not None else None
+    return summary
+
+  def buckets(self):
+    "{ lowest latency in us: count } of the buckets that are not empty"
+    counts = self.counts[:]
+    return dict((bucket_bound(i), counts[i]) for i in xrange(BUCKETS) \
+      if counts[i])
+
+
+class WorkerStats(object):
+  "the stages a worker process records, in memory shared with the main "
+  "process; made before the worker is forked"
+
+  def __init__(self):
+    self.buf = mmap.mmap(-1, 2 * Histogram.SIZE + 24)
+    self.queue = Histogram(self.buf, 0)
+    self.compute = Histogram(self.buf, Histogram.SIZE)
+    # the descriptors completed, those to be dropped, those dropped
+    self.completed = (ctypes.c_uint64 * 1).from_buffer(self.buf, \
+      2 * Histogram.SIZE)
+    self.dropBelow = (ctypes.c_uint64 * 1).from_buffer(self.buf, \
+      2 * Histogram.SIZE + 8)
+    self.dropped = (ctypes.c_uint64 * 1).from_buffer(self.buf, \
+      2 * Histogram.SIZE + 16)
+
+  def dropping(self, count):
+    "how many of the *count* descriptors of the message just received, the "
+    "oldest first, the main process has given up on"
+    return max(0, min(count, self.dropBelow[0] - self.completed[0]))
+
+  def received(self, descriptors, received, done, dropped = 0):
+    "notes a message of descriptors, the last field of each being the time "
+    "its PacketIn was handled, received at *received* and handled by *done*; "
+    "the first *dropped* of them were not handled"
+    count = len(descriptors)
+    for i in xrange(dropped, count):
+      self.queue.record(received - descriptors[i][-1])
+    if count > dropped:
+      self.compute.record((done - received) / (count - dropped), \
+        count - dropped)
+    self.completed[0] += count
+    if dropped:
+      self.dropped[0] += dropped
+
+  def reset(self):
+    self.queue.reset()
+    self.compute.reset()
+
+
+class StageStats(object):
+  "the histograms and counters of a component; the main thread records the "
+  "handler, the collecting thread the results of the workers"
+
+  def __init__(self):
+    self.handle = Histogram() # of the PacketIns dispatched to workers
+    self.local = Histogram() # of the PacketIns answered in the main process
+    self.returned = Histogram()
+    self.send = Histogram()
+    self.total = Histogram()
+    self.workers = [] # *WorkerStats* of every spawned worker
+    self.dispatchedTo = [] # descriptors dispatched to every worker
+    self.threads = [] # *WorkerStats* of the threads of the thread pool
+    self.toThreads = 0 # descriptors submitted to the thread pool
+    self.collecting = threading.Lock() # the results of workers and threads
+    # may be collected at once while the mode changes
+    self.retired = [] # *WorkerStats* of the workers that have been replaced
+    self.lost = 0 # PacketIns in flight to workers that died
+    self.answered = 0 # PacketIns answered in the main process
+    self.shedBy = {} # policy -> PacketIns shed by it in the main process
+    self.update = Histogram() # from a routing change until its snapshot is
+    # in use
+    self.version = 0 # of the routing snapshot in use
+    self.stale = 0 # PacketIns answered from an older snapshot
+    self.maxLag = 0 # versions the stalest of them was behind
+    self.bounced = 0 # PacketIns sent back by workers
+    self.began = time.time()
+
+  def add_worker(self):
+    "the *WorkerStats* of a new worker"
+    stats = WorkerStats()
+    self.workers.append(stats)
+    self.dispatchedTo.append(0)
+    return stats
+
+  def add_thread(self):
+    "the *WorkerStats* of a new thread of the thread pool"
+    stats = WorkerStats()
+    self.threads.append(stats)
+    return stats
+
+  def replace_worker(self, i):
+    "the *WorkerStats* of a new worker in the place of worker *i*"
+    self.retired.append(self.workers[i])
+    stats = self.workers[i] = WorkerStats()
+    self.dispatchedTo[i] = 0
+    return stats
+
+  def worker_lost(self, i):
+    "notes that worker *i* has died with what it had in flight"
+    self.lost += self.in_flight(i)
+
+  def dispatched(self, i, began):
+    "notes a PacketIn whose handler began at *began* handed to worker *i*, "
+    "or to the thread pool if None"
+    self.handle.record(time.time() - began)
+    if i is None:
+      self.toThreads += 1
+    else:
+      self.dispatchedTo[i] += 1
+
+  def handled(self, began):
+    "notes a PacketIn whose handler began at *began* answered in the main "
+    "process"
+    self.local.record(time.time() - began)
+    self.answered += 1
+
+  def in_flight(self, i):
+    "the descriptors dispatched to worker *i* it has not completed"
+    return self.dispatchedTo[i] - self.workers[i].completed[0]
+
+  def drop_oldest(self, i, limit):
+    "has worker *i* drop the oldest descriptors it has been sent, so that "
+    "*limit* are left with the next one"
+    self.workers[i].dropBelow[0] = self.dispatchedTo[i] - limit + 1
+
+  def shed(self, policy):
+    "notes a PacketIn shed by *policy* in the main process"
+    self.shedBy[policy] = self.shedBy.get(policy, 0) + 1
+
+  def swapped(self, version, submitted):
+    "notes that routing snapshot *version*, whose change was submitted at "
+    "*submitted*, is in use from now on"
+    self.update.record(time.time() - submitted)
+    self.version = version
+
+  def collected(self, dispatched, count, sent, received, version = None, \
+    bounced = 0):
+    "notes the results of *count* PacketIns, the first handled at "
+    "*dispatched*, sent by a worker at *sent* and received at *received*, "
+    "which have just been handed to sendToDPID; *version* is the routing "
+    "snapshot they were computed from, if any, but for the *bounced* ones "
+    "the worker sent back and the main process answered"
+    now = time.time()
+    with self.collecting:
+      self.returned.record(received - sent)
+      self.send.record(now - received)
+      self.total.record(now - dispatched, count)
+      self.bounced += bounced
+      if version is not None and version < self.version \
+        and count > bounced:
+        self.stale += count - bounced
+        self.maxLag = max(self.maxLag, self.version - version)
+
+  def stages(self):
+    "{ stage: histogram }, the workers' stages merged"
+    return { "handle": self.handle.merged([ self.local ]), \
+      "queue": Histogram().merged([ w.queue \
+        for w in self.workers + self.retired + self.threads ]), \
+      "compute": Histogram().merged([ w.compute \
+        for w in self.workers + self.retired + self.threads ]), \
+      "return": self.returned, "send": self.send, \
+      "total": self.total.merged([ self.local ]) }
+
+  def report(self):
+    "the summaries of the stages and the counters"
+    completed = [ int(w.completed[0]) for w in self.workers ]
+    shed = dict(self.shedBy)
+    dropped = sum(int(w.dropped[0]) for w in self.workers + self.retired)
+    if dropped:
+      shed["droppedByWorkers"] = dropped
+    return { "seconds": time.time() - self.began, \
+      "stages": dict((name, histogram.summary()) \
+        for name, histogram in self.stages().iteritems()), \
+      "dispatched": list(self.dispatchedTo), "completed": completed, \
+      "queueDepth": [ d - c for d, c in zip(self.dispatchedTo, completed) ], \
+      "answeredInMain": self.answered, "shed": shed, \
+      "lostInDeadWorkers": self.lost, "toThreads": self.toThreads, \
+      "completedByThreads": sum(int(w.completed[0]) for w in self.threads), \
+      "snapshots": { "version": self.version, \
+        "update": self.update.summary(), "staleAnswers": self.stale, \
+        "maxLag": self.maxLag, "bouncedToMain": self.bounced } }
+
+  def table(self):
+    "the report as lines of text"
+    report = self.report()
+    lines = [ "%8s %10s %9s %9s %9s %9s %9s %9s" % ("stage", "count", \
+      "mean (ms)", "p50", "p90", "p99", "p99.9", "max") ]
+    for name in ("handle", "queue", "compute", "return", "send", "total"):
+      summary = report["stages"][name]
+      lines.append("%8s %10i" % (name, summary["count"]) + "".join( \
+        " %9.3f" % summary[key] if summary[key] is not None else " %9s" % "-" \
+        for key in ("mean", "p50", "p90", "p99", "p99.9", "max")))
+    lines.append("dispatched %s, completed %s, queue depth %s, answered in " \
+      "the main process %i" % (report["dispatched"], report["completed"], \
+      report["queueDepth"], report["answeredInMain"]))
+    if report["toThreads"]:
+      lines.append("thread pool: submitted %i, completed %i" \
+        % (report["toThreads"], report["completedByThreads"]))
+    if report["lostInDeadWorkers"]:
+      lines.append("lost in workers that died %i" \
+        % (report["lostInDeadWorkers"],))
+    if report["shed"]:
+      lines.append("shed " + ", ".join("%s %i" % item \
+        for item in sorted(report["shed"].iteritems())))
+    snapshots = report["snapshots"]
+    if snapshots["update"]["count"]:
+      lines.append("routing snapshot %i, updates in use after %.3f ms (p50), " \
+        "%.3f ms (max); answered from older snapshots %i, at most %i behind; " \
+        "sent back by workers %i" % (snapshots["version"], \
+        snapshots["update"]["p50"], snapshots["update"]["max"], \
+        snapshots["staleAnswers"], snapshots["maxLag"], \
+        snapshots["bouncedToMain"]))
+    return lines
+
+  def dump(self, path):
+    "appends the report and the buckets of every stage to the file at *path* "
+    "as a JSON object"
+    report = self.report()
+    report["time"] = time.time()
+    report["buckets"] = dict((name, histogram.buckets()) \
+      for name, histogram in self.stages().iteritems())
+    with open(path, "a") as f:
+      f.write(json.dumps(report) + "\n")
+
+  def reset(self):
+    "starts counting the latencies anew; the counters keep counting, as "
+    "the queue depths rely on them"
+    for histogram in (self.handle, self.local, self.returned, self.send, \
+      self.total, self.update):
+      histogram.reset()
+    for stats in self.workers + self.retired + self.threads:
+      stats.reset()
+    self.began = time.time()
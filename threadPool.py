@@ -0,0 +1,100 @@
+"""
+a pool of threads handling PacketIns in the main process, mode 3 of the
+evaluation components
+
+the threads do the work of a worker process (handle_packet, handle_frame) on
+the descriptors the component submits, without pickling them through a pipe,
+but taking turns on the GIL with the main thread and each other; comparing
+the mode with multiprocessing tells which of the two costs dominates, and
+work that releases the GIL (in C, e.g. NumPy) runs in parallel here as well
+
+the descriptors are taken from a Queue.Queue, whose blocking get does not
+poll; the results of a thread are handed to the sending thread through a
+deque, appending and popping being atomic, and the sending thread is woken
+through an Event only when it has run out of results
+"""
+
+import collections
+import threading
+import time
+import Queue
+
+import packetOut
+
+
+class ThreadPool(object):
+  "*cThreads* threads calling handle(descriptor, records, msgs) for the "
+  "descriptors submitted; the packet_out records and the (msg, dpid) pairs "
+  "they append are sent with *send*(dpid, message) by the sending thread; the "
+  "stages are noted in *stats*, a *StageStats*, with the routing snapshot "
+  "version *handle* returns, if any"
+
+  def __init__(self, handle, send, stats, cThreads):
+    self.handle = handle
+    self.send = send
+    self.stats = stats
+    self.tasks = Queue.Queue()
+    self.threads = []
+    self.results = collections.deque()
+    self.ready = threading.Event() # set while results are waiting
+
+    self.sendingThread = threading.Thread(target = self._sending_task)
+    self.sendingThread.daemon = True
+    self.sendingThread.start()
+    self.resize(cThreads)
+
+  def __len__(self):
+    return len(self.threads)
+
+  def submit(self, descriptor):
+    "has *descriptor* handled by one of the threads; the last field of a "
+    "descriptor is the time its PacketIn was handled"
+    self.tasks.put(descriptor)
+
+  def resize(self, cThreads):
+    "starts or stops threads until there are *cThreads*; a thread stops "
+    "once it has taken the descriptors submitted before"
+    while len(self.threads) < cThreads:
+      thread = threading.Thread(target = self._working_task, \
+        args = (self.stats.add_thread(),))
+      thread.daemon = True
+      thread.start()
+      self.threads.append(thread)
+    while len(self.threads) > cThreads:
+      self.threads.pop()
+      self.tasks.put(None)
+
+  def _working_task(self, stats):
+    "handles descriptors until a None is taken"
+    handle, results, ready = self.handle, self.results, self.ready
+    while 1:
+      descriptor = self.tasks.get()
+      if descriptor is None:
+        return
+      received = time.time()
+      records, msgs = [], []
+      version = handle(descriptor, records, msgs)
+      stats.received((descriptor,), received, time.time())
+      if records or msgs:
+        results.append(("".join(records), msgs, descriptor[-1], 1, \
+          time.time(), version))
+        if not ready.is_set():
+          ready.set()
+
+  def _sending_task(self):
+    "sends the messages of the results out"
+    template = packetOut.PacketOutTemplate()
+    results, ready, send = self.results, self.ready, self.send
+    while 1:
+      try:
+        records, msgs, dispatched, count, sent, version = results.popleft()
+      except IndexError: # none left; a result appended before the event was
+        ready.clear() # cleared sets it again
+        if not results:
+          ready.wait()
+        continue
+      received = time.time()
+      template.send_records(records, send)
+      for msg, dpid in msgs:
+        send(dpid, msg)
+      self.stats.collected(dispatched, count, sent, received, version)
@@ -0,0 +1,169 @@
+"""
+parameterised topologies for load testing the controller components, built as
+*topologyFile.Topology* objects, so the same graph can be built by Mininet
+(complexTopo.py) and routed over by complexEvaluation_*.py (topo=...)
+
+  layered,layers,width       the shape of ComplexTopo: switch 1, *layers*
+                             layers of *width* switches, each linked with its
+                             neighbors and meshed with the layer below, and
+                             switch 2; a host at switch 1 and one at switch 2;
+                             layered,7,3 has the switches and links of
+                             ComplexTopo (with other port numbers)
+  fatTree,k                  a k-ary fat-tree: k pods of k/2 edge and k/2
+                             aggregation switches, (k/2)^2 core switches, and
+                             k/2 hosts at every edge switch
+  random,switches,degree,seed,hosts
+                             a connected random graph of the given average
+                             degree, with *hosts* hosts at random switches
+
+ports are numbered from 1 in the order the links of a switch are made; the
+hosts get the addresses 10.0.0.1/8, 10.0.0.2/8, ... and the MACs
+00:00:00:00:00:01, ...; a random graph only depends on its seed, and every
+generator runs in time linear in the number of links
+
+usage: python topoGenerators.py generator [arguments] > topo.json
+"""
+
+import random
+import sys
+
+import topologyFile
+
+
+class _Builder(object):
+  "numbers the ports of every switch and collects links and hosts"
+
+  def __init__(self, switches):
+    self.switches = list(switches)
+    self.links = []
+    self.hosts = []
+    self.nextPort = dict.fromkeys(self.switches, 1)
+
+  def port(self, dpid):
+    port = self.nextPort[dpid]
+    self.nextPort[dpid] = port + 1
+    return port
+
+  def link(self, dpid1, dpid2):
+    self.links.append((dpid1, dpid2, self.port(dpid1), self.port(dpid2)))
+
+  def host(self, dpid):
+    n = len(self.hosts) + 1
+    self.hosts.append({ "name": "h%i" % n, "dpid": dpid, \
+      "port": self.port(dpid), \
+      "ip": "10.%i.%i.%i/8" % (n >> 16 & 0xff, n >> 8 & 0xff, n & 0xff), \
+      "mac": ":".join("%02x" % (n >> shift & 0xff) \
+        for shift in range(40, -8, -8)) })
+
+  def topology(self):
+    return topologyFile.Topology(self.switches, self.links, self.hosts)
+
+
+def layered(layers = 7, width = 3):
+  "switch 1, *layers* x *width* switches and switch 2; the switch i (from 1) "
+  "of layer l (from 1) is l * 10^d + i, d being the digits of *width*"
+  layers, width = int(layers), int(width)
+  if layers < 1 or width < 1:
+    raise ValueError("a layered topology needs a layer and a switch per layer")
+  stride = 10 ** len(str(width))
+  node = lambda layer, i: (layer + 1) * stride + i + 1
+  builder = _Builder([1, 2] + [ node(layer, i) \
+    for layer in range(layers) for i in range(width) ])
+  link = builder.link
+
+  middle = (width - 1) / 2.0
+  for i in range(width):
+    link(1, node(0, i))
+  for layer in range(layers):
+    for i in range(width - 1):
+      link(node(layer, i), node(layer, i + 1))
+    if layer + 1 < layers:
+      # straight down, and diagonally down towards the middle from the odd
+      # layers and away from it from the even ones, as in ComplexTopo
+      inwards = layer % 2 == 0
+      for i in range(width):
+        link(node(layer, i), node(layer + 1, i))
+        for j in (i - 1, i + 1):
+          if 0 <= j < width \
+            and (abs(j - middle) < abs(i - middle)) == inwards:
+            link(node(layer, i), node(layer + 1, j))
+  for i in range(width):
+    link(node(layers - 1, i), 2)
+
+  builder.host(1)
+  builder.host(2)
+  return builder.topology()
+
+
+def fat_tree(k = 4):
+  "edge switches 1.., then aggregation switches, then core switches; "
+  "5k^2/4 switches, k^3/2 links between them and k^3/4 hosts"
+  k = int(k)
+  if k < 2 or k % 2:
+    raise ValueError("a fat-tree needs an even k of 2 at least")
+  half = k // 2
+  edge = lambda pod, i: 1 + pod * half + i
+  aggregation = lambda pod, i: 1 + k * half + pod * half + i
+  core = lambda i, j: 1 + 2 * k * half + i * half + j
+  builder = _Builder(range(1, 1 + 2 * k * half + half * half))
+
+  for pod in range(k):
+    for i in range(half):
+      for j in range(half):
+        builder.host(edge(pod, i))
+  for pod in range(k):
+    for i in range(half):
+      for j in range(half):
+        builder.link(edge(pod, i), aggregation(pod, j))
+  # aggregation switch i of every pod goes up to the core switches of row i
+  for i in range(half):
+    for j in range(half):
+      for pod in range(k):
+        builder.link(aggregation(pod, i), core(i, j))
+  return builder.topology()
+
+
+def random_graph(switches = 100, degree = 4, seed = 1, hosts = 2):
+  "switches 1..*switches*, joined by a random spanning tree and then by "
+  "random links until the average degree is reached"
+  switches, degree, hosts = int(switches), int(degree), int(hosts)
+  if switches < 2 or hosts > switches:
+    raise ValueError("a random graph needs two switches, and a switch a host")
+  rng = random.Random(int(seed))
+  builder = _Builder(range(1, switches + 1))
+
+  linked = set()
+  def link(a, b):
+    linked.add((min(a, b), max(a, b)))
+    builder.link(a, b)
+  for dpid in range(2, switches + 1):
+    link(rng.randint(1, dpid - 1), dpid)
+  cLinks = min(switches * degree // 2, switches * (switches - 1) // 2)
+  while len(linked) < cLinks:
+    a, b = rng.randint(1, switches), rng.randint(1, switches)
+    if a != b and (min(a, b), max(a, b)) not in linked:
+      link(a, b)
+
+  for dpid in rng.sample(range(1, switches + 1), hosts):
+    builder.host(dpid)
+  return builder.topology()
+
+
+GENERATORS = { "layered": layered, "fatTree": fat_tree, "random": random_graph }
+
+
+def topology(spec = None):
+  "a generated topology for a *spec* like fatTree,8 (a generator and its "
+  "arguments, as Mininet's --topo takes them), else the topology file at "
+  "path *spec*, complexTopo.json if None"
+  parts = (spec or "").split(",")
+  if parts[0] in GENERATORS:
+    return GENERATORS[parts[0]](*parts[1:])
+  return topologyFile.load(spec)
+
+
+if __name__ == "__main__":
+  if len(sys.argv) < 2 or sys.argv[1] not in GENERATORS:
+    sys.exit("usage: python topoGenerators.py %s [arguments] > topo.json" \
+      % "|".join(sorted(GENERATORS)))
+  topologyFile.dump(GENERATORS[sys.argv[1]](*sys.argv[2:]), sys.stdout)
@@ -0,0 +1,197 @@
+"""
+a topology store shared by the main process and the worker processes of the
+complexEvaluation_*.py components
+
+the store is a memory-mapped file (in /dev/shm when there is one), so every
+process reads the same pages and nothing is pickled or copied through pipes;
+it holds the topology in CSR form and the next-hop table computed from it:
+
+  header         version of the snapshot, number of nodes, of link slots
+                 and of destinations
+  dpids          the dpid of every node; a node's index is its position here
+  offsets        the links of node i are the slots offsets[i]..offsets[i+1]-1
+  neighbors      the index of the node at the other end of each slot
+  ports          the out-port of each slot
+  costs          the cost of each slot; -1 for a link that has been removed
+  destinations   the dpids the next-hop table leads to
+  nextHops       the out-port of node i towards destination j at
+                 i * number of destinations + j; 0 if it cannot be reached
+
+a store is a snapshot of the routing state: it is written in full before its
+path is handed to anyone and never changed afterwards, so a *TopologyView*
+reads it without retrying or locking, and every answer can be traced to the
+version it was computed from; a change of the topology or of the next hops
+is published as a new store with the next version (see routingSnapshots.py),
+derived from the one before when the layout is the same: the bytes of the
+old store are copied at once, and only the changed link slots and next-hop
+entries are written into the copy
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+
+_HEADER = struct.Struct("=QIII") # version, cNodes, cSlots, cDestinations
+_VERSION = struct.Struct("=Q")
+_PORT = struct.Struct("=H")
+_COST = struct.Struct("=i")
+
+
+def _layout(cNodes, cSlots, cDestinations):
+  "offsets of the sections of a store, and its total size"
+  layout = {}
+  offset = _HEADER.size
+  for name, size in (("dpids", 8 * cNodes), ("offsets", 4 * (cNodes + 1)), \
+    ("neighbors", 4 * cSlots), ("ports", 2 * cSlots), ("costs", 4 * cSlots), \
+    ("destinations", 8 * cDestinations), \
+    ("nextHops", 2 * cNodes * cDestinations)):
+    layout[name] = offset
+    offset += size
+  return layout, offset
+
+
+class TopologyStore(object):
+  "the writing end of a store, owned by the main process; it is laid out "
+  "from a *compactGraph.CompactGraph* and the *ports* of a "
+  "shortestPath.NextHopTable, arrays it copies verbatim"
+
+  def __init__(self, graph, destinations, nextHops, version = 0):
+    self._allocate(graph, destinations, version)
+    cNodes = len(self.dpids)
+    _HEADER.pack_into(self.buf, 0, version, cNodes, len(self.neighbors), \
+      len(self.destinations))
+    self._write("dpids", "q", self.dpids)
+    self._write_array("offsets", graph.offsets)
+    self._write_array("neighbors", graph.neighbors)
+    self._write_array("ports", graph.ports)
+    self._write_array("costs", graph.costs)
+    self._write("destinations", "q", self.destinations)
+    self._write_array("nextHops", nextHops)
+
+  def _allocate(self, graph, destinations, version):
+    "creates the file and maps it, sized for *graph* and *destinations*"
+    self.version = version
+    self.dpids = list(graph.dpids)
+    self.index = dict(graph.index)
+    self.offsets = graph.offsets[:]
+    self.neighbors = graph.neighbors[:]
+    self.destinations = list(destinations)
+    self.destIndex = { dpid: j for j, dpid in enumerate(self.destinations) }
+    self.layout, size = _layout(len(self.dpids), len(self.neighbors), \
+      len(self.destinations))
+
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    fd, self.path = tempfile.mkstemp(prefix = "topology-", suffix = ".store", \
+      dir = directory)
+    try:
+      os.ftruncate(fd, size)
+      self.buf = mmap.mmap(fd, size)
+    finally:
+      os.close(fd)
+
+  def fits(self, graph, destinations):
+    "whether *graph* and *destinations* have the layout of this store, so "
+    "that a store can be derived from it"
+    return graph.dpids == self.dpids and graph.offsets == self.offsets \
+      and graph.neighbors == self.neighbors \
+      and list(destinations) == self.destinations
+
+  def derive(self, version, graph, links, changes):
+    "a new store holding *version*: a copy of this one, with the slots of "
+    "the *links* (dpid1, dpid2) taken from *graph*, which must fit, and the "
+    "next-hop entries *changes* { (dpid, destination): outport or None } "
+    "written; this store is left as it is"
+    store = object.__new__(TopologyStore)
+    store._allocate(graph, self.destinations, version)
+    store.buf[:] = self.buf[:]
+    _VERSION.pack_into(store.buf, 0, version)
+    for dpid1, dpid2 in links:
+      for slot in (graph.slot(dpid1, dpid2), graph.slot(dpid2, dpid1)):
+        _PORT.pack_into(store.buf, store.layout["ports"] + 2 * slot, \
+          graph.ports[slot])
+        _COST.pack_into(store.buf, store.layout["costs"] + 4 * slot, \
+          graph.costs[slot])
+    base, cDestinations = store.layout["nextHops"], len(self.destinations)
+    for (dpid, destination), outport in changes.iteritems():
+      _PORT.pack_into(store.buf, base + 2 * (self.index[dpid] * cDestinations \
+        + self.destIndex[destination]), outport or 0)
+    return store
+
+  def _write(self, section, code, values):
+    struct.pack_into("=%i%s" % (len(values), code), self.buf, \
+      self.layout[section], *values)
+
+  def _write_array(self, section, values):
+    offset = self.layout[section]
+    data = values.tostring()
+    self.buf[offset:offset + len(data)] = data
+
+  def close(self):
+    "unmaps and removes the store; views that are open keep their mapping"
+    self.buf.close()
+    os.unlink(self.path)
+
+
+class TopologyView(object):
+  "the reading end of a store, used by the worker processes"
+
+  def __init__(self, path):
+    with open(path, "rb") as f:
+      self.buf = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+    (self.version, self.cNodes, self.cSlots, self.cDestinations) \
+      = _HEADER.unpack_from(self.buf, 0)
+    self.layout = _layout(self.cNodes, self.cSlots, self.cDestinations)[0]
+    self.dpids = struct.unpack_from("=%iq" % self.cNodes, self.buf, \
+      self.layout["dpids"])
+    self.index = { dpid: i for i, dpid in enumerate(self.dpids) }
+    self.destIndex = { dpid: j for j, dpid in enumerate(struct.unpack_from( \
+      "=%iq" % self.cDestinations, self.buf, self.layout["destinations"])) }
+
+  def next_hop(self, dpid, destination):
+    "the out-port of *dpid* towards *destination*; None if there is none"
+    i, j = self.index.get(dpid), self.destIndex.get(destination)
+    if i is None or j is None:
+      return None
+    return _PORT.unpack_from(self.buf, self.layout["nextHops"] \
+      + 2 * (i * self.cDestinations + j))[0] or None
+
+  def links(self, dpid):
+    "(neighbor dpid, outport, cost) of every link of *dpid*"
+    i = self.index[dpid]
+    first, last = struct.unpack_from("=II", self.buf, \
+      self.layout["offsets"] + 4 * i)
+    count = last - first
+    neighbors = struct.unpack_from("=%iI" % count, self.buf, \
+      self.layout["neighbors"] + 4 * first)
+    ports = struct.unpack_from("=%iH" % count, self.buf, \
+      self.layout["ports"] + 2 * first)
+    costs = struct.unpack_from("=%ii" % count, self.buf, \
+      self.layout["costs"] + 4 * first)
+    return [ (self.dpids[n], port, cost) \
+      for n, port, cost in zip(neighbors, ports, costs) if cost >= 0 ]
+
+  def path(self, start, end):
+    "(dpid, outport) of every node on the way from *start* to *end*, *end* "
+    "excluded; None if *end* cannot be reached"
+    hops = []
+    node = start
+    for i in xrange(self.cNodes): # cannot loop, but a bound costs nothing
+      if node == end:
+        return hops
+      outport = self.next_hop(node, end)
+      if outport is None:
+        return None
+      hops.append((node, outport))
+      node = self.neighbor(node, outport)
+    return None
+
+  def neighbor(self, dpid, outport):
+    "the dpid of the node at the other end of *outport* of *dpid*"
+    for neighbor, port, cost in self.links(dpid):
+      if port == outport:
+        return neighbor
+    return None
+
+  def close(self):
+    self.buf.close()
@@ -0,0 +1,167 @@
+"""
+the worker processes of an evaluation component: grown and shrunk at
+runtime, respawned when they die, and stopped when POX goes down
+
+worker i is fed through the i-th connection of the *BatchDispatcher*, which
+holds the connections of the active workers only; the component spawns a
+worker with its *spawn*(i, stats) method, which starts the process, closes the
+worker's ends of its pipes in the main process (so that a dead worker is a
+closed pipe, not a full one) and returns a *Worker*
+
+a worker that is no longer needed is sent a stop message (-1 --- indicating
+the worker is to exit, None) after the PacketIns it has been sent; it drains
+them and exits, and its results keep being collected until it has; a worker
+found dead is replaced by a new one spawned with the current state of the
+component, the PacketIns it had in flight being counted as lost; the workers
+are checked every *WATCH_INTERVAL* seconds
+
+a worker may die holding state it shares with the others: a lock or half a
+message of a queue they all write to, the lock or an odd version of a stripe
+of the MAC table (see macTable.py); the component's *recover*(pids), given
+the pids of the dead workers, is called before they are respawned, and puts
+that state right; if it returns True the state cannot be put right under the
+live workers, and all workers, draining ones included, are terminated and
+respawned, the PacketIns in flight to the active ones being counted as lost
+
+the result connection of a worker is left to the collecting thread, which
+removes it from its set once the worker has gone and it reads the end of it
+"""
+
+import threading
+import time
+
+STOP = (-1, None)
+WATCH_INTERVAL = 0.5
+SHUTDOWN_TIMEOUT = 5.0
+
+
+class Worker(object):
+  "a started worker process, the connection it is fed through and the one "
+  "its results come back on (None if they come through a queue)"
+
+  def __init__(self, process, sender, results = None):
+    self.process = process
+    self.sender = sender
+    self.results = results
+
+  def close(self):
+    "closes the connection the worker is fed through, unless its results "
+    "come back on it; the collecting thread closes that one"
+    if self.sender is not self.results:
+      self.sender.close()
+
+
+class WorkerPool(object):
+  "the workers fed through *dispatcher*, their stages noted in *stats*"
+
+  def __init__(self, spawn, dispatcher, stats, log, recover = None):
+    self.spawn = spawn
+    self.recover = recover
+    self.dispatcher = dispatcher
+    self.stats = stats
+    self.log = log
+    self.workers = [] # the active ones, worker i fed through senders[i]
+    self.draining = [] # stopped, finishing what they were sent
+    self.respawned = 0
+    self.closed = False
+    self.lock = threading.Lock() # held while the pool changes
+
+    self.watchingThread = threading.Thread(target = self._watching_task)
+    self.watchingThread.daemon = True
+    self.watchingThread.start()
+
+  def __len__(self):
+    return len(self.workers)
+
+  def processes(self):
+    "the worker processes, active and draining"
+    return [ worker.process for worker in self.workers + self.draining ]
+
+  def resize(self, cWorkers):
+    "spawns or stops workers until *cWorkers* are active; the last ones are "
+    "stopped first"
+    with self.lock:
+      if self.closed:
+        return
+      while len(self.workers) < cWorkers:
+        self._start(len(self.workers))
+      while len(self.workers) > cWorkers:
+        self._stop()
+
+  def shutdown(self, timeout = SHUTDOWN_TIMEOUT):
+    "stops every worker after what it has been sent, and terminates those "
+    "that have not exited within *timeout* seconds"
+    with self.lock:
+      self.closed = True
+      while self.workers:
+        self._stop()
+      deadline = time.time() + timeout
+      for worker in self.draining:
+        worker.process.join(max(0, deadline - time.time()))
+        if worker.process.is_alive():
+          worker.process.terminate()
+          worker.process.join()
+        worker.close()
+      self.draining = []
+
+  def _start(self, i):
+    "spawns worker *i*, replacing the one there is; call with *lock* held"
+    stats = self.stats.add_worker() if i == len(self.stats.workers) \
+      else self.stats.replace_worker(i)
+    # the component's state the worker starts from is not changed while the
+    # dispatcher is held, so the new worker gets every later change
+    with self.dispatcher.lock:
+      worker = self.spawn(i, stats)
+      self.dispatcher.attach(i, worker.sender)
+    if i == len(self.workers):
+      self.workers.append(worker)
+    else:
+      self.workers[i] = worker
+
+  def _stop(self):
+    "stops the last active worker; call with *lock* held"
+    with self.dispatcher.lock:
+      self.dispatcher.detach(len(self.workers) - 1, STOP)
+    self.draining.append(self.workers.pop())
+
+  def _watching_task(self):
+    "respawns dead workers, and forgets drained ones that have exited"
+    while 1:
+      time.sleep(WATCH_INTERVAL)
+      with self.lock:
+        if self.closed:
+          return
+        dead = [ i for i, worker in enumerate(self.workers) \
+          if not worker.process.is_alive() ]
+        for i in dead:
+          self.log.warning(" worker process %i has died (exit code %s), " \
+            "%i PacketIns were in flight to it; respawning it" \
+            % (i, self.workers[i].process.exitcode, self.stats.in_flight(i)))
+        if dead and self.recover is not None and self.recover( \
+          [ self.workers[i].process.pid for i in dead ]):
+          self._terminate_all()
+          dead = range(len(self.workers))
+        for i in dead:
+          worker = self.workers[i]
+          self.stats.worker_lost(i)
+          self._start(i)
+          worker.close()
+          self.respawned += 1
+        for worker in list(self.draining):
+          if not worker.process.is_alive():
+            worker.process.join()
+            worker.close()
+            self.draining.remove(worker)
+
+  def _terminate_all(self):
+    "terminates every worker, and forgets the draining ones; call with "
+    "*lock* held"
+    self.log.warning(" the state shared with the dead workers cannot be " \
+      "recovered; restarting all %i worker processes" % (len(self.workers),))
+    for worker in self.workers + self.draining:
+      if worker.process.is_alive():
+        worker.process.terminate()
+      worker.process.join()
+    for worker in self.draining:
+      worker.close()
+    self.draining = []
@@ -0,0 +1,67 @@
+"""
+choice of the worker a PacketIn is dispatched to
+
+round robin hands every worker the same number of PacketIns however busy it
+is, so a slow worker (swallowing a new store, or given more work per packet)
+delays every n-th PacketIn; the other schedulers read the PacketIns in flight
+to every worker (dispatched, and not completed by it) from the counters of
+stageStats.py:
+
+  roundRobin   the next worker in turn
+  leastLoaded  the worker with the fewest in flight, ties broken in turn
+  twoChoices   the one with fewer in flight of two workers drawn at random
+               (power of two choices), which reads two counters instead of n
+"""
+
+import random
+
+ROUND_ROBIN, LEAST_LOADED, TWO_CHOICES = \
+  "roundRobin", "leastLoaded", "twoChoices"
+SCHEDULERS = (ROUND_ROBIN, LEAST_LOADED, TWO_CHOICES)
+
+
+class WorkerScheduler(object):
+  "picks one of the active workers by the *scheduler* policy, their loads "
+  "read from *stats*, a *StageStats*"
+
+  def __init__(self, stats, scheduler = ROUND_ROBIN):
+    self.stats = stats
+    self.random = random.Random()
+    self.change(scheduler)
+
+  def change(self, scheduler):
+    if scheduler not in SCHEDULERS:
+      raise ValueError("scheduler is one of %s" % (", ".join(SCHEDULERS),))
+    self.scheduler = scheduler
+    self.pick = { ROUND_ROBIN: self.round_robin, \
+      LEAST_LOADED: self.least_loaded, TWO_CHOICES: self.two_choices \
+      }[scheduler]
+
+  def round_robin(self, last, cWorkers):
+    "the worker after *last* among workers 0..*cWorkers*-1"
+    return (last + 1) % cWorkers
+
+  def least_loaded(self, last, cWorkers):
+    "the worker with the fewest in flight, the first after *last* of them"
+    inFlight = self.stats.in_flight
+    best = (last + 1) % cWorkers
+    least = inFlight(best)
+    for step in xrange(2, cWorkers + 1):
+      if not least:
+        break
+      i = (last + step) % cWorkers
+      load = inFlight(i)
+      if load < least:
+        best, least = i, load
+    return best
+
+  def two_choices(self, last, cWorkers):
+    "the worker with fewer in flight of two drawn at random"
+    if cWorkers < 2:
+      return 0
+    i = int(self.random.random() * cWorkers)
+    j = int(self.random.random() * (cWorkers - 1))
+    if j >= i: # two different workers
+      j += 1
+    inFlight = self.stats.in_flight
+    return i if inFlight(i) <= inFlight(j) else j